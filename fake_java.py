@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# Stand-in for a java binary, for testing and benchmarking run_heuristics.py
+# without a JDK. Understands the command lines that run_heuristics.py builds
+# and prints DaCapo or SPECjvm2008 style output and a GC log in the format of
+# the selected collector. How much it writes is set with -D properties:
+#     -Dfake.iteration_ms=100     length of one benchmark iteration
+#     -Dfake.startup_ms=200       time before the first iteration
+#     -Dfake.gc_per_second=20     GC pauses logged per second of run time
+#     -Dfake.output_lines=10      extra output lines per iteration
+#     -Dfake.line_length=80       length of those lines
+# For example, in the [sweep] section of the configuration:
+#     extra_flags: -Dfake.iteration_ms=20 -Dfake.gc_per_second=5000
+# On exit it reports its own run time on stderr:
+#     fake java: elapsed 1234.5 ms
+import sys
+import os
+import time
+import random
+
+default_properties = { "iteration_ms" : 100.0,
+                       "startup_ms" : 200.0,
+                       "gc_per_second" : 20.0,
+                       "output_lines" : 10,
+                       "line_length" : 80 }
+
+def println( text ):
+    # Not the print statement, so that this also runs under Python 3.
+    sys.stdout.write( text + "\n" )
+
+def get_properties( args ):
+    properties = dict( default_properties )
+    for arg in args:
+        if arg.startswith( "-Dfake." ) and "=" in arg:
+            (name, value) = arg[len("-Dfake."):].split( "=", 1 )
+            properties[name] = type(default_properties.get( name, 0.0 ))( float(value) )
+    return properties
+
+def get_collector( args ):
+    if "-XX:+UseShenandoahGC" in args:
+        return "shenandoah"
+    if "-XX:+UseG1GC" in args:
+        return "g1"
+    return "parallel"
+
+def gc_log_lines( collector = "shenandoah",
+                  start = 0.0,
+                  unified = False,
+                  rng = random ):
+    """Lines for one GC cycle starting at 'start' seconds of uptime, in the
+    JDK 8 -XX:+PrintGCDetails -XX:+PrintGCTimeStamps format, or in the
+    unified logging format of JDK 9+."""
+    before = rng.randint( 200, 2000 )
+    after = rng.randint( 50, before )
+    if unified:
+        number = int( start * 10 )
+        if collector == "shenandoah":
+            return [ "[%.3fs][info][gc] GC(%d) Pause Init Mark %.3fms\n" % (start, number, rng.uniform( 0.1, 2.0 )),
+                     "[%.3fs][info][gc] GC(%d) Concurrent marking %dM->%dM(2048M) %.3fms\n" %
+                     (start + 0.001, number, before, before, rng.uniform( 5.0, 50.0 )),
+                     "[%.3fs][info][gc] GC(%d) Pause Final Mark %dM->%dM(2048M) %.3fms\n" %
+                     (start + 0.050, number, before, after, rng.uniform( 0.2, 5.0 )) ]
+        return [ "[%.3fs][info][gc] GC(%d) Pause Young (Normal) (G1 Evacuation Pause) %dM->%dM(2048M) %.3fms\n" %
+                 (start, number, before, after, rng.uniform( 1.0, 20.0 )) ]
+    if collector == "shenandoah":
+        return [ "%.3f: [Pause Init Mark, %.3f ms]\n" % (start, rng.uniform( 0.1, 2.0 )),
+                 "%.3f: [Concurrent marking %dM->%dM(2048M), %.3f ms]\n" %
+                 (start + 0.001, before, before, rng.uniform( 5.0, 50.0 )),
+                 "%.3f: [Pause Final Mark %dM->%dM(2048M), %.3f ms]\n" %
+                 (start + 0.050, before, after, rng.uniform( 0.2, 5.0 )),
+                 "%.3f: [Concurrent evacuation %dM->%dM(2048M), %.3f ms]\n" %
+                 (start + 0.051, after, after, rng.uniform( 1.0, 10.0 )) ]
+    if collector == "g1":
+        return [ "%.3f: [GC pause (G1 Evacuation Pause) (young), %.7f secs]\n" % (start, rng.uniform( 0.001, 0.02 )),
+                 "   [Parallel Time: 3.2 ms, GC Workers: 4]\n",
+                 "   [Eden: %d.0M(%d.0M)->0.0B(%d.0M) Survivors: 0.0B->3072.0K Heap: %d.0M(2048.0M)->%d.0M(2048.0M)]\n" %
+                 (before - after, before - after, before - after, before, after),
+                 " [Times: user=0.01 sys=0.00, real=0.01 secs] \n" ]
+    return [ "%.3f: [GC (Allocation Failure) [PSYoungGen: %dK->%dK(%dK)] %dK->%dK(2097152K), %.7f secs]"
+             " [Times: user=0.01 sys=0.00, real=0.01 secs] \n" %
+             (start, before * 512, after * 512, before * 1024, before * 1024, after * 1024, rng.uniform( 0.001, 0.02 )) ]
+
+class FakeJvm( object ):
+    def __init__( self, args ):
+        self.args = args
+        self.properties = get_properties( args )
+        self.collector = get_collector( args )
+        self.start_time = time.time()
+        self.gc_log = None
+        self.unified = False
+        for arg in args:
+            if arg.startswith( "-Xloggc:" ):
+                self.gc_log = open( arg[len("-Xloggc:"):], "w" )
+            elif arg.startswith( "-Xlog:gc" ) and ":file=" in arg:
+                self.gc_log = open( arg.split( ":file=" )[1].split( ":" )[0], "w" )
+                self.unified = True
+        self.stopped_time = "-XX:+PrintGCApplicationStoppedTime" in args
+        self.next_gc = 0.0
+        self.noise = "x" * max( self.properties["line_length"] - 1, 0 )
+
+    def uptime( self ):
+        return time.time() - self.start_time
+
+    def run_for( self, seconds ):
+        """Spends 'seconds', writing GC log lines at the configured rate."""
+        end = time.time() + seconds
+        rate = self.properties["gc_per_second"]
+        while True:
+            now = self.uptime()
+            if self.gc_log != None and rate > 0:
+                while self.next_gc <= now:
+                    self.gc_log.writelines( gc_log_lines( self.collector, self.next_gc, self.unified ) )
+                    if self.stopped_time and not self.unified:
+                        self.gc_log.write( "%.3f: Total time for which application threads were stopped: "
+                                           "%.7f seconds, Stopping threads took: %.7f seconds\n" %
+                                           (self.next_gc + 0.051, random.uniform( 0.0005, 0.005 ),
+                                            random.uniform( 0.00001, 0.0002 )) )
+                    self.next_gc += 1.0 / rate
+                self.gc_log.flush()
+            left = end - time.time()
+            if left <= 0:
+                break
+            time.sleep( min( left, 0.01 ) )
+
+    def iteration( self ):
+        start = time.time()
+        self.run_for( self.properties["iteration_ms"] / 1000.0 )
+        for i in range( self.properties["output_lines"] ):
+            println( self.noise )
+        return (time.time() - start) * 1000.0
+
+    def dacapo( self, rest ):
+        number = 1
+        benchmarks = []
+        for arg in rest:
+            if arg.startswith( "-n" ):
+                number = int( arg[2:] )
+            elif not arg.startswith( "-" ):
+                benchmarks.append( arg )
+        for benchmark in benchmarks:
+            println( "===== DaCapo 9.12 %s starting =====" % benchmark )
+            for i in range( 1, number + 1 ):
+                msec = self.iteration()
+                if i < number:
+                    println( "===== DaCapo 9.12 %s completed warmup %d in %d msec =====" % (benchmark, i, msec) )
+                else:
+                    println( "===== DaCapo 9.12 %s PASSED in %d msec =====" % (benchmark, msec) )
+                sys.stdout.flush()
+
+    def specjvm( self, rest ):
+        iterations = int( rest[ rest.index( "--iterations" ) + 1 ] ) if "--iterations" in rest else 1
+        for i in range( 1, iterations + 1 ):
+            println( "Iteration %d (%ds) begins: %s" % (i, self.properties["iteration_ms"] / 1000, time.ctime()) )
+            msec = self.iteration()
+            println( "Iteration %d (%ds) ends:   %s" % (i, self.properties["iteration_ms"] / 1000, time.ctime()) )
+            println( "Iteration %d (%ds) result: %.2f ops/m" % (i, self.properties["iteration_ms"] / 1000,
+                                                                60000.0 / max( msec, 1.0 )) )
+            sys.stdout.flush()
+
+    def main( self ):
+        if "-version" in self.args:
+            sys.stderr.write( 'openjdk version "1.8.0-fake"\n' )
+            return 0
+        if "-jar" not in self.args:
+            sys.stderr.write( "Usage: fake_java.py [options] -jar jarfile [args...]\n" )
+            return 1
+        jar = self.args[ self.args.index( "-jar" ) + 1 ]
+        rest = self.args[ self.args.index( "-jar" ) + 2: ]
+        self.run_for( self.properties["startup_ms"] / 1000.0 )
+        if "dacapo" in os.path.basename( jar ).lower():
+            self.dacapo( rest )
+        else:
+            self.specjvm( rest )
+        if self.gc_log != None:
+            self.gc_log.close()
+        sys.stderr.write( "fake java: elapsed %.1f ms\n" % (self.uptime() * 1000.0) )
+        return 0
+
+if __name__ == "__main__":
+    sys.exit( FakeJvm( sys.argv[1:] ).main() )
@@ -12,12 +12,39 @@ import argparse
 import ConfigParser
 import timeit
 import string
+import json
+import hashlib
+import hmac
+import threading
+import multiprocessing
+import collections
+import math
+import signal
+import errno
+import socket
+import resource
+import tempfile
+import shutil
+import warnings
+import random
+import itertools
+import glob
+from array import array
+from distutils.spawn import find_executable
+try:
+    import numpy as np
+except ImportError:
+    # Only needed for the results store and the query subcommand.
+    np = None
 
 heuristic_list = [ "halfway", "newadaptive", "statusquo", "lazy", "dynamic", "aggressive", ]
 
 # TODO put into config file
 dacapo_path = "./dacapo-9.12-bach.jar"
 specjvm_path = "./specjvm2008/SPECjvm2008.jar"
+specjvm_iterations = 200
+# Label of the JVM given with --javapath.
+default_jvm_label = "default"
 
 
 def setup_logger( logger_name = None,
@@ -39,20 +66,163 @@ def setup_logger( logger_name = None,
     logger.addHandler( filehandler )
     return logger
 
-def create_directories( blist ):
-    """This will error if WORK exists.
+def create_directories( blist, resume = False ):
+    """This will error if WORK exists, unless resume is set in which case the
+    existing WORK and benchmark directories are reused.
     Then this creates the WORK directory and the benchmark directories
     there. When create_directories returns, it wil lbe in the WORK directory."""
     # TODO Make this configurable
     dirname = "WORK"
     if os.path.exists(dirname):
-        print "%s directory exists. Please rename and try again." % dirname
-        exit(10)
-    os.mkdir(dirname)
+        if not resume:
+            print "%s directory exists. Please rename and try again, or use --resume." % dirname
+            exit(10)
+    else:
+        os.mkdir(dirname)
     os.chdir(dirname)
     for bmark in blist:
-        os.mkdir(bmark)
-    
+        if not os.path.isdir(bmark):
+            os.mkdir(bmark)
+
+#
+# Run ledger
+#
+ledger_filename = "run_ledger.jsonl"
+
+# Where the VM library lives relative to the directory of bin/java: JDK 9+,
+# then JDK 8 (in a JRE and in a JDK).
+libjvm_patterns = [ "lib/server/libjvm.so",
+                    "lib/*/server/libjvm.so",
+                    "jre/lib/*/server/libjvm.so" ]
+
+def hash_file( path ):
+    """SHA-1 of the file that path resolves to."""
+    sha = hashlib.sha1()
+    with open( os.path.realpath(path), "rb" ) as fp:
+        for chunk in iter( lambda: fp.read( 1024 * 1024 ), "" ):
+            sha.update( chunk )
+    return sha.hexdigest()
+
+def find_libjvm( java_path ):
+    """The libjvm.so of the JVM whose launcher is java_path, or None."""
+    home = os.path.dirname( os.path.dirname( os.path.realpath( java_path ) ) )
+    for pattern in libjvm_patterns:
+        found = sorted( glob.glob( os.path.join( home, pattern ) ) )
+        if found:
+            return found[0]
+    return None
+
+def hash_jvm( java_path ):
+    """Identifies a JVM build for the ledger. The launcher hardly changes
+    between builds, so this hashes libjvm.so as well, which has the VM and
+    the collectors in it."""
+    libjvm = find_libjvm( java_path )
+    if libjvm == None:
+        return hash_file( java_path )
+    return hashlib.sha1( hash_file( java_path ) + hash_file( libjvm ) ).hexdigest()
+
+def get_run_key( run_config = None,
+                 java_hash = None ):
+    """The configuration tuple that identifies a run in the ledger."""
+    iterations = run_config["number"] if run_config.get("dacapo_flag") else specjvm_iterations
+    key = ( run_config["benchmark"],
+            run_config["gc_algo"],
+            run_config["heuristic"],
+            run_config["min_heap"],
+            run_config["max_heap"],
+            run_config["par_gcthreads"],
+            run_config["conc_gcthreads"],
+            run_config["appnum"],
+            iterations,
+            java_hash,
+            run_config.get( "repetition", 0 ),
+            run_config.get( "jvm_label" ),
+            " ".join( run_config.get( "extra_flags", () ) ) )
+    if run_config.get( "profile" ):
+        # Only profiled runs have this, so older ledgers still match.
+        key += ( ",".join( run_config["profile"] ), )
+    return key
+
+class RunLedger( object ):
+    """Append-only JSON lines file in WORK recording the outcome of every run,
+    keyed by get_run_key. The last record for a key wins. Every record is
+    flushed and synced, so the ledger survives the harness being killed."""
+    def __init__( self, path = ledger_filename ):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = {}
+        self.events = []
+        if os.path.isfile( path ):
+            with open( path ) as fp:
+                for line in fp:
+                    try:
+                        record = json.loads( line )
+                    except ValueError:
+                        # Partially written last line.
+                        continue
+                    if "key" in record:
+                        self.records[ tuple(record["key"]) ] = record
+                    else:
+                        self.events.append( record )
+        self.fp = open( path, "a" )
+
+    def is_completed( self, key ):
+        return self.get_status( key ) == "completed"
+
+    def get_status( self, key ):
+        record = self.records.get( key )
+        return record["status"] if record != None else None
+
+    def get_record( self, key ):
+        return self.records.get( key )
+
+    def _append( self, record ):
+        record["time"] = time.time()
+        with self.lock:
+            self.fp.write( json.dumps( record ) + "\n" )
+            self.fp.flush()
+            os.fsync( self.fp.fileno() )
+
+    def record( self, key = None, status = None, **info ):
+        record = dict( info )
+        record["key"] = list( key )
+        record["status"] = status
+        self.records[key] = record
+        self._append( record )
+
+    def record_event( self, event = None, **info ):
+        """Records something that is not the outcome of a single run,
+        e.g. a heuristic being eliminated from a race."""
+        record = dict( info )
+        record["event"] = event
+        self.events.append( record )
+        self._append( record )
+
+    def close( self ):
+        self.fp.close()
+
+# Columns produced by construct_row. Any extra result columns listed in
+# result_columns follow these in the CSV file.
+csv_header = [ "benchmark", "gc_algo", "heuristic", "min_heap", "max_heap",
+               "par_gcthreads", "conc_gcthreads", "number_iterations", "runtimes" ]
+runtimes_index = csv_header.index( "runtimes" )
+
+result_columns = [ "status", "attempts", "jvm", "unit", "appnum", "extra_flags", "repetition", "warmup_iterations", "converged",
+                   "gc_pause_count", "gc_pause_total_ms", "gc_pause_p50_ms", "gc_pause_p99_ms",
+                   "gc_pause_p999_ms", "gc_pause_max_ms", "gc_throughput",
+                   "rss_peak_kb", "rss_mean_kb", "cpu_user_s", "cpu_system_s", "ctxt_voluntary",
+                   "ctxt_involuntary", "major_faults", "run_delay_s", "sampler_overhead", "host", "hardware",
+                   "cpu_governor", "turbo", "thp", "thp_defrag", "isolated_cpus", "kernel", "env_matches",
+                   "quiet", "quiesce_wait_s", "load_before", "cpu_busy_before", "mem_pressure_before",
+                   "profile", "perf_cycles", "perf_instructions", "perf_ipc", "perf_cache_misses",
+                   "perf_cache_miss_rate", "perf_branch_misses", "perf_context_switches", "perf_cpu_migrations",
+                   "perf_page_faults", "perf_gc_thread_pct", "perf_vm_thread_pct", "perf_compiler_thread_pct",
+                   "safepoint_count", "safepoint_total_ms", "safepoint_max_ms", "safepoint_ttsp_max_ms", "jfr_kb", ]
+
+def format_runtime_list( runtime_list ):
+    """Flattens a list of iteration times into '1;2;3'."""
+    return ";".join( [ str(x) for x in runtime_list ] )
+
 def write_csvfile( tgtpath = None,
                    data = None,
                    header = None,
@@ -64,16 +234,38 @@ def write_csvfile( tgtpath = None,
                          quoting = csv.QUOTE_NONNUMERIC )
         cw.writerow( header )
         for csvrow in data:
-            assert(len(csvrow) == 9)
-            result_list = pp.pformat( csvrow[-1] )
-            result_list = result_list.replace("[", "")\
-                                     .replace("]", "")\
-                                     .replace(" ", "")\
-                                     .replace(",", ";")
-            csvrow.pop()
-            csvrow.append(result_list)
+            assert(len(csvrow) >= 9)
+            csvrow[runtimes_index] = format_runtime_list( csvrow[runtimes_index] )
             cw.writerow(csvrow)
 
+class CsvResultWriter( object ):
+    """Appends result rows to the output CSV as runs finish. Same layout as
+    write_csvfile, but every row is flushed right away so a crash loses at
+    most the row being written and no rows are kept in memory."""
+    def __init__( self,
+                  tgtpath = None,
+                  header = None,
+                  append = False ):
+        new_file = (not append) or (not os.path.exists(tgtpath)) or \
+                   (os.path.getsize(tgtpath) == 0)
+        self.fp = open( tgtpath, ('wb' if not append else 'ab') )
+        self.cw = csv.writer( self.fp,
+                              quotechar = '"',
+                              quoting = csv.QUOTE_NONNUMERIC )
+        if new_file:
+            self.cw.writerow( header )
+            self.fp.flush()
+
+    def add_row( self, csvrow ):
+        assert(len(csvrow) >= 9)
+        csvrow[runtimes_index] = format_runtime_list( csvrow[runtimes_index] )
+        self.cw.writerow( csvrow )
+        self.fp.flush()
+        os.fsync( self.fp.fileno() )
+
+    def close( self ):
+        self.fp.close()
+
 def construct_row( benchmark = None,
                    runtime_list = None,
                    gc_algo = None,
@@ -83,7 +275,9 @@ def construct_row( benchmark = None,
                    par_gcthreads = None,
                    conc_gcthreads = None,
                    number_iterations = None,
-                   drop_warmup = True ):
+                   drop_warmup = True,
+                   warmup_iterations = 1 ):
+    """With drop_warmup, the first warmup_iterations results are left out."""
     return [ benchmark,
              gc_algo,
              heuristic,
@@ -91,8 +285,1248 @@ def construct_row( benchmark = None,
              max_heap,
              par_gcthreads,
              conc_gcthreads,
-             (number_iterations - 1) if drop_warmup else number_iterations,
-             runtime_list[1:] if drop_warmup else runlist[:] ]
+             max(number_iterations - warmup_iterations, 0) if drop_warmup else number_iterations,
+             runtime_list[warmup_iterations:] if drop_warmup else runtime_list[:] ]
+
+# DaCapo prints one line per iteration:
+#     ===== DaCapo 9.12 fop completed warmup 1 in 1234 msec =====
+#     ===== DaCapo 9.12 fop PASSED in 1234 msec =====
+dacapo_iteration_re = re.compile( r"===== DaCapo \S+ (\S+) (?:completed warmup \d+|PASSED) in (\d+) msec =====" )
+# SPECjvm2008 reports a throughput per iteration:
+#     Iteration 1 (240s) result: 123.45 ops/m
+specjvm_iteration_re = re.compile( r"Iteration\s+\d+\s+\([^)]*\)\s+result:\s+([0-9.]+)\s+ops/m" )
+
+class IterationParser( object ):
+    """Line callback that collects per-iteration results from benchmark output:
+    runtimes in msec for DaCapo and ops/m for SPECjvm2008."""
+    def __init__( self,
+                  benchmark = None,
+                  dacapo_flag = False,
+                  specjvm_flag = False,
+                  on_iteration = None ):
+        self.benchmark = benchmark
+        self.dacapo_flag = dacapo_flag
+        self.specjvm_flag = specjvm_flag
+        self.on_iteration = on_iteration
+        self.runtimes = []
+
+    def __call__( self, stream_name, line ):
+        if self.dacapo_flag:
+            match = dacapo_iteration_re.search( line )
+            if match != None and match.group(1) == self.benchmark:
+                self.add_iteration( int(match.group(2)) )
+        elif self.specjvm_flag:
+            match = specjvm_iteration_re.search( line )
+            if match != None:
+                self.add_iteration( float(match.group(1)) )
+
+    def add_iteration( self, value ):
+        self.runtimes.append( value )
+        if self.on_iteration != None:
+            self.on_iteration( self.runtimes )
+
+#
+# Statistics helpers
+#
+# Two sided 95% critical values of Student's t distribution for 1-30 degrees
+# of freedom, followed by a few larger ones that t_critical_95 interpolates.
+t_table_95 = [ 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042 ]
+t_table_95_large = [ (30, 2.042), (40, 2.021), (60, 2.000), (120, 1.980) ]
+
+def t_critical_95( df ):
+    assert( df >= 1 )
+    if df <= len(t_table_95):
+        return t_table_95[df - 1]
+    for ((df0, t0), (df1, t1)) in zip( t_table_95_large, t_table_95_large[1:] ):
+        if df <= df1:
+            return t0 + (t1 - t0) * (df - df0) / float(df1 - df0)
+    return 1.960
+
+def mean( values ):
+    return math.fsum( values ) / len(values)
+
+def stdev( values ):
+    """Sample standard deviation."""
+    if len(values) < 2:
+        return 0.0
+    avg = mean( values )
+    return math.sqrt( math.fsum( [ (x - avg) ** 2 for x in values ] ) / (len(values) - 1) )
+
+def coefficient_of_variation( values ):
+    avg = mean( values )
+    return (stdev( values ) / avg) if avg != 0 else float("inf")
+
+def ci95_halfwidth( values ):
+    """Half width of the 95% confidence interval on the mean."""
+    if len(values) < 2:
+        return float("inf")
+    return t_critical_95( len(values) - 1 ) * stdev( values ) / math.sqrt( len(values) )
+
+def beta_continued_fraction( a, b, x ):
+    """Continued fraction for the incomplete beta function (modified Lentz)."""
+    tiny = 1e-300
+    (qab, qap, qam) = (a + b, a + 1.0, a - 1.0)
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in xrange( 1, 301 ):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 3e-12:
+            break
+    return h
+
+def incomplete_beta( a, b, x ):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp( math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                      a * math.log(x) + b * math.log(1.0 - x) )
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * beta_continued_fraction( a, b, x ) / a
+    return 1.0 - front * beta_continued_fraction( b, a, 1.0 - x ) / b
+
+def welch_t_test( a, b ):
+    """Two sided Welch's t-test. Returns (t, p). t > 0 means mean(a) > mean(b)."""
+    if len(a) < 2 or len(b) < 2:
+        return (0.0, 1.0)
+    (va, vb) = (stdev( a ) ** 2 / len(a), stdev( b ) ** 2 / len(b))
+    diff = mean( a ) - mean( b )
+    if va + vb == 0.0:
+        return (0.0, 1.0) if diff == 0.0 else (math.copysign( float("inf"), diff ), 0.0)
+    t = diff / math.sqrt( va + vb )
+    df = (va + vb) ** 2 / ( va ** 2 / (len(a) - 1) + vb ** 2 / (len(b) - 1) )
+    return (t, incomplete_beta( df / 2.0, 0.5, df / (df + t * t) ))
+
+class ConvergenceMonitor( object ):
+    """Watches the iteration results of a running benchmark.
+    Warmup ends with the first window of 'window' results whose coefficient
+    of variation is at most cov_threshold; the window itself counts as
+    warmup. Once there are at least min_steady results after it and the 95%
+    confidence interval on their mean is within ci_width (relative half
+    width), the run has converged and stop() is called. A run therefore
+    needs at least window + min_steady iterations to converge."""
+    def __init__( self,
+                  ci_width = 0.02,
+                  cov_threshold = 0.05,
+                  window = 5,
+                  min_steady = 5,
+                  stop = None ):
+        self.ci_width = ci_width
+        self.cov_threshold = cov_threshold
+        self.window = window
+        self.min_steady = max( min_steady, 2 )
+        self.stop = stop
+        self.warmup_iterations = None
+        self.converged = False
+
+    def find_warmup_end( self, runtimes ):
+        """The number of warmup iterations, up to and including the first
+        stable window, or None while there is no stable window yet."""
+        for start in xrange( 0, len(runtimes) - self.window + 1 ):
+            if coefficient_of_variation( runtimes[start:start + self.window] ) <= self.cov_threshold:
+                return start + self.window
+        return None
+
+    def __call__( self, runtimes ):
+        if self.converged:
+            return
+        if self.warmup_iterations == None:
+            self.warmup_iterations = self.find_warmup_end( runtimes )
+            if self.warmup_iterations == None:
+                return
+        steady = runtimes[self.warmup_iterations:]
+        if len(steady) < self.min_steady:
+            return
+        if ci95_halfwidth( steady ) <= self.ci_width * abs( mean( steady ) ):
+            self.converged = True
+            if self.stop != None:
+                self.stop()
+
+#
+# GC log parsing
+#
+# One stop-the-world pause. start is the JVM uptime in seconds, duration is
+# in msec and the heap sizes are in KB (None if the log line has no heap
+# transition).
+GcPause = collections.namedtuple( "GcPause", [ "kind", "start", "duration", "heap_before", "heap_after" ] )
+
+gc_size_pattern = r"(\d+(?:\.\d+)?[BKMG]?)"
+gc_size_units = { "B" : 1.0 / 1024, "K" : 1.0, "M" : 1024.0, "G" : 1024.0 * 1024.0 }
+# Unified logging (JDK 9+):
+#     [1.234s][info][gc] GC(3) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms
+#     [1.234s][info][gc] GC(0) Pause Init Mark 0.123ms
+gc_unified_time_re = re.compile( r"\[(\d+\.\d+)s\]" )
+gc_unified_pause_re = re.compile( r"\b(Pause [^\[]*?)\s+(?:%s->%s\(%s\)\s+)?(\d+(?:\.\d+)?)ms\s*$" %
+                                  (gc_size_pattern, gc_size_pattern, gc_size_pattern) )
+# -XX:+PrintGCTimeStamps style (JDK 8), optionally preceded by a date stamp:
+#     1.234: [Pause Final Mark 100M->90M(2048M), 1.234 ms]
+#     2.345: [GC pause (G1 Evacuation Pause) (young), 0.0123456 secs]
+#     3.456: [GC (Allocation Failure) [PSYoungGen: 1234K->123K(2345K)] 1234K->567K(8901K), 0.0012345 secs]
+#     4.567: [Full GC (Ergonomics) [PSYoungGen: ...] 1234K->567K(8901K), [Metaspace: ...], 0.123 secs]
+gc_legacy_time_re = re.compile( r"(\d+\.\d+): \[" )
+gc_legacy_kind_re = re.compile( r"\d+\.\d+: \[(Pause [A-Za-z ]*[A-Za-z]|GC pause|GC remark|GC cleanup|Full GC|GC)\b" )
+gc_legacy_ms_re = re.compile( r", (\d+(?:\.\d+)?) ms\]" )
+gc_legacy_secs_re = re.compile( r", (\d+(?:\.\d+)?) secs\]" )
+gc_transition_re = re.compile( r"%s->%s\(%s\)" % (gc_size_pattern, gc_size_pattern, gc_size_pattern) )
+gc_metaspace_re = re.compile( r"\[(?:Metaspace|PSPermGen|CMS Perm ): [^\]]*\]" )
+# G1 with PrintGCDetails reports the heap on a later line:
+#     [Eden: 24.0M(24.0M)->0.0B(21.0M) Survivors: 0.0B->3072.0K Heap: 24.0M(256.0M)->4.5M(256.0M)]
+gc_g1_heap_re = re.compile( r"Heap: %s\(%s\)->%s\(%s\)" %
+                            (gc_size_pattern, gc_size_pattern, gc_size_pattern, gc_size_pattern) )
+gc_parens_re = re.compile( r"\s*\([^)]*\)" )
+
+def gc_size_to_kb( text ):
+    if text[-1] in gc_size_units:
+        return float( text[:-1] ) * gc_size_units[text[-1]]
+    return float( text ) / 1024
+
+def gc_pause_kind( text ):
+    """'Pause Young (Normal) (G1 Evacuation Pause)' -> 'Pause Young'"""
+    return gc_parens_re.sub( "", text ).strip()
+
+def parse_gc_line( line ):
+    """Returns (GcPause or None, timestamp or None) for one log line."""
+    match = gc_unified_time_re.search( line )
+    if match != None:
+        start = float( match.group(1) )
+        pmatch = gc_unified_pause_re.search( line )
+        if pmatch == None:
+            return (None, start)
+        (kind, before, after, _, duration) = pmatch.groups()
+        return ( GcPause( gc_pause_kind(kind),
+                          start,
+                          float(duration),
+                          (gc_size_to_kb(before) if before != None else None),
+                          (gc_size_to_kb(after) if after != None else None) ),
+                 start )
+    match = gc_legacy_time_re.search( line )
+    if match == None:
+        return (None, None)
+    start = float( match.group(1) )
+    kmatch = gc_legacy_kind_re.search( line )
+    if kmatch == None or "concurrent" in line[kmatch.end():kmatch.end() + 12]:
+        return (None, start)
+    kind = kmatch.group(1).strip()
+    body = gc_metaspace_re.sub( "", line[kmatch.end():] )
+    if kind.startswith( "Pause " ):
+        dmatches = gc_legacy_ms_re.findall( body )
+        scale = 1.0
+    else:
+        # The outermost duration is the last one on the line; G1 remark
+        # nests the durations of its sub phases.
+        dmatches = gc_legacy_secs_re.findall( body.split( "[Times:" )[0] )
+        scale = 1000.0
+    if not dmatches:
+        return (None, start)
+    duration = float( dmatches[-1] ) * scale
+    transitions = gc_transition_re.findall( body )
+    (before, after) = (None, None)
+    if transitions:
+        before = gc_size_to_kb( transitions[-1][0] )
+        after = gc_size_to_kb( transitions[-1][1] )
+    return ( GcPause( kind, start, duration, before, after ), start )
+
+def iter_gc_pauses( lines ):
+    """Generates GcPause records from an iterable of GC log lines. Only one
+    record is held at a time so this works on logs of any size."""
+    pending = None
+    for line in lines:
+        (pause, start) = parse_gc_line( line )
+        if pause != None or start != None:
+            if pending != None:
+                yield pending
+                pending = None
+            if pause != None:
+                if pause.heap_before == None and pause.kind.startswith( "GC pause" ):
+                    # G1 -XX:+PrintGCDetails: heap sizes follow on a later line.
+                    pending = pause
+                else:
+                    yield pause
+        elif pending != None:
+            match = gc_g1_heap_re.search( line )
+            if match != None:
+                yield pending._replace( heap_before = gc_size_to_kb( match.group(1) ),
+                                        heap_after = gc_size_to_kb( match.group(3) ) )
+                pending = None
+    if pending != None:
+        yield pending
+
+def percentile( sorted_values, fraction ):
+    """Nearest rank percentile of an already sorted sequence."""
+    if len(sorted_values) == 0:
+        return None
+    rank = int( math.ceil( fraction * len(sorted_values) ) )
+    return sorted_values[ min( max(rank, 1), len(sorted_values) ) - 1 ]
+
+def compute_pause_stats( pauses = None,
+                         wall_time = None ):
+    """Summarizes an iterable of GcPause records into the gc_* result columns.
+    Only the pause durations are kept, in a compact double array.
+    GC throughput is the fraction of wall_time (seconds) not spent in pauses.
+    Without a wall_time, the end of the last pause is used instead."""
+    durations = array( "d" )
+    end = 0.0
+    for pause in pauses:
+        durations.append( pause.duration )
+        end = max( end, pause.start + pause.duration / 1000.0 )
+    ordered = sorted( durations )
+    total = math.fsum( durations )
+    elapsed = wall_time if wall_time else end
+    return { "gc_pause_count" : len(ordered),
+             "gc_pause_total_ms" : total,
+             "gc_pause_p50_ms" : percentile( ordered, 0.50 ),
+             "gc_pause_p99_ms" : percentile( ordered, 0.99 ),
+             "gc_pause_p999_ms" : percentile( ordered, 0.999 ),
+             "gc_pause_max_ms" : (ordered[-1] if ordered else None),
+             "gc_throughput" : ((1.0 - total / 1000.0 / elapsed) if elapsed > 0 else None) }
+
+def gc_log_stats( gc_logfile = None,
+                  wall_time = None,
+                  window = None ):
+    """Streams gc_logfile through iter_gc_pauses and compute_pause_stats.
+    With a (start, end) window in seconds of JVM uptime, only the pauses that
+    start inside it are counted. Returns None if the log does not exist."""
+    if gc_logfile == None or not os.path.isfile( gc_logfile ):
+        return None
+    with open( gc_logfile ) as fp:
+        pauses = iter_gc_pauses( fp )
+        if window != None:
+            pauses = ( x for x in pauses
+                       if x.start != None and window[0] <= x.start < window[1] )
+        return compute_pause_stats( pauses = pauses,
+                                    wall_time = wall_time )
+
+def chain_line_callbacks( callbacks ):
+    """Returns a line callback that calls every callback in the list."""
+    callbacks = [ x for x in callbacks if x != None ]
+    def line_callback( stream_name, line ):
+        for callback in callbacks:
+            callback( stream_name, line )
+    return line_callback
+
+#
+# Resource sampling
+#
+# Fields of one resource sample. A run's samples are stored interleaved in
+# one double array, and written to <run>-resources.bin with array.tofile.
+resource_sample_fields = [ "time", "rss_kb", "utime_s", "stime_s", "ctxt_voluntary",
+                           "ctxt_involuntary", "major_faults", "run_delay_s" ]
+clock_ticks = float( os.sysconf( "SC_CLK_TCK" ) )
+
+def read_proc_stat( pid ):
+    """Returns (utime_s, stime_s, major_faults) of the whole process."""
+    with open( "/proc/%d/stat" % pid ) as fp:
+        text = fp.read()
+    # The command name may contain spaces, so split after it.
+    fields = text[ text.rindex(")") + 2: ].split()
+    return ( int(fields[11]) / clock_ticks,
+             int(fields[12]) / clock_ticks,
+             int(fields[9]) )
+
+def read_proc_status( path ):
+    result = {}
+    with open( path ) as fp:
+        for line in fp:
+            (name, _, value) = line.partition( ":" )
+            if name in ( "VmRSS", "VmHWM", "voluntary_ctxt_switches", "nonvoluntary_ctxt_switches" ):
+                result[name] = int( value.split()[0] )
+    return result
+
+def wait_with_rusage( proc ):
+    """Reaps proc like proc.wait() and returns (returncode, rusage), where
+    rusage covers every thread the process ever had."""
+    while True:
+        try:
+            (_, status, rusage) = os.wait4( proc.pid, 0 )
+            break
+        except OSError as e:
+            if e.errno != errno.EINTR:
+                raise
+    if os.WIFSIGNALED( status ):
+        proc.returncode = -os.WTERMSIG( status )
+    else:
+        proc.returncode = os.WEXITSTATUS( status )
+    return (proc.returncode, rusage)
+
+class ResourceSampler( object ):
+    """Samples /proc/<pid>/stat, status and schedstat of a running JVM every
+    'interval' seconds in a background thread. Context switches and run
+    delay are summed over the JVM's live threads, so threads that already
+    exited drop out of later samples; pass the rusage of the reaped JVM to
+    summary() for exact totals. Only a handful of small
+    files are read per sample, so at the default interval of one second
+    the sampler stays far below 1% of a CPU; the time spent sampling is
+    reported as sampler_overhead."""
+    def __init__( self,
+                  pid = None,
+                  interval = 1.0 ):
+        self.pid = pid
+        self.interval = interval
+        self.samples = array( "d" )
+        self.peak_rss_kb = 0
+        self.sampling_time = 0.0
+        self.start_time = time.time()
+        self.done = threading.Event()
+        self.thread = threading.Thread( target = self._run )
+        self.thread.daemon = True
+
+    def start( self ):
+        self.thread.start()
+
+    def _run( self ):
+        while not self.done.is_set():
+            self.sample()
+            self.done.wait( self.interval )
+
+    def sample( self ):
+        begin = time.time()
+        try:
+            (utime, stime, majflt) = read_proc_stat( self.pid )
+            status = read_proc_status( "/proc/%d/status" % self.pid )
+            (voluntary, involuntary, run_delay) = (0, 0, 0)
+            taskdir = "/proc/%d/task" % self.pid
+            for tid in os.listdir( taskdir ):
+                try:
+                    task_status = read_proc_status( os.path.join( taskdir, tid, "status" ) )
+                    voluntary += task_status.get( "voluntary_ctxt_switches", 0 )
+                    involuntary += task_status.get( "nonvoluntary_ctxt_switches", 0 )
+                    with open( os.path.join( taskdir, tid, "schedstat" ) ) as fp:
+                        run_delay += int( fp.read().split()[1] )
+                except (IOError, OSError):
+                    # Thread exited while we were looking at it.
+                    pass
+        except (IOError, OSError, ValueError):
+            # The process is gone.
+            return
+        self.peak_rss_kb = max( self.peak_rss_kb, status.get( "VmHWM", 0 ), status.get( "VmRSS", 0 ) )
+        self.samples.extend( [ begin - self.start_time, status.get( "VmRSS", 0 ), utime, stime,
+                               voluntary, involuntary, majflt, run_delay / 1e9 ] )
+        self.sampling_time += time.time() - begin
+
+    def stop( self ):
+        """Takes a final sample and stops the sampling thread. Call this
+        before reaping the process, while /proc/<pid> still exists."""
+        self.done.set()
+        self.thread.join()
+        self.sample()
+
+    def save( self, path ):
+        with open( path, "wb" ) as fp:
+            self.samples.tofile( fp )
+
+    def summary( self, rusage = None ):
+        """Totals over the run: from rusage (of os.wait4) where it has them,
+        else the largest value of any sample."""
+        width = len(resource_sample_fields)
+        count = len(self.samples) // width
+        if count == 0:
+            return {}
+        peak = [ max( self.samples[i::width] ) for i in xrange( width ) ]
+        rss = [ x for x in self.samples[1::width] if x > 0 ]
+        elapsed = time.time() - self.start_time
+        result = { "rss_peak_kb" : self.peak_rss_kb,
+                   "rss_mean_kb" : (mean( rss ) if rss else None),
+                   "cpu_user_s" : peak[2],
+                   "cpu_system_s" : peak[3],
+                   "ctxt_voluntary" : int(peak[4]),
+                   "ctxt_involuntary" : int(peak[5]),
+                   "major_faults" : int(peak[6]),
+                   # Not in rusage.
+                   "run_delay_s" : peak[7],
+                   "sampler_overhead" : (self.sampling_time / elapsed if elapsed > 0 else None) }
+        if rusage != None:
+            result.update( { "cpu_user_s" : rusage.ru_utime,
+                             "cpu_system_s" : rusage.ru_stime,
+                             "ctxt_voluntary" : rusage.ru_nvcsw,
+                             "ctxt_involuntary" : rusage.ru_nivcsw,
+                             "major_faults" : rusage.ru_majflt } )
+        return result
+
+#
+# Profiling
+#
+# Profiled runs are extra repetitions of a sampled subset of the sweep's
+# configurations, so that the profilers' overhead never shows up in the
+# timing runs. Their rows carry the profiling modes in the "profile" column.
+# The modes:
+#     perf-stat       perf stat hardware and software counters of the JVM
+#     perf-record     perf record call graph samples of the whole JVM
+#     perf-record-gc  perf record samples of the GC threads only
+#     jfr             a Java Flight Recorder recording
+#     safepoint       safepoint logging, in the GC log on JDK 8
+# perf is attached to the running JVM, so JVM startup is not profiled. The
+# artifacts are kept next to the gc log as <run>-perf-stat.txt, <run>-perf.data,
+# <run>-perf.log (perf's own messages), <run>.jfr and <run>-safepoint.log.
+profile_modes = [ "perf-stat", "perf-record", "perf-record-gc", "jfr", "safepoint" ]
+perf_events = [ "task-clock", "context-switches", "cpu-migrations", "page-faults", "cycles",
+                "instructions", "cache-references", "cache-misses", "branch-misses" ]
+perf_record_frequency = 499
+# How long to wait for the JVM to start its GC threads for perf-record-gc.
+gc_thread_wait = 5.0
+# Native thread names (15 characters at most) that JDK 9+ gives its threads.
+# JDK 8 names all of them "java".
+gc_thread_re = re.compile( r"^(GC Thread|G1 |Shenandoah|ZGC|Z |CMS|Par|PS |VM Periodic)" )
+vm_thread_re = re.compile( r"^VM Thread" )
+compiler_thread_re = re.compile( r"^C[12] CompilerThre" )
+# JDK 8 -XX:+PrintGCApplicationStoppedTime and JDK 9-16 -Xlog:safepoint:
+#     Total time for which application threads were stopped: 0.0001234 seconds, Stopping threads took: 0.0000123 seconds
+# JDK 17+ -Xlog:safepoint:
+#     Safepoint "G1CollectForAllocation", Time since last: 18480917 ns, Reaching safepoint: 172800 ns, At safepoint: 5042700 ns, Total: 5215500 ns
+safepoint_stopped_re = re.compile( r"Total time for which application threads were stopped: "
+                                   r"(\d+(?:\.\d+)?) seconds(?:, Stopping threads took: (\d+(?:\.\d+)?) seconds)?" )
+safepoint_ns_re = re.compile( r"Safepoint \"[^\"]*\".*Reaching safepoint: (\d+) ns.*Total: (\d+) ns" )
+java_version_re = re.compile( r"version \"(?:1\.)?(\d+)" )
+java_versions = {}
+
+def parse_profile_modes( text ):
+    """'perf-stat,jfr' -> ("perf-stat", "jfr"). Exits on unknown modes."""
+    modes = tuple( [ x.strip() for x in text.split( "," ) if x.strip() ] )
+    for mode in modes:
+        if mode not in profile_modes:
+            print "Unknown profiling mode: %s (choose from %s)" % (mode, ", ".join( profile_modes ))
+            exit(2)
+    if "perf-record" in modes and "perf-record-gc" in modes:
+        print "Choose one of perf-record and perf-record-gc."
+        exit(2)
+    return modes
+
+def is_profile_sample( run_config = None,
+                       fraction = None ):
+    """True for the configurations that get a profiled run. Decided by a
+    hash of the run's file names, so the same ones are picked on --resume."""
+    digest = hashlib.sha1( get_run_label( **run_config ) ).hexdigest()
+    return int( digest[:8], 16 ) < fraction * 0x100000000
+
+def make_profile_runs( run_list = None,
+                       modes = None,
+                       fraction = None ):
+    """Profiled copies of the sampled configurations in run_list, as their
+    own repetitions. They are never retried."""
+    profile_runs = []
+    for run_config in run_list:
+        if not is_profile_sample( run_config = run_config,
+                                  fraction = fraction ):
+            continue
+        profile_config = dict( run_config )
+        profile_config["profile"] = modes
+        profile_config["retries"] = 0
+        profile_runs.append( profile_config )
+    return profile_runs
+
+def get_java_major_version( java_path ):
+    """8 for 1.8.0_252, 11 for 11.0.7. None if 'java -version' fails."""
+    if java_path == None:
+        return None
+    if java_path not in java_versions:
+        version = None
+        try:
+            javaproc = subprocess.Popen( [ java_path, "-version" ],
+                                         stdout = subprocess.PIPE,
+                                         stdin = subprocess.PIPE,
+                                         stderr = subprocess.PIPE )
+            output = javaproc.communicate()
+            match = java_version_re.search( output[0] + output[1] )
+            if match != None:
+                version = int( match.group(1) )
+        except OSError:
+            pass
+        java_versions[java_path] = version
+    return java_versions[java_path]
+
+def get_thread_names( pid ):
+    """{ tid : name } of the threads of a running process."""
+    names = {}
+    taskdir = "/proc/%d/task" % pid
+    try:
+        tids = os.listdir( taskdir )
+    except OSError:
+        return names
+    for tid in tids:
+        try:
+            with open( os.path.join( taskdir, tid, "comm" ) ) as fp:
+                names[int(tid)] = fp.read().strip()
+        except (IOError, OSError):
+            # Thread exited while we were looking at it.
+            pass
+    return names
+
+class Profiler( object ):
+    """Profiles one JVM run with the given modes (see profile_modes).
+    jvm_flags() are added to the JVM's command line, attach( pid ) starts
+    perf once the JVM is running and detach() stops it when the JVM has
+    exited. files maps the kinds of artifacts to their paths in 'directory'."""
+    def __init__( self,
+                  modes = (),
+                  directory = None,
+                  run_label = None,
+                  java_path = None,
+                  cpuset = None,
+                  printgcdetails = False,
+                  gc_logfile = None,
+                  output_file = None ):
+        self.modes = modes
+        self.directory = directory
+        self.run_label = run_label
+        self.cpuset = cpuset
+        self.procs = []
+        self.thread = None
+        self.detaching = threading.Event()
+        self.log = None
+        self.files = {}
+        self.flags = []
+        if "jfr" in modes:
+            self.files["jfr"] = self._path( ".jfr" )
+            self.flags.append( "-XX:StartFlightRecording=filename=%s,settings=profile" %
+                               (run_label + ".jfr") )
+        if "safepoint" in modes:
+            if (get_java_major_version( java_path ) or 8) >= 9:
+                self.files["safepoint"] = self._path( "-safepoint.log" )
+                self.flags.append( "-Xlog:safepoint=info:file=%s:uptime" % (run_label + "-safepoint.log") )
+            else:
+                # JDK 8 writes these to the GC log, or to stdout without one.
+                self.files["safepoint"] = gc_logfile if printgcdetails else output_file
+                self.flags.append( "-XX:+PrintGCApplicationStoppedTime" )
+        if "perf-stat" in modes:
+            self.files["perf_stat"] = self._path( "-perf-stat.txt" )
+        if "perf-record" in modes or "perf-record-gc" in modes:
+            self.files["perf_data"] = self._path( "-perf.data" )
+
+    def _path( self, suffix ):
+        return os.path.join( self.directory, self.run_label + suffix )
+
+    def jvm_flags( self ):
+        return list( self.flags )
+
+    def _start( self, cmd ):
+        if self.cpuset != None:
+            # perf's own work stays on the run's CPUs.
+            cmd = [ "taskset", "-c", ",".join( [ str(x) for x in self.cpuset ] ) ] + cmd
+        print "PROFILE:", cmd
+        try:
+            self.procs.append( subprocess.Popen( cmd,
+                                                 stdout = self.log,
+                                                 stderr = self.log,
+                                                 stdin = open( os.devnull ) ) )
+        except OSError as e:
+            print "WARNING: Can not start perf: %s" % str(e)
+
+    def attach( self, pid ):
+        if "perf_stat" not in self.files and "perf_data" not in self.files:
+            return
+        if find_executable( "perf" ) == None:
+            print "WARNING: perf is not installed; profiling without it."
+            return
+        self.files["perf_log"] = self._path( "-perf.log" )
+        self.log = open( self.files["perf_log"], "w" )
+        if "perf_stat" in self.files:
+            self._start( [ "perf", "stat", "-x,",
+                           "-e", ",".join( perf_events ),
+                           "-o", self.files["perf_stat"],
+                           "-p", str(pid) ] )
+        if "perf_data" in self.files:
+            if "perf-record-gc" in self.modes:
+                # In the background, as the caller has the JVM's output to drain.
+                self.thread = threading.Thread( target = self._record_gc_threads, args = (pid,) )
+                self.thread.daemon = True
+                self.thread.start()
+            else:
+                self._record( [ "-p", str(pid) ] )
+
+    def _record( self, target ):
+        self._start( [ "perf", "record", "-g",
+                       "-F", str(perf_record_frequency),
+                       "-o", self.files["perf_data"] ] + target )
+
+    def _record_gc_threads( self, pid ):
+        """Samples the GC threads that the JVM has started within
+        gc_thread_wait seconds. Collectors that start worker threads on
+        demand may add more later, which perf -t does not follow."""
+        deadline = time.time() + gc_thread_wait
+        while True:
+            tids = sorted( [ tid for (tid, name) in get_thread_names( pid ).items()
+                             if gc_thread_re.match( name ) ] )
+            if tids or time.time() > deadline:
+                break
+            if self.detaching.wait( 0.1 ):
+                # The JVM is already done.
+                return
+        if tids:
+            self._record( [ "-t", ",".join( [ str(x) for x in tids ] ) ] )
+        else:
+            print "WARNING: No named GC threads (JDK 8?); sampling the whole JVM."
+            self._record( [ "-p", str(pid) ] )
+
+    def detach( self ):
+        """Stops perf like ^C does, so that it writes out what it has."""
+        self.detaching.set()
+        if self.thread != None:
+            self.thread.join()
+        for proc in self.procs:
+            if proc.poll() == None:
+                os.kill( proc.pid, signal.SIGINT )
+        for proc in self.procs:
+            for retry in xrange( 300 ):
+                if proc.poll() != None:
+                    break
+                time.sleep( 0.1 )
+            else:
+                print "WARNING: perf did not stop; killing it."
+                proc.kill()
+                proc.wait()
+        if self.log != None:
+            self.log.close()
+
+def parse_perf_stat( path ):
+    """Counters from 'perf stat -x,' output, by event name."""
+    counters = {}
+    with open( path ) as fp:
+        for line in fp:
+            fields = line.strip().split( "," )
+            if len(fields) < 3 or line.startswith( "#" ):
+                continue
+            try:
+                value = float( fields[0] )
+            except ValueError:
+                # <not supported> or <not counted>
+                continue
+            # cycles:u when perf may only count user space.
+            counters[ fields[2].split( ":" )[0] ] = value
+    return counters
+
+def perf_thread_shares( path ):
+    """Percentage of perf record samples per thread name, via perf report."""
+    if find_executable( "perf" ) == None:
+        return None
+    try:
+        perfproc = subprocess.Popen( [ "perf", "report", "-i", path, "--stdio", "--no-children",
+                                       "--sort", "comm", "-g", "none" ],
+                                     stdout = subprocess.PIPE,
+                                     stdin = open( os.devnull ),
+                                     stderr = subprocess.PIPE )
+        (output, errors) = perfproc.communicate()
+    except OSError:
+        return None
+    if perfproc.returncode != 0:
+        return None
+    shares = {}
+    for line in output.splitlines():
+        match = re.match( r"^\s*(\d+(?:\.\d+)?)%\s+(.*\S)\s*$", line )
+        if match != None:
+            shares[match.group(2)] = shares.get( match.group(2), 0.0 ) + float( match.group(1) )
+    return shares
+
+def parse_safepoint_log( path ):
+    """Safepoint count, total and longest pause and longest time to safepoint."""
+    pauses = []
+    ttsp = []
+    with open( path ) as fp:
+        for line in fp:
+            match = safepoint_stopped_re.search( line )
+            if match != None:
+                pauses.append( float( match.group(1) ) * 1000.0 )
+                if match.group(2) != None:
+                    ttsp.append( float( match.group(2) ) * 1000.0 )
+                continue
+            match = safepoint_ns_re.search( line )
+            if match != None:
+                pauses.append( int( match.group(2) ) / 1e6 )
+                ttsp.append( int( match.group(1) ) / 1e6 )
+    return { "safepoint_count" : len(pauses),
+             "safepoint_total_ms" : sum( pauses ),
+             "safepoint_max_ms" : (max( pauses ) if pauses else None),
+             "safepoint_ttsp_max_ms" : (max( ttsp ) if ttsp else None) }
+
+def counter_ratio( a, b ):
+    return a / b if a != None and b else None
+
+def profile_stats( result = None ):
+    """Result columns summarizing the profiling artifacts of a run. Empty
+    for runs that were not profiled or whose artifacts are missing."""
+    files = result.get( "profile_files" ) or {}
+    stats = {}
+    path = files.get( "perf_stat" )
+    if path != None and os.path.isfile( path ):
+        counters = parse_perf_stat( path )
+        stats.update( { "perf_cycles" : counters.get( "cycles" ),
+                        "perf_instructions" : counters.get( "instructions" ),
+                        "perf_ipc" : counter_ratio( counters.get( "instructions" ), counters.get( "cycles" ) ),
+                        "perf_cache_misses" : counters.get( "cache-misses" ),
+                        "perf_cache_miss_rate" : counter_ratio( counters.get( "cache-misses" ),
+                                                                counters.get( "cache-references" ) ),
+                        "perf_branch_misses" : counters.get( "branch-misses" ),
+                        "perf_context_switches" : counters.get( "context-switches" ),
+                        "perf_cpu_migrations" : counters.get( "cpu-migrations" ),
+                        "perf_page_faults" : counters.get( "page-faults" ) } )
+    path = files.get( "perf_data" )
+    if path != None and os.path.isfile( path ):
+        shares = perf_thread_shares( path )
+        if shares:
+            stats.update( { "perf_gc_thread_pct" :
+                                sum( [ v for (k, v) in shares.items() if gc_thread_re.match( k ) ] ),
+                            "perf_vm_thread_pct" :
+                                sum( [ v for (k, v) in shares.items() if vm_thread_re.match( k ) ] ),
+                            "perf_compiler_thread_pct" :
+                                sum( [ v for (k, v) in shares.items() if compiler_thread_re.match( k ) ] ) } )
+    path = files.get( "safepoint" )
+    if path != None and os.path.isfile( path ):
+        stats.update( parse_safepoint_log( path ) )
+    path = files.get( "jfr" )
+    if path != None and os.path.isfile( path ):
+        stats["jfr_kb"] = os.path.getsize( path ) // 1024
+    return stats
+
+#
+# Run environment
+#
+# Settings of the machine that change benchmark results. They are recorded
+# with every result and compared with the sweep's baseline before each run.
+environment_fields = [ "cpu_governor", "turbo", "thp", "thp_defrag", "isolated_cpus", "kernel" ]
+# Defaults of the pre-run quiescence gate, see check_environment.
+default_quiesce = { "gate" : False,
+                    "max_load" : 0.1,
+                    "max_busy" : 0.05,
+                    "max_pressure" : 1.0,
+                    "max_wait" : 60.0,
+                    "check_load" : True,
+                    "pause" : 0.0,
+                    "drop_caches" : False,
+                    "baseline" : None,
+                    "on_mismatch" : "flag" }
+
+def read_sysfs( path ):
+    """Contents of a small /sys or /proc file, or "" if it can not be read."""
+    try:
+        with open( path ) as fp:
+            return fp.read().strip()
+    except IOError:
+        return ""
+
+def get_selected_option( text ):
+    """'always [madvise] never' -> 'madvise'."""
+    match = re.search( r"\[(\S+)\]", text )
+    return match.group(1) if match != None else text
+
+def get_environment():
+    """Returns a dictionary with the environment_fields of this machine.
+    Fields that can not be read are empty."""
+    governors = set()
+    cpufreq = "/sys/devices/system/cpu"
+    for name in os.listdir( cpufreq ) if os.path.isdir( cpufreq ) else []:
+        if re.match( r"cpu\d+$", name ):
+            governor = read_sysfs( os.path.join( cpufreq, name, "cpufreq", "scaling_governor" ) )
+            if governor != "":
+                governors.add( governor )
+    no_turbo = read_sysfs( "/sys/devices/system/cpu/intel_pstate/no_turbo" )
+    boost = read_sysfs( "/sys/devices/system/cpu/cpufreq/boost" )
+    if no_turbo != "":
+        turbo = "off" if no_turbo == "1" else "on"
+    elif boost != "":
+        turbo = "on" if boost == "1" else "off"
+    else:
+        turbo = ""
+    return { "cpu_governor" : ",".join( sorted( governors ) ),
+             "turbo" : turbo,
+             "thp" : get_selected_option( read_sysfs( "/sys/kernel/mm/transparent_hugepage/enabled" ) ),
+             "thp_defrag" : get_selected_option( read_sysfs( "/sys/kernel/mm/transparent_hugepage/defrag" ) ),
+             "isolated_cpus" : read_sysfs( "/sys/devices/system/cpu/isolated" ),
+             "kernel" : os.uname()[2] }
+
+def read_cpu_times( cpus = None ):
+    """Returns (busy, total) jiffies summed over the CPUs in the list, or
+    over all CPUs if cpus is None."""
+    busy = 0
+    total = 0
+    with open( "/proc/stat" ) as fp:
+        for line in fp:
+            fields = line.split()
+            if not fields or not fields[0].startswith( "cpu" ):
+                continue
+            if cpus == None:
+                if fields[0] != "cpu":
+                    continue
+            elif fields[0] == "cpu" or int(fields[0][3:]) not in cpus:
+                continue
+            values = [ int(x) for x in fields[1:] ]
+            # idle and iowait
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            # guest time is already part of user time.
+            used = sum( values[:8] )
+            busy += used - idle
+            total += used
+    return (busy, total)
+
+def read_pressure( resource ):
+    """The 'some avg10' stall percentage from /proc/pressure/<resource>, or
+    None on kernels without PSI."""
+    match = re.search( r"some avg10=([0-9.]+)", read_sysfs( "/proc/pressure/" + resource ) )
+    return float( match.group(1) ) if match != None else None
+
+def drop_page_caches():
+    """Drops the page cache if we are allowed to. Returns True if it worked."""
+    try:
+        subprocess.call( [ "sync" ] )
+        with open( "/proc/sys/vm/drop_caches", "w" ) as fp:
+            fp.write( "3\n" )
+        return True
+    except (IOError, OSError):
+        return False
+
+def check_environment( quiesce = None,
+                       cpuset = None ):
+    """Called before every run with the sweep's quiesce options (see
+    default_quiesce). Sleeps for the 'pause', drops the page cache if asked
+    to and, with 'gate', waits up to 'max_wait' seconds until the run's CPUs
+    (all CPUs without a cpuset) are less than 'max_busy' busy, memory
+    pressure is below 'max_pressure' percent and, with 'check_load', the
+    load average per CPU is below 'max_load'. Returns (ok, info): info has
+    the environment and gate columns of the result, and ok is False if the
+    environment differs from the 'baseline' and 'on_mismatch' is 'refuse'.
+    Measuring how busy the CPUs are takes a second, so without 'gate' only
+    the load average and memory pressure are recorded."""
+    quiesce = dict( default_quiesce, **(quiesce if quiesce != None else {}) )
+    if quiesce["pause"] > 0:
+        time.sleep( quiesce["pause"] )
+    if quiesce["drop_caches"] and not drop_page_caches():
+        print "WARNING: Can not drop the page cache. Needs root."
+    info = get_environment()
+    start = time.time()
+    quiet = True
+    while True:
+        info["cpu_busy_before"] = None
+        if quiesce["gate"]:
+            (busy0, total0) = read_cpu_times( cpuset )
+            time.sleep( 1.0 )
+            (busy1, total1) = read_cpu_times( cpuset )
+            info["cpu_busy_before"] = float( busy1 - busy0 ) / max( total1 - total0, 1 )
+        info["load_before"] = os.getloadavg()[0] / multiprocessing.cpu_count()
+        info["mem_pressure_before"] = read_pressure( "memory" )
+        if not quiesce["gate"]:
+            break
+        quiet = ( info["cpu_busy_before"] <= quiesce["max_busy"] and
+                  ( not quiesce["check_load"] or info["load_before"] <= quiesce["max_load"] ) and
+                  ( info["mem_pressure_before"] == None or
+                    info["mem_pressure_before"] <= quiesce["max_pressure"] ) )
+        if quiet or time.time() - start > quiesce["max_wait"]:
+            break
+    info["quiesce_wait_s"] = time.time() - start
+    info["quiet"] = int(quiet) if quiesce["gate"] else ""
+    if not quiet:
+        print "WARNING: Machine not quiet after %.0f seconds (busy %.2f, load %.2f, memory pressure %s)" % \
+            (info["quiesce_wait_s"], info["cpu_busy_before"], info["load_before"], info["mem_pressure_before"])
+    changed = []
+    if quiesce["baseline"] != None:
+        changed = [ x for x in environment_fields
+                    if info[x] != quiesce["baseline"].get( x, info[x] ) ]
+    info["env_matches"] = int( not changed )
+    if changed:
+        print "WARNING: Environment differs from the sweep's baseline: %s" % \
+            ", ".join( [ "%s %s -> %s" % (x, quiesce["baseline"][x], info[x]) for x in changed ] )
+    return ( not changed or quiesce["on_mismatch"] != "refuse", info )
+
+#
+# Failure handling
+#
+# Run outcomes, from most to least specific. Only "ok" counts as passed.
+run_status_list = [ "ok", "timeout", "hang", "crash", "oom", "dacapo_failed", "specjvm_invalid", "error",
+                    "env_changed" ]
+# Seconds between SIGTERM and SIGKILL when we stop a JVM.
+kill_grace_period = 10.0
+
+def kill_process_group( proc = None,
+                        grace = kill_grace_period ):
+    """Sends SIGTERM to the process group of proc (started with os.setsid)
+    and SIGKILL after 'grace' seconds. Does not wait. Returns the timer for
+    the SIGKILL, which the caller cancels once proc has been reaped."""
+    def send( sig ):
+        try:
+            os.killpg( proc.pid, sig )
+        except OSError:
+            # Already gone.
+            pass
+    send( signal.SIGTERM )
+    timer = threading.Timer( grace, send, args = ( signal.SIGKILL, ) )
+    timer.daemon = True
+    timer.start()
+    return timer
+
+class JvmRegistry( object ):
+    """The JVMs in flight. They run in their own session, so a ^C to the
+    harness does not reach them; stop_all() stops them instead, and from
+    then on no new JVM is started."""
+    def __init__( self ):
+        self.lock = threading.Lock()
+        self.procs = set()
+        self.stopping = False
+
+    def start( self, cmd, **kwargs ):
+        """subprocess.Popen( cmd, **kwargs ) in a new session. Raises
+        KeyboardInterrupt once stop_all() has been called."""
+        with self.lock:
+            if self.stopping:
+                raise KeyboardInterrupt()
+            proc = subprocess.Popen( cmd, preexec_fn = os.setsid, **kwargs )
+            self.procs.add( proc )
+        return proc
+
+    def finished( self, proc ):
+        with self.lock:
+            self.procs.discard( proc )
+
+    def stop_all( self ):
+        with self.lock:
+            self.stopping = True
+            procs = list( self.procs )
+        if procs:
+            print "Stopping %d running JVMs." % len(procs)
+        timers = [ (x, kill_process_group( proc = x )) for x in procs ]
+        for (proc, timer) in timers:
+            proc.wait()
+            timer.cancel()
+            timer.join()
+
+running_jvms = JvmRegistry()
+
+class RunWatchdog( object ):
+    """Kills a JVM's process group if it runs longer than 'timeout' seconds or
+    prints nothing for 'hang_timeout' seconds. Used as a line callback to
+    notice output. 'reason' is 'timeout' or 'hang' once it has fired."""
+    def __init__( self,
+                  proc = None,
+                  timeout = None,
+                  hang_timeout = None ):
+        self.proc = proc
+        self.timeout = timeout
+        self.hang_timeout = hang_timeout
+        self.start_time = time.time()
+        self.last_output = self.start_time
+        self.reason = None
+        self.kill_timers = []
+        self.done = threading.Event()
+        self.thread = threading.Thread( target = self._run )
+        self.thread.daemon = True
+
+    def __call__( self, stream_name, line ):
+        self.last_output = time.time()
+
+    def start( self ):
+        if self.timeout != None or self.hang_timeout != None:
+            self.thread.start()
+
+    def stop( self ):
+        self.done.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _run( self ):
+        limits = [ x for x in (self.timeout, self.hang_timeout) if x != None ]
+        interval = min( 1.0, min( limits ) / 10.0 )
+        while not self.done.wait( interval ):
+            now = time.time()
+            if self.timeout != None and now - self.start_time > self.timeout:
+                self.reason = "timeout"
+            elif self.hang_timeout != None and now - self.last_output > self.hang_timeout:
+                self.reason = "hang"
+            if self.reason != None:
+                self.kill( self.reason )
+                return
+
+    def kill( self, reason = None ):
+        """Kills the JVM. reason is None when it is stopped on purpose."""
+        self.reason = reason
+        self.kill_timers.append( kill_process_group( self.proc ) )
+
+    def reaped( self ):
+        """Called once the JVM has been waited for."""
+        for timer in self.kill_timers:
+            timer.cancel()
+            # Lets it exit now rather than during interpreter shutdown.
+            timer.join()
+
+# hs_err file announced by a crashing HotSpot:
+#     # An error report file with more information is saved as:
+#     # /path/to/hs_err_pid1234.log
+hs_err_re = re.compile( r"(\S*hs_err_pid\d+\.log)" )
+
+class OutputScanner( object ):
+    """Line callback that looks for the signs of a failed run in the output."""
+    def __init__( self ):
+        self.oom = False
+        self.crash = False
+        self.hs_err = None
+        self.dacapo_failed = False
+        self.specjvm_invalid = False
+
+    def __call__( self, stream_name, line ):
+        if "java.lang.OutOfMemoryError" in line:
+            self.oom = True
+        elif "A fatal error has been detected by the Java Runtime Environment" in line:
+            self.crash = True
+        elif "hs_err_pid" in line:
+            match = hs_err_re.search( line )
+            if match != None:
+                self.crash = True
+                self.hs_err = match.group(1)
+        elif line.startswith( "===== DaCapo" ) and " FAILED " in line:
+            self.dacapo_failed = True
+        elif ( "Validation" in line and ("error" in line.lower() or "fail" in line.lower()) ) or \
+             "Invalid run" in line or "Run is invalid" in line:
+            self.specjvm_invalid = True
+
+def classify_run( result = None,
+                  scanner = None,
+                  killed_by = None ):
+    """Returns one of run_status_list for a finished run."""
+    if result["converged"] and result["runtimes"]:
+        # Stopped on purpose by --adaptive.
+        return "ok"
+    if killed_by != None:
+        return killed_by
+    if scanner.crash:
+        return "crash"
+    if scanner.oom:
+        return "oom"
+    if scanner.dacapo_failed:
+        return "dacapo_failed"
+    if scanner.specjvm_invalid:
+        return "specjvm_invalid"
+    if result["returncode"] != 0 or not result["runtimes"]:
+        return "crash" if result["returncode"] < 0 else "error"
+    return "ok"
+
+def make_refused_result( run_config = None ):
+    """Result of a run that check_environment did not let start."""
+    return { "benchmark" : run_config["benchmark"],
+             "output_file" : None,
+             "gc_logfile" : None,
+             "runtimes" : [],
+             "returncode" : None,
+             "wall_time" : None,
+             "converged" : False,
+             "warmup_iterations" : 1,
+             "resources" : None,
+             "resources_file" : None,
+             "status" : "env_changed",
+             "hs_err" : None,
+             "start_time" : None }
+
+def run_with_retries( run_config = None,
+                      cpuset = None,
+                      first_attempt = 0 ):
+    """Runs run_benchmark and repeats a failed run up to run_config["retries"]
+    times. Earlier attempts keep their output files under an -a<n> suffix.
+    first_attempt > 0 continues after attempts made elsewhere, e.g. in a batch.
+    Returns the result of the last attempt, with the number of attempts."""
+    run_config = dict( run_config )
+    retries = run_config.pop( "retries", 0 )
+    on_retry = run_config.pop( "on_retry", None )
+    quiesce = run_config.pop( "quiesce", None )
+    for attempt in xrange( first_attempt, max( retries + 1, first_attempt + 1 ) ):
+        (env_ok, environment) = (True, None) if run_config.get( "fake" ) else \
+                                check_environment( quiesce = quiesce, cpuset = cpuset )
+        if env_ok:
+            result = run_benchmark( cpuset = cpuset,
+                                    attempt = attempt,
+                                    **run_config )
+        else:
+            result = make_refused_result( run_config )
+        result["environment"] = environment
+        result["attempts"] = attempt + 1
+        if result["status"] in ("ok", "env_changed") or run_config.get( "fake" ):
+            break
+        print "Run %s failed with %s (attempt %d of %d)" % \
+            (result["output_file"], result["status"], attempt + 1, retries + 1)
+        if on_retry != None and attempt < retries:
+            on_retry( run_config, result )
+    return result
+
+# Longest chunk read from a JVM pipe in one go. Bounds the memory used per
+# stream even if the JVM writes a very long line without a newline.
+max_line_length = 64 * 1024
+
+def drain_pipe( pipe = None,
+                stream_name = None,
+                fptr = None,
+                lock = None,
+                line_callback = None ):
+    for line in iter( lambda: pipe.readline( max_line_length ), "" ):
+        with lock:
+            fptr.write( line )
+            if line_callback != None:
+                line_callback( stream_name, line )
+    pipe.close()
+
+def stream_process_output( proc = None,
+                           fptr = None,
+                           line_callback = None ):
+    """Drains the stdout and stderr pipes of proc line by line into fptr
+    until both are closed. One thread per pipe, so neither pipe can fill up
+    and block the JVM. Writes and callbacks are serialized by a lock, so
+    line_callback( stream_name, line ) does not need to be thread safe."""
+    lock = threading.Lock()
+    threads = []
+    for (pipe, stream_name) in [ (proc.stdout, "stdout"), (proc.stderr, "stderr") ]:
+        thread = threading.Thread( target = drain_pipe,
+                                   kwargs = { "pipe" : pipe,
+                                              "stream_name" : stream_name,
+                                              "fptr" : fptr,
+                                              "lock" : lock,
+                                              "line_callback" : line_callback } )
+        thread.daemon = True
+        thread.start()
+        threads.append( thread )
+    for thread in threads:
+        # Timed join so that KeyboardInterrupt still gets through.
+        while thread.is_alive():
+            thread.join( 1.0 )
+
+def get_run_label( benchmark = None,
+                   gc_algo = None,
+                   heuristic = None,
+                   min_heap = None,
+                   max_heap = None,
+                   par_gcthreads = None,
+                   conc_gcthreads = None,
+                   appnum = None,
+                   repetition = 0,
+                   extra_flags = (),
+                   jvm_label = None,
+                   profile = (),
+                   attempt = 0,
+                   **ignored ):
+    """Base name of a run's files. Takes a run configuration as keywords."""
+    min_heap_label = min_heap if not (min_heap == None) else "None"
+    max_heap_label = max_heap if not (max_heap == None) else "None"
+    run_label = "%s-%s-%s-min%s-max%s-p%d-c%d-bt%d" % \
+        ( benchmark, gc_algo,  heuristic, min_heap_label, max_heap_label, par_gcthreads, conc_gcthreads, appnum )
+    if repetition > 0:
+        run_label += "-r%d" % repetition
+    if extra_flags:
+        run_label += "-f" + hashlib.sha1( " ".join( extra_flags ) ).hexdigest()[:6]
+    if jvm_label not in (None, default_jvm_label):
+        run_label = jvm_label + "-" + run_label
+    if profile:
+        run_label += "-prof"
+    if attempt > 0:
+        run_label += "-a%d" % attempt
+    return run_label
 
 def run_benchmark( benchmark = None,
                    gc_algo = "shenandoah",
@@ -108,11 +1542,46 @@ def run_benchmark( benchmark = None,
                    appnum = 1,
                    par_gcthreads = 6,
                    conc_gcthreads = 2,
-                   perf = False,
+                   profile = (),
                    printgcdetails = False,
+                   cpuset = None,
+                   line_callback = None,
+                   adaptive = None,
+                   repetition = 0,
+                   sample_interval = None,
+                   jvm_label = None,
+                   extra_flags = (),
+                   timeout = None,
+                   hang_timeout = None,
+                   attempt = 0,
+                   batch = None,
                    fake = False,
                    logger = None,
                    pp = None ):
+    """Runs one benchmark configuration inside the benchmark's directory.
+    The JVM is started with the benchmark directory as its working directory
+    instead of changing ours, so that several runs can be in flight at once.
+    If cpuset is a list of CPU numbers, the JVM is pinned to them via taskset.
+    The JVM output is streamed to the -gc-output.txt file as it is produced
+    and every line is also handed to line_callback( stream_name, line ) if given.
+    If adaptive is a dictionary of ConvergenceMonitor arguments, the JVM is
+    stopped as soon as its iteration times have converged. 'number' (or the
+    SPECjvm2008 iteration count) is then only the upper limit.
+    Repetitions of the same configuration after the first get an -r<n>
+    suffix on their file names, and runs of a JVM other than the default one
+    are prefixed with its jvm_label. extra_flags are passed to the JVM as
+    they are; runs with extra flags get a -f<hash> suffix that tells them apart.
+    If sample_interval is given, a ResourceSampler follows the JVM and its
+    time series is saved next to the gc log as <run>-resources.bin.
+    The JVM gets its own process group, which is killed after 'timeout'
+    seconds or after 'hang_timeout' seconds without output. Retry attempts
+    (attempt > 0) get an -a<n> suffix.
+    batch is a list of further DaCapo benchmarks to run in the same JVM after
+    'benchmark' (see run_batch). The files of such a run get a -batch suffix.
+    profile is a tuple of profile_modes; profiled runs get a -prof suffix and
+    their artifacts are listed in the result's "profile_files".
+    Returns a result dictionary with the parsed iteration times and the
+    run's status, one of run_status_list."""
     assert( type(number) == type(int(0)) )
     assert( heuristic != None )
     assert( dacapo_flag or specjvm_flag )
@@ -120,18 +1589,62 @@ def run_benchmark( benchmark = None,
         print "WARNING: Benchmark %s found in both dacapo and specjvm. Defaulting to DaCapo."
         specjvm_flag = False
     print "==========================================================================="
-    os.chdir( benchmark )
-    min_heap_label = min_heap if not (min_heap == None) else "None"
-    max_heap_label = max_heap if not (max_heap == None) else "None"
-    gc_logfile = "%s-%s-%s-min%s-max%s-p%d-c%d-bt%d-gc.log" % \
-        ( benchmark, gc_algo,  heuristic, min_heap_label, max_heap_label, par_gcthreads, conc_gcthreads, appnum )
+    run_label = get_run_label( benchmark = benchmark,
+                               gc_algo = gc_algo,
+                               heuristic = heuristic,
+                               min_heap = min_heap,
+                               max_heap = max_heap,
+                               par_gcthreads = par_gcthreads,
+                               conc_gcthreads = conc_gcthreads,
+                               appnum = appnum,
+                               repetition = repetition,
+                               extra_flags = extra_flags,
+                               jvm_label = jvm_label,
+                               profile = profile,
+                               attempt = attempt )
+    if batch:
+        assert( dacapo_flag )
+        run_label += "-batch"
+    gc_logfile = run_label + "-gc.log"
     if not fake:
-        gc_stdout = "%s-%s-%s-min%s-max%s-p%d-c%d-bt%d-gc-output.txt" % \
-            ( benchmark, gc_algo, heuristic, min_heap_label, max_heap_label, par_gcthreads, conc_gcthreads, appnum )
+        gc_stdout = os.path.join( benchmark, run_label + "-gc-output.txt" )
     else:
         gc_stdout = "/dev/null"
     print "gc_stdout", gc_stdout
-    with open(gc_stdout, "w") as fptr:
+    monitor = None
+    if adaptive != None:
+        monitor = ConvergenceMonitor( **adaptive )
+    iteration_parser = IterationParser( benchmark = benchmark,
+                                        dacapo_flag = dacapo_flag,
+                                        specjvm_flag = specjvm_flag,
+                                        on_iteration = monitor )
+    result = { "benchmark" : benchmark,
+               "output_file" : gc_stdout,
+               "gc_logfile" : (os.path.join( benchmark, gc_logfile ) if printgcdetails else None),
+               "runtimes" : iteration_parser.runtimes,
+               "returncode" : None,
+               "wall_time" : None,
+               "converged" : False,
+               "warmup_iterations" : 1,
+               "resources" : None,
+               "resources_file" : None,
+               "profile_files" : None,
+               "status" : None,
+               "hs_err" : None,
+               "start_time" : None }
+    profiler = None
+    if profile:
+        profiler = Profiler( modes = profile,
+                             directory = benchmark,
+                             run_label = run_label,
+                             java_path = (java_actual_path if not fake else None),
+                             cpuset = cpuset,
+                             printgcdetails = printgcdetails,
+                             gc_logfile = result["gc_logfile"],
+                             output_file = gc_stdout )
+    scanner = OutputScanner()
+    # Line buffered so that output reaches the disk even if we get killed.
+    with open(gc_stdout, "w", 1) as fptr:
         cmd = [ java_actual_path,
                 "-XX:ParallelGCThreads=%d" % par_gcthreads,
                 "-XX:ConcGCThreads=%d" % conc_gcthreads ]
@@ -148,6 +1661,9 @@ def run_benchmark( benchmark = None,
         else:
             assert( gc_algo == "defaultgc" )
             # Run with the default collector for the java being used.
+        cmd.extend( extra_flags )
+        if profiler != None:
+            cmd.extend( profiler.jvm_flags() )
         # Add debug flags if needed
         if printgcdetails:
             cmd.extend( [ "-XX:+PrintGCDetails",
@@ -159,8 +1675,9 @@ def run_benchmark( benchmark = None,
         if dacapo_flag:
             cmd.extend( [ "-jar",
                           dacapo_path,
-                          benchmark,
-                          "-n%d" % number ] )
+                          benchmark ] +
+                        list( batch if batch else [] ) +
+                        [ "-n%d" % number ] )
         elif specjvm_flag:
             specjvm_dirname = os.path.dirname( specjvm_path )
             cmd.extend( [ "-Dspecjvm.home.dir=%s" % specjvm_dirname,
@@ -168,21 +1685,1356 @@ def run_benchmark( benchmark = None,
                           "-ikv", # Skip verification.
                           "-ict", # Ignore check test.
                           "-bt", "%d" % appnum, # App thread number
-                          "--iterations", "200",
+                          "--iterations", "%d" % specjvm_iterations,
                           benchmark ] )
+        if cpuset != None:
+            cmd = [ "taskset", "-c", ",".join( [ str(x) for x in cpuset ] ) ] + cmd
 
         if fake:
             print "CMD:", cmd
         else:
             print "CMD:", cmd
-            javaproc = subprocess.Popen( cmd,
-                                         stdout = subprocess.PIPE,
-                                         stdin = subprocess.PIPE,
-                                         stderr = subprocess.PIPE )
-            result = javaproc.communicate()
-            fptr.writelines( result )
-    os.chdir( ".." )
-    return benchmark
+            start_time = time.time()
+            result["start_time"] = start_time
+            # New session, so that timeouts can kill everything the JVM started.
+            javaproc = running_jvms.start( cmd,
+                                           stdout = subprocess.PIPE,
+                                           stdin = subprocess.PIPE,
+                                           stderr = subprocess.PIPE,
+                                           cwd = benchmark )
+            try:
+                javaproc.stdin.close()
+                watchdog = RunWatchdog( proc = javaproc,
+                                        timeout = timeout,
+                                        hang_timeout = hang_timeout )
+                watchdog.start()
+                if monitor != None:
+                    monitor.stop = watchdog.kill
+                sampler = None
+                if sample_interval != None:
+                    sampler = ResourceSampler( pid = javaproc.pid,
+                                               interval = sample_interval )
+                    sampler.start()
+                if profiler != None:
+                    profiler.attach( javaproc.pid )
+                stream_process_output( proc = javaproc,
+                                       fptr = fptr,
+                                       line_callback = chain_line_callbacks( [ iteration_parser,
+                                                                               scanner,
+                                                                               watchdog,
+                                                                               line_callback ] ) )
+                watchdog.stop()
+                if sampler != None:
+                    sampler.stop()
+                (result["returncode"], rusage) = wait_with_rusage( javaproc )
+                if sampler != None:
+                    result["resources_file"] = os.path.join( benchmark, run_label + "-resources.bin" )
+                    sampler.save( result["resources_file"] )
+                    result["resources"] = sampler.summary( rusage = rusage )
+                watchdog.reaped()
+            except KeyboardInterrupt:
+                # ^C only reaches the JVM through us.
+                running_jvms.stop_all()
+                raise
+            finally:
+                running_jvms.finished( javaproc )
+                if profiler != None:
+                    profiler.detach()
+            if profiler != None:
+                result["profile_files"] = profiler.files
+            result["wall_time"] = time.time() - start_time
+            if monitor != None:
+                result["converged"] = monitor.converged
+                if monitor.warmup_iterations != None:
+                    result["warmup_iterations"] = monitor.warmup_iterations
+            result["status"] = classify_run( result = result,
+                                             scanner = scanner,
+                                             killed_by = watchdog.reason )
+            result["hs_err"] = scanner.hs_err
+    return result
+
+#
+# DaCapo batching
+#
+# DaCapo runs that differ only in the benchmark can share one JVM:
+#     java <flags> -jar dacapo.jar fop luindex -n5
+# This saves the JVM startup and jar scanning per benchmark, which is a large
+# part of the wall time of short benchmarks. The output is split back into
+# per-benchmark results at the DaCapo markers:
+#     ===== DaCapo 9.12 fop starting =====
+#     ===== DaCapo 9.12 fop PASSED in 1234 msec =====
+dacapo_start_re = re.compile( r"===== DaCapo \S+ (\S+) starting" )
+dacapo_end_re = re.compile( r"===== DaCapo \S+ (\S+) (PASSED|FAILED)" )
+# Run configuration entries that are not part of the JVM command line.
+batch_ignored_keys = [ "benchmark", "on_retry", "logger", "pp", "line_callback" ]
+
+def get_batch_key( run_config ):
+    """Runs with the same batch key can share a JVM. None if the run can not
+    be batched: SPECjvm2008 runs, and --adaptive runs whose JVM is stopped
+    as soon as its one benchmark has converged, and profiled runs."""
+    if not run_config["dacapo_flag"] or run_config["specjvm_flag"] or \
+       run_config.get( "adaptive" ) != None or run_config.get( "profile" ):
+        return None
+    return repr( sorted( [ (k, v) for (k, v) in run_config.items()
+                           if k not in batch_ignored_keys ] ) )
+
+def make_batches( run_list = None,
+                  batch_size = None ):
+    """Groups the runs in run_list that can share a JVM into batch entries of
+    at most batch_size benchmarks. A batch entry is a copy of its first
+    run's configuration with the member configurations under "batch".
+    Runs that can not be batched are passed through unchanged. The order of
+    first appearance is kept."""
+    entries = []
+    open_batches = {}
+    for run_config in run_list:
+        key = get_batch_key( run_config )
+        if key == None or batch_size <= 1:
+            entries.append( run_config )
+            continue
+        entry = open_batches.get( key )
+        if entry == None or len(entry["batch"]) >= batch_size or \
+           run_config["benchmark"] in [ x["benchmark"] for x in entry["batch"] ]:
+            entry = dict( run_config )
+            entry["batch"] = []
+            open_batches[key] = entry
+            entries.append( entry )
+        entry["batch"].append( run_config )
+    return [ (x if "batch" not in x or len(x["batch"]) > 1 else x["batch"][0]) for x in entries ]
+
+class BatchDemux( object ):
+    """Line callback that splits the output of a batched DaCapo JVM into the
+    members' own output files and iteration times. Output before the first
+    benchmark starts only goes to the batch's combined output file."""
+    def __init__( self,
+                  output_files = None ):
+        """output_files maps benchmark name -> path of its output file."""
+        self.files = dict( [ (name, open( path, "w", 1 )) for (name, path) in output_files.items() ] )
+        self.parsers = dict( [ (name, IterationParser( benchmark = name, dacapo_flag = True ))
+                               for name in output_files ] )
+        self.current = None
+        self.started = {}
+        self.ended = {}
+        self.passed = {}
+
+    def __call__( self, stream_name, line ):
+        match = dacapo_start_re.search( line )
+        if match != None and match.group(1) in self.files:
+            self.current = match.group(1)
+            self.started[self.current] = time.time()
+        if self.current != None:
+            self.files[self.current].write( line )
+            self.parsers[self.current]( stream_name, line )
+        match = dacapo_end_re.search( line )
+        if match != None and match.group(1) == self.current:
+            self.ended[self.current] = time.time()
+            self.passed[self.current] = (match.group(2) == "PASSED")
+            self.current = None
+
+    def close( self ):
+        for fp in self.files.values():
+            fp.close()
+
+def run_batch( run_config = None,
+               cpuset = None ):
+    """Runs the members of a batch entry (see make_batches) in one JVM.
+    Returns a list of (member run_config, result) pairs. Each member gets the
+    output file it would have had on its own and its share of the wall time
+    and the GC log (as 'gc_window'). Members that failed get their remaining
+    retries on their own, and members that never started because an earlier
+    one took the JVM down are always run again on their own."""
+    members = run_config["batch"]
+    names = [ x["benchmark"] for x in members ]
+    batch_config = dict( [ (k, v) for (k, v) in run_config.items()
+                           if k not in [ "batch", "retries", "on_retry", "quiesce" ] ] )
+    if batch_config.get( "timeout" ) != None:
+        batch_config["timeout"] *= len(names)
+    if run_config.get( "fake" ):
+        run_benchmark( cpuset = cpuset, batch = names[1:], **batch_config )
+        return [ (x, None) for x in members ]
+    member_files = dict( [ (x["benchmark"], os.path.join( x["benchmark"], get_run_label( **x ) + "-gc-output.txt" ))
+                           for x in members ] )
+    (env_ok, environment) = check_environment( quiesce = run_config.get( "quiesce" ),
+                                               cpuset = cpuset )
+    if not env_ok:
+        return [ (x, dict( make_refused_result( x ), attempts = 1, environment = environment ))
+                 for x in members ]
+    demux = BatchDemux( output_files = member_files )
+    batch_config["line_callback"] = chain_line_callbacks( [ demux, run_config.get( "line_callback" ) ] )
+    try:
+        batch_result = run_benchmark( cpuset = cpuset,
+                                      batch = names[1:],
+                                      **batch_config )
+    finally:
+        demux.close()
+    batch_result["environment"] = environment
+    print "Batch of %d benchmarks finished with %s" % (len(names), batch_result["status"])
+    done = []
+    for member in members:
+        name = member["benchmark"]
+        result = dict( batch_result )
+        result["benchmark"] = name
+        result["output_file"] = member_files[name]
+        result["runtimes"] = demux.parsers[name].runtimes
+        # The resource samples cover the whole JVM, not one benchmark.
+        result["resources"] = None
+        result["attempts"] = 1
+        if name not in demux.started:
+            # Never got its turn.
+            done.append( (member, run_with_retries( run_config = member, cpuset = cpuset, first_attempt = 1 )) )
+            continue
+        end = demux.ended.get( name, batch_result["start_time"] + batch_result["wall_time"] )
+        result["wall_time"] = end - demux.started[name]
+        result["gc_window"] = ( demux.started[name] - batch_result["start_time"],
+                                end - batch_result["start_time"] )
+        if demux.passed.get( name ):
+            result["status"] = "ok"
+            result["hs_err"] = None
+        elif name in demux.ended:
+            result["status"] = "dacapo_failed"
+        elif batch_result["status"] == "ok":
+            result["status"] = "error"
+        if result["status"] != "ok" and member.get( "retries", 0 ) > 0:
+            print "Run %s failed with %s in a batch" % (result["output_file"], result["status"])
+            if member.get( "on_retry" ) != None:
+                member["on_retry"]( member, result )
+            result = run_with_retries( run_config = member, cpuset = cpuset, first_attempt = 1 )
+        done.append( (member, result) )
+    return done
+
+def get_entry_members( run_config ):
+    """The runs of a run list entry: the members of a batch, or the run itself."""
+    return run_config.get( "batch", [ run_config ] )
+
+def run_entry( run_config = None,
+               cpuset = None ):
+    """Runs one entry of a run list, either a single run or a batch.
+    Returns a list of (run_config, result) pairs."""
+    if "batch" in run_config:
+        return run_batch( run_config = run_config, cpuset = cpuset )
+    return [ (run_config, run_with_retries( run_config = run_config, cpuset = cpuset )) ]
+
+def get_available_cpus():
+    """Returns the list of CPU numbers this process is allowed to run on."""
+    try:
+        with open( "/proc/self/status" ) as fp:
+            for line in fp:
+                if line.startswith( "Cpus_allowed_list:" ):
+                    return parse_cpu_list( line.split(":", 1)[1] )
+    except IOError:
+        pass
+    return range( multiprocessing.cpu_count() )
+
+def parse_cpu_list( text ):
+    """Parses a kernel style CPU list like '0-3,8,10-11'."""
+    cpus = []
+    for part in text.strip().split(","):
+        if part == "":
+            continue
+        if "-" in part:
+            (low, high) = part.split("-")
+            cpus.extend( range( int(low), int(high) + 1 ) )
+        else:
+            cpus.append( int(part) )
+    return cpus
+
+def get_run_width( run_config ):
+    """Number of CPUs a run needs: its GC threads plus the application threads."""
+    return ( run_config["par_gcthreads"] +
+             run_config["conc_gcthreads"] +
+             run_config["appnum"] )
+
+class CpuPool( object ):
+    """Hands out disjoint sets of CPUs. Not thread safe by itself; the
+    RunScheduler calls it with its lock held."""
+    def __init__( self, cpus = None ):
+        self.cpus = sorted( cpus )
+        self.free = set( self.cpus )
+
+    def allocate( self, width ):
+        width = max( 1, min( width, len(self.cpus) ) )
+        if len(self.free) < width:
+            return None
+        # Prefer a contiguous block so that a run tends to stay on
+        # neighbouring cores.
+        free = sorted( self.free )
+        for i in xrange( len(free) - width + 1 ):
+            if free[i + width - 1] - free[i] == width - 1:
+                cpuset = free[i:i + width]
+                break
+        else:
+            cpuset = free[:width]
+        self.free.difference_update( cpuset )
+        return cpuset
+
+    def release( self, cpuset ):
+        self.free.update( cpuset )
+
+class RunScheduler( object ):
+    """Runs independent run_benchmark configurations concurrently.
+    At most 'jobs' JVMs are in flight and each one gets its own disjoint
+    CPU set sized by get_run_width. Queued runs that fit into the currently
+    free CPUs are started first so the machine stays packed without
+    oversubscribing it."""
+    def __init__( self,
+                  jobs = 1,
+                  cpus = None,
+                  affinity = True,
+                  logger = None ):
+        self.jobs = jobs
+        self.pool = CpuPool( cpus if cpus != None else get_available_cpus() )
+        self.affinity = affinity
+        self.logger = logger
+        self.cond = threading.Condition()
+        self.finished = []
+        self.running = 0
+        self.on_start = None
+
+    def _worker( self, run_config, cpuset ):
+        done = [ (x, None) for x in get_entry_members( run_config ) ]
+        try:
+            done = run_entry( run_config = run_config,
+                              cpuset = (cpuset if self.affinity else None) )
+        except KeyboardInterrupt:
+            # The sweep is being stopped (see JvmRegistry).
+            return
+        except Exception as e:
+            self.logger.error( "Run of %s failed: %s" % (run_config["benchmark"], str(e)) )
+        with self.cond:
+            self.pool.release( cpuset )
+            self.running -= 1
+            self.finished.extend( done )
+            self.cond.notify()
+
+    def _start_fitting( self, pending ):
+        started = False
+        index = 0
+        while index < len(pending) and self.running < self.jobs:
+            cpuset = self.pool.allocate( get_run_width( pending[index] ) )
+            if cpuset == None:
+                index += 1
+                continue
+            run_config = pending.pop( index )
+            self.running += 1
+            if self.on_start != None:
+                for member in get_entry_members( run_config ):
+                    self.on_start( member )
+            thread = threading.Thread( target = self._worker,
+                                       args = (run_config, cpuset) )
+            thread.daemon = True
+            thread.start()
+            started = True
+        return started
+
+    def run_all( self, run_list, callback = None, on_start = None ):
+        """Runs everything in run_list in order, except that a later run is
+        started early if the ones before it do not fit. callback( run_config,
+        result ) is called in the calling thread as each run finishes and
+        on_start( run_config ) as it starts."""
+        self.on_start = on_start
+        pending = list( run_list )
+        try:
+            self._run_pending( pending, callback )
+        except KeyboardInterrupt:
+            # Only this thread gets the ^C; the JVMs of the others must not
+            # outlive the harness.
+            running_jvms.stop_all()
+            raise
+
+    def _run_pending( self, pending, callback ):
+        with self.cond:
+            while pending or self.running > 0:
+                self._start_fitting( pending )
+                # Timed wait so that KeyboardInterrupt still gets through.
+                while not self.finished:
+                    self.cond.wait( 1.0 )
+                done = self.finished
+                self.finished = []
+                if callback != None:
+                    self.cond.release()
+                    try:
+                        for (run_config, result) in done:
+                            callback( run_config, result )
+                    finally:
+                        self.cond.acquire()
+
+def run_sweep( run_list = None,
+               jobs = 1,
+               callback = None,
+               on_start = None,
+               coordinator = None,
+               logger = None ):
+    """Runs the configurations in run_list either one at a time (jobs == 1),
+    through a RunScheduler, or on remote workers through a Coordinator.
+    Entries of run_list may be batches (see make_batches), except for the
+    Coordinator; callback and on_start are called once per member of a batch."""
+    if coordinator != None:
+        coordinator.run_all( run_list, callback = callback, on_start = on_start )
+        return
+    if jobs <= 1:
+        for entry in run_list:
+            if on_start != None:
+                for member in get_entry_members( entry ):
+                    on_start( member )
+            for (run_config, result) in run_entry( run_config = entry ):
+                if callback != None:
+                    callback( run_config, result )
+        return
+    affinity = find_executable( "taskset" ) != None
+    if not affinity:
+        print "WARNING: taskset not found. Running without CPU affinity."
+    scheduler = RunScheduler( jobs = jobs,
+                              affinity = affinity,
+                              logger = logger )
+    scheduler.run_all( run_list, callback = callback, on_start = on_start )
+
+#
+# Remote execution
+#
+# Coordinator and workers talk over TCP. Every message is one line of JSON,
+# optionally followed by 'payload_size' bytes of raw data:
+#     worker -> coordinator: hello, request, file, result
+#     coordinator -> worker: run, wait, done
+# Workers pull runs, so a worker that finishes early simply takes the next
+# run (work stealing) and a worker that dies only loses its current run,
+# which goes back into the queue.
+# Both sides share a secret (--secret-file, or $RUN_HEURISTICS_SECRET). A
+# connection starts with a challenge and response that proves to each side
+# that the other one knows it:
+#     coordinator -> worker: challenge (nonce)
+#     worker -> coordinator: hello (nonce, proof)
+#     coordinator -> worker: welcome (proof)
+# From then on every line is prefixed with an HMAC over the message, its
+# payload and its sequence number (see MessageAuth).
+file_chunk_size = 1024 * 1024
+# run_benchmark arguments that do not travel to workers.
+local_only_run_keys = [ "logger", "pp", "on_retry", "line_callback" ]
+secret_environment_variable = "RUN_HEURISTICS_SECRET"
+# Benchmark names become directory names on the workers.
+benchmark_name_re = re.compile( r"^[A-Za-z0-9_.+-]+$" )
+
+def load_secret( path = None ):
+    """The shared secret from the file at path or from the environment."""
+    secret = None
+    if path != None:
+        with open( path ) as fp:
+            secret = fp.read().strip()
+    else:
+        secret = os.environ.get( secret_environment_variable, "" ).strip()
+    if not secret:
+        print "Remote execution needs a shared secret: use --secret-file or set %s." % \
+            secret_environment_variable
+        exit(2)
+    return secret
+
+def get_proof( secret = None,
+               role = None,
+               nonces = None ):
+    """What 'role' sends to show that it knows the secret."""
+    return hmac.new( secret, "%s:%s" % (role, ":".join( [ str(x) for x in nonces ] )),
+                     hashlib.sha256 ).hexdigest()
+
+class MessageAuth( object ):
+    """Signs and checks the messages of one connection, with a key that is
+    derived from the secret and both nonces. The sequence numbers make
+    replayed, reordered or dropped messages fail the check."""
+    def __init__( self,
+                  secret = None,
+                  nonces = None ):
+        self.key = hmac.new( secret, "session:%s" % ":".join( [ str(x) for x in nonces ] ),
+                             hashlib.sha256 ).digest()
+        self.sent = 0
+        self.received = 0
+
+    def sign( self, sequence, line, payload ):
+        return hmac.new( self.key, "%d\n%s\n%s" % (sequence, line, payload), hashlib.sha256 ).hexdigest()
+
+def send_message( fp = None,
+                  message = None,
+                  payload = "",
+                  auth = None ):
+    line = json.dumps( dict( message, payload_size = len(payload) ) )
+    if auth != None:
+        line = "%s %s" % (auth.sign( auth.sent, line, payload ), line)
+        auth.sent += 1
+    fp.write( line + "\n" )
+    fp.write( payload )
+    fp.flush()
+
+def recv_message( fp, auth = None ):
+    """Returns (message, payload), or (None, None) if the peer went away.
+    Raises ValueError for a message that fails the check of auth."""
+    line = fp.readline()
+    if not line:
+        return (None, None)
+    line = line.rstrip( "\n" )
+    signature = None
+    if auth != None:
+        (signature, _, line) = line.partition( " " )
+    message = json.loads( line )
+    payload = fp.read( message["payload_size"] ) if message["payload_size"] > 0 else ""
+    if auth != None:
+        if not hmac.compare_digest( str(signature), auth.sign( auth.received, line, payload ) ):
+            raise ValueError( "message %d fails the authentication check" % auth.received )
+        auth.received += 1
+    return (message, payload)
+
+def parse_address( text ):
+    """HOST:PORT, or :PORT for this machine only. Use 0.0.0.0:PORT to listen
+    on all interfaces."""
+    (host, _, port) = text.rpartition( ":" )
+    return (host if host != "" else "127.0.0.1", int(port))
+
+def get_hardware_fingerprint():
+    """CPU model, CPU count and memory size of this machine. Results from
+    machines with different fingerprints are never mixed in a comparison."""
+    model = "unknown"
+    memory = 0
+    try:
+        with open( "/proc/cpuinfo" ) as fp:
+            for line in fp:
+                if line.startswith( "model name" ):
+                    model = re.sub( r"\s+", " ", line.split(":", 1)[1].strip() )
+                    break
+        with open( "/proc/meminfo" ) as fp:
+            for line in fp:
+                if line.startswith( "MemTotal:" ):
+                    memory = int( line.split()[1] ) // (1024 * 1024)
+    except IOError:
+        pass
+    return "%s x%d %dG" % (model, multiprocessing.cpu_count(), memory)
+
+def get_pin_key( run_config ):
+    """Runs with the same pin key are compared with each other, so they
+    must all run on the same kind of hardware."""
+    return json.dumps( [ run_config.get( x ) for x in [ "benchmark", "min_heap", "max_heap",
+                                                        "par_gcthreads", "conc_gcthreads", "appnum",
+                                                        "number", "extra_flags" ] ] )
+
+def is_safe_relative_path( path ):
+    path = os.path.normpath( path )
+    return not ( os.path.isabs( path ) or path.startswith( ".." ) )
+
+class Coordinator( object ):
+    """Hands out runs to worker agents that connect to 'address' and collects
+    their results and files. Drop-in for RunScheduler.run_all.
+    A comparison (see get_pin_key) is pinned to the hardware fingerprint of
+    the first worker that takes one of its runs; from then on only workers
+    with the same fingerprint get its runs. on_pin( pin_key, hardware ) is
+    called for new pins so they can be recorded; earlier pins can be passed
+    in to keep them across a --resume. Workers must know the shared secret."""
+    def __init__( self,
+                  address = None,
+                  secret = None,
+                  pins = None,
+                  on_pin = None,
+                  logger = None ):
+        self.logger = logger
+        self.secret = secret
+        self.on_pin = on_pin
+        self.pins = dict( pins ) if pins != None else {}
+        self.cond = threading.Condition()
+        self.pending = []
+        self.in_flight = {}
+        self.finished = []
+        self.next_id = 0
+        self.closed = False
+        self.on_start = None
+        self.server = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        self.server.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR, 1 )
+        self.server.bind( address )
+        self.server.listen( 64 )
+        print "Coordinator listening on %s:%d" % self.server.getsockname()
+        thread = threading.Thread( target = self._accept )
+        thread.daemon = True
+        thread.start()
+
+    def _accept( self ):
+        while True:
+            try:
+                (conn, peer) = self.server.accept()
+            except socket.error:
+                return
+            thread = threading.Thread( target = self._serve, args = (conn, peer) )
+            thread.daemon = True
+            thread.start()
+
+    def _take( self, hardware ):
+        """Next pending run for a worker with this hardware. Runs of
+        comparisons already pinned to this hardware come first."""
+        choice = None
+        for (index, (run_id, run_config)) in enumerate( self.pending ):
+            pinned = self.pins.get( get_pin_key( run_config ) )
+            if pinned == hardware:
+                choice = index
+                break
+            if pinned == None and choice == None:
+                choice = index
+        if choice == None:
+            return None
+        (run_id, run_config) = self.pending.pop( choice )
+        pin_key = get_pin_key( run_config )
+        if pin_key not in self.pins:
+            self.pins[pin_key] = hardware
+            if self.on_pin != None:
+                self.on_pin( pin_key, hardware )
+        if self.on_start != None:
+            self.on_start( run_config )
+        return (run_id, run_config)
+
+    def _handshake( self, fp, host ):
+        """Returns the MessageAuth of a worker that knows the secret, else None."""
+        nonce = os.urandom( 16 ).encode( "hex" )
+        send_message( fp, { "type" : "challenge", "nonce" : nonce } )
+        (message, payload) = recv_message( fp )
+        if message == None or message.get( "type" ) != "hello":
+            return None
+        nonces = [ nonce, message.get( "nonce" ) ]
+        if not hmac.compare_digest( str(message.get( "proof" )),
+                                    get_proof( secret = self.secret, role = "worker", nonces = nonces ) ):
+            self.logger.error( "Refusing worker %s: wrong secret" % host )
+            print "Refusing worker %s: wrong secret" % host
+            return None
+        send_message( fp, { "type" : "welcome",
+                            "proof" : get_proof( secret = self.secret, role = "coordinator", nonces = nonces ) } )
+        return (message, MessageAuth( secret = self.secret, nonces = nonces ))
+
+    def _serve( self, conn, peer ):
+        fp = conn.makefile( "rwb" )
+        mine = set()
+        host = "%s:%d" % peer
+        hardware = None
+        files = {}
+        try:
+            hello = self._handshake( fp, host )
+            if hello == None:
+                conn.close()
+                return
+            (message, auth) = hello
+            host = message["host"]
+            hardware = message["hardware"]
+            print "Worker %s connected (%s)" % (host, hardware)
+            while True:
+                (message, payload) = recv_message( fp, auth )
+                if message == None:
+                    break
+                kind = message["type"]
+                if kind == "request":
+                    with self.cond:
+                        job = self._take( hardware )
+                        if job != None:
+                            self.in_flight[job[0]] = job[1]
+                            mine.add( job[0] )
+                    if job != None:
+                        remote_config = dict( [ (k, v) for (k, v) in job[1].items()
+                                                if k not in local_only_run_keys ] )
+                        send_message( fp, { "type" : "run", "id" : job[0], "run_config" : remote_config }, auth = auth )
+                    elif self.closed:
+                        send_message( fp, { "type" : "done" }, auth = auth )
+                        break
+                    else:
+                        send_message( fp, { "type" : "wait", "delay" : 1.0 }, auth = auth )
+                elif kind == "file":
+                    name = message["name"]
+                    if not is_safe_relative_path( name ):
+                        self.logger.error( "Refusing file %s from %s" % (name, host) )
+                        continue
+                    if name not in files:
+                        directory = os.path.dirname( name )
+                        if directory != "" and not os.path.isdir( directory ):
+                            os.makedirs( directory )
+                        files[name] = open( name, "wb" )
+                    files[name].write( payload )
+                    if message["final"]:
+                        files.pop( name ).close()
+                elif kind == "result":
+                    result = message["result"]
+                    result["host"] = host
+                    result["hardware"] = hardware
+                    with self.cond:
+                        run_config = self.in_flight.pop( message["id"] )
+                        mine.discard( message["id"] )
+                        self.finished.append( (run_config, result) )
+                        self.cond.notify_all()
+        except (socket.error, ValueError) as e:
+            self.logger.error( "Lost worker %s: %s" % (host, str(e)) )
+        finally:
+            for x in files.values():
+                x.close()
+            with self.cond:
+                # Whatever this worker was running goes back into the queue.
+                for run_id in mine:
+                    self.pending.insert( 0, (run_id, self.in_flight.pop( run_id )) )
+                self.cond.notify_all()
+            conn.close()
+            if mine:
+                print "Worker %s went away; requeued %d runs." % (host, len(mine))
+
+    def run_all( self, run_list, callback = None, on_start = None ):
+        with self.cond:
+            self.on_start = on_start
+            remaining = len(run_list)
+            for run_config in run_list:
+                self.pending.append( (self.next_id, run_config) )
+                self.next_id += 1
+        while remaining > 0:
+            with self.cond:
+                while not self.finished:
+                    self.cond.wait( 1.0 )
+                done = self.finished
+                self.finished = []
+            for (run_config, result) in done:
+                remaining -= 1
+                if callback != None:
+                    callback( run_config, result )
+
+    def close( self ):
+        """Tells workers asking for more work that the sweep is over."""
+        self.closed = True
+
+def send_file( fp = None,
+               run_id = None,
+               path = None,
+               auth = None ):
+    with open( path, "rb" ) as src:
+        while True:
+            chunk = src.read( file_chunk_size )
+            final = len(chunk) < file_chunk_size
+            send_message( fp, { "type" : "file", "id" : run_id, "name" : path, "final" : final }, chunk, auth )
+            if final:
+                break
+
+def check_remote_run( run_config = None,
+                      overrides = None ):
+    """Why this worker will not run run_config, or None. Workers only run
+    the JVMs and benchmark jars of their own configuration."""
+    if run_config.get( "jvm_label" ) not in overrides["jvms"]:
+        return "JVM %s is not configured here" % run_config.get( "jvm_label" )
+    if not benchmark_name_re.match( str(run_config.get( "benchmark" )) ):
+        return "bad benchmark name %r" % run_config.get( "benchmark" )
+    for (flag, key) in [ ("dacapo_flag", "dacapo_path"), ("specjvm_flag", "specjvm_path") ]:
+        if run_config.get( flag ) and key not in overrides["paths"]:
+            return "%s is not configured here" % key
+    return None
+
+def worker_loop( address = None,
+                 secret = None,
+                 host = None,
+                 hardware = None,
+                 cpu_pool = None,
+                 cpu_lock = None,
+                 overrides = None,
+                 logger = None ):
+    """One worker slot: pulls runs from the coordinator until told it is done."""
+    # Workers may well be started before the coordinator.
+    for retry in xrange( 60 ):
+        try:
+            conn = socket.create_connection( address )
+            break
+        except socket.error:
+            time.sleep( 1.0 )
+    else:
+        logger.error( "Can not connect to coordinator at %s:%d" % address )
+        return
+    fp = conn.makefile( "rwb" )
+    try:
+        worker_session( fp = fp,
+                        secret = secret,
+                        host = host,
+                        hardware = hardware,
+                        cpu_pool = cpu_pool,
+                        cpu_lock = cpu_lock,
+                        overrides = overrides,
+                        logger = logger )
+    except (socket.error, ValueError) as e:
+        logger.error( "Lost coordinator at %s:%d: %s" % (address[0], address[1], str(e)) )
+    conn.close()
+
+def worker_session( fp = None,
+                    secret = None,
+                    host = None,
+                    hardware = None,
+                    cpu_pool = None,
+                    cpu_lock = None,
+                    overrides = None,
+                    logger = None ):
+    (message, payload) = recv_message( fp )
+    if message == None or message.get( "type" ) != "challenge":
+        raise ValueError( "no challenge from the coordinator" )
+    nonces = [ message["nonce"], os.urandom( 16 ).encode( "hex" ) ]
+    send_message( fp, { "type" : "hello", "host" : host, "hardware" : hardware, "nonce" : nonces[1],
+                        "proof" : get_proof( secret = secret, role = "worker", nonces = nonces ) } )
+    (message, payload) = recv_message( fp )
+    if message == None or message.get( "type" ) != "welcome" or \
+       not hmac.compare_digest( str(message.get( "proof" )),
+                                get_proof( secret = secret, role = "coordinator", nonces = nonces ) ):
+        raise ValueError( "the coordinator does not know the secret" )
+    auth = MessageAuth( secret = secret, nonces = nonces )
+    while True:
+        send_message( fp, { "type" : "request" }, auth = auth )
+        (message, payload) = recv_message( fp, auth )
+        if message == None or message["type"] == "done":
+            break
+        if message["type"] == "wait":
+            time.sleep( message["delay"] )
+            continue
+        run_config = message["run_config"]
+        problem = check_remote_run( run_config = run_config, overrides = overrides )
+        if problem != None:
+            logger.error( "Refusing run of %s: %s" % (run_config.get( "benchmark" ), problem) )
+            print "Refusing run of %s: %s" % (run_config.get( "benchmark" ), problem)
+            result = dict( make_refused_result( run_config ), status = "error", attempts = 1, environment = None )
+            send_message( fp, { "type" : "result", "id" : message["id"], "result" : result }, auth = auth )
+            continue
+        run_config["extra_flags"] = tuple( run_config.get( "extra_flags", () ) )
+        for (key, value) in overrides["paths"].items():
+            run_config[key] = value
+        if run_config.get( "quiesce" ) != None:
+            # Compare against this machine, not the coordinator's.
+            run_config["quiesce"]["baseline"] = overrides["baseline"]
+        run_config["java_actual_path"] = overrides["jvms"][ run_config["jvm_label"] ]
+        run_config["logger"] = logger
+        if not os.path.isdir( run_config["benchmark"] ):
+            os.mkdir( run_config["benchmark"] )
+        cpuset = None
+        if cpu_pool != None:
+            with cpu_lock:
+                while True:
+                    cpuset = cpu_pool.allocate( get_run_width( run_config ) )
+                    if cpuset != None:
+                        break
+                    cpu_lock.wait( 1.0 )
+        try:
+            result = run_with_retries( run_config = run_config, cpuset = cpuset )
+        finally:
+            if cpuset != None:
+                with cpu_lock:
+                    cpu_pool.release( cpuset )
+                    cpu_lock.notify_all()
+        paths = [ result["output_file"], result["gc_logfile"], result["resources_file"] ]
+        # On JDK 8 the safepoint log is one of the files above.
+        paths.extend( [ x for x in (result.get( "profile_files" ) or {}).values() if x not in paths ] )
+        for path in paths:
+            if path != None and os.path.isfile( path ):
+                send_file( fp, message["id"], path, auth )
+        send_message( fp, { "type" : "result", "id" : message["id"], "result" : result }, auth = auth )
+
+def worker_main( argv ):
+    parser = argparse.ArgumentParser( prog = "run_heuristics.py worker",
+                                      description = "Run benchmarks for a coordinator started with --coordinator." )
+    parser.add_argument( "coordinator",
+                         help = "HOST:PORT of the coordinator." )
+    parser.add_argument( "--config",
+                         help = "Configuration file with this machine's dacapo_path and specjvm_path in [global] and its JVMs in [jvms] (the label 'default' for runs without --jvm). The worker only runs these.",
+                         action = "store",
+                         required = True )
+    parser.add_argument( "--secret-file",
+                         help = "File with the secret shared with the coordinator. Default is $%s" % secret_environment_variable,
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--jobs",
+                         help = "Number of runs to execute concurrently on this machine. Default is 1",
+                         action = "store",
+                         default = 1 )
+    parser.add_argument( "--workdir",
+                         help = "Directory for this worker's benchmark output. Default is WORK-worker-<pid>",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--hardware-label",
+                         help = "Override the hardware fingerprint, e.g. to simulate several kinds of machines on one box.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--debug",
+                         help = "Enable debug output.",
+                         action = "store_true",
+                         default = False )
+    args = parser.parse_args( argv )
+    secret = load_secret( args.secret_file )
+    overrides = { "paths" : {}, "jvms" : {}, "baseline" : get_environment() }
+    config = process_config( args )
+    for key in ("dacapo_path", "specjvm_path"):
+        if key in config:
+            overrides["paths"][key] = os.path.abspath( config[key] )
+    overrides["jvms"] = dict( [ (label, os.path.abspath( path ))
+                                for (label, path) in config.get( "jvms", [] ) ] )
+    if not overrides["jvms"]:
+        print "No JVMs in the [jvms] section of %s." % args.config
+        exit(2)
+    workdir = args.workdir if args.workdir != None else "WORK-worker-%d" % os.getpid()
+    if not os.path.isdir( workdir ):
+        os.makedirs( workdir )
+    os.chdir( workdir )
+    logger = setup_logger( logger_name = "run_heuristics_worker",
+                           debugflag = args.debug )
+    jobs = int(args.jobs)
+    cpu_pool = None
+    if jobs > 1 and find_executable( "taskset" ) != None:
+        cpu_pool = CpuPool( get_available_cpus() )
+    cpu_lock = threading.Condition()
+    threads = []
+    for slot in xrange( jobs ):
+        thread = threading.Thread( target = worker_loop,
+                                   kwargs = { "address" : parse_address( args.coordinator ),
+                                              "secret" : secret,
+                                              "host" : "%s/%d.%d" % (socket.gethostname(), os.getpid(), slot),
+                                              "hardware" : (args.hardware_label if args.hardware_label != None
+                                                            else get_hardware_fingerprint()),
+                                              "cpu_pool" : cpu_pool,
+                                              "cpu_lock" : cpu_lock,
+                                              "overrides" : overrides,
+                                              "logger" : logger } )
+        thread.daemon = True
+        thread.start()
+        threads.append( thread )
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join( 1.0 )
+    except KeyboardInterrupt:
+        running_jvms.stop_all()
+        raise
+    return 0
+
+#
+# Progress and ETA
+#
+# Wall times of past runs are kept in a small JSON file that outlives the
+# WORK directories of single sweeps:
+#     { "durations" : { "<duration key>" : [ count, mean seconds ], ... } }
+# They give the ETA of a sweep and let the longest runs start first.
+history_filename = "run_durations.json"
+
+def get_duration_keys( run_config ):
+    """Keys of a run in the duration history, from the most to the least
+    specific one. An estimate comes from the first key with history."""
+    exact = [ run_config[x] for x in [ "benchmark", "gc_algo", "heuristic", "min_heap", "max_heap",
+                                       "par_gcthreads", "conc_gcthreads", "appnum", "number" ] ]
+    return [ json.dumps( exact ),
+             json.dumps( [ run_config["benchmark"], run_config["number"] ] ),
+             json.dumps( [ run_config["benchmark"] ] ) ]
+
+class DurationHistory( object ):
+    """Running means of the wall times of past runs. Thread safe."""
+    def __init__( self, path = None ):
+        self.path = path
+        self.lock = threading.Lock()
+        self.durations = {}
+        if path != None and os.path.isfile( path ):
+            try:
+                with open( path ) as fp:
+                    self.durations = json.load( fp )["durations"]
+            except (ValueError, KeyError):
+                print "WARNING: Ignoring unreadable run duration history %s" % path
+
+    def estimate( self, run_config ):
+        """Expected wall time of a run (or a batch entry) in seconds, or None."""
+        members = get_entry_members( run_config )
+        if len(members) > 1:
+            estimates = [ self.estimate( x ) for x in members ]
+            return sum( estimates ) if None not in estimates else None
+        with self.lock:
+            for key in get_duration_keys( run_config ):
+                if key in self.durations:
+                    return self.durations[key][1]
+        return None
+
+    def add( self, run_config, wall_time ):
+        with self.lock:
+            for key in get_duration_keys( run_config ):
+                (count, average) = self.durations.get( key, (0, 0.0) )
+                self.durations[key] = ( count + 1, average + (wall_time - average) / (count + 1) )
+
+    def save( self ):
+        if self.path == None:
+            return
+        with self.lock:
+            text = json.dumps( { "durations" : self.durations } )
+        with open( self.path + ".tmp", "w" ) as fp:
+            fp.write( text )
+        os.rename( self.path + ".tmp", self.path )
+
+def format_duration( seconds ):
+    if seconds == None:
+        return "?"
+    seconds = int( seconds )
+    if seconds >= 86400:
+        return "%dd%02dh" % (seconds // 86400, (seconds % 86400) // 3600)
+    if seconds >= 3600:
+        return "%dh%02dm" % (seconds // 3600, (seconds % 3600) // 60)
+    return "%dm%02ds" % (seconds // 60, seconds % 60)
+
+class ProgressTracker( object ):
+    """Follows a sweep through add_runs and run_sweep's on_start and callback
+    hooks.
+    Every 'interval' seconds it prints a progress line and rewrites the JSON
+    status file 'status_path' with the completed, running and queued runs,
+    the wall times seen so far and the ETA. The ETA adds up the estimated
+    remaining time of every unfinished run (from 'history', or the mean wall
+    time of this sweep) and spreads it over the runs in flight."""
+    def __init__( self,
+                  slots = 1,
+                  history = None,
+                  status_path = None,
+                  interval = 30.0 ):
+        self.total = 0
+        self.slots = slots
+        self.history = history
+        self.status_path = status_path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.running = {}
+        self.completed = 0
+        self.failed = 0
+        self.wall_times = []
+        # Time from start to finish of runs, and their JVM wall time.
+        self.overhead = [ 0.0, 0.0 ]
+        self.pending = {}
+        self.done = threading.Event()
+        self.thread = threading.Thread( target = self._run )
+        self.thread.daemon = True
+
+    def start( self ):
+        if self.interval > 0:
+            self.thread.start()
+
+    def stop( self ):
+        self.done.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.report()
+
+    def add_runs( self, runs ):
+        """Runs that are about to be queued, e.g. for one round of a race."""
+        with self.lock:
+            for run_config in runs:
+                self.pending[ id(run_config) ] = run_config
+            self.total = self.completed + len(self.running) + len(self.pending)
+
+    def on_start( self, run_config ):
+        with self.lock:
+            self.running[ id(run_config) ] = (run_config, time.time())
+            self.pending.pop( id(run_config), None )
+
+    def on_finish( self, run_config, result ):
+        with self.lock:
+            (_, started) = self.running.pop( id(run_config), (None, None) )
+            self.pending.pop( id(run_config), None )
+            self.completed += 1
+            if run_config.get( "fake" ):
+                # Nothing ran, so there is nothing to fail or to time.
+                return
+            if result == None or result["status"] != "ok":
+                self.failed += 1
+            elif result["wall_time"] != None:
+                self.wall_times.append( result["wall_time"] )
+                if run_config.get( "profile" ):
+                    # Profiling slows the run down; not a duration to plan with.
+                    return
+                if "gc_window" in result:
+                    # A batch member's wall time leaves out the JVM startup.
+                    return
+                if started != None:
+                    self.overhead[0] += time.time() - started
+                    self.overhead[1] += result["wall_time"]
+                if result["converged"]:
+                    # Stopped early; the next run of it may well not be.
+                    return
+                if self.history != None:
+                    self.history.add( run_config, result["wall_time"] )
+
+    def _run( self ):
+        while not self.done.wait( self.interval ):
+            self.report()
+
+    def _estimate( self, run_config ):
+        estimate = self.history.estimate( run_config ) if self.history != None else None
+        if estimate == None and self.wall_times:
+            estimate = mean( self.wall_times )
+        return estimate
+
+    def get_status( self ):
+        now = time.time()
+        with self.lock:
+            running = list( self.running.values() )
+            pending = list( self.pending.values() )
+            completed = self.completed
+            failed = self.failed
+            wall_times = list( self.wall_times )
+        remaining = 0.0
+        for run_config in pending:
+            estimate = self._estimate( run_config )
+            if estimate == None:
+                remaining = None
+                break
+            remaining += estimate
+        if remaining != None:
+            for (run_config, started) in running:
+                estimate = self._estimate( run_config )
+                if estimate == None:
+                    remaining = None
+                    break
+                remaining += max( estimate - (now - started), 0.0 )
+        if remaining != None and self.overhead[1] > 0:
+            # The history only has JVM wall times, without the time spent
+            # waiting for a quiet machine, writing results and so on.
+            remaining *= self.overhead[0] / self.overhead[1]
+        # Runs that do not fit onto the CPUs together are not started, so the
+        # number of running runs is a better measure than the slots.
+        eta = remaining / max( (len(running) if running else self.slots), 1 ) if remaining != None else None
+        return { "time" : now,
+                 "elapsed_s" : now - self.start_time,
+                 "total" : self.total,
+                 "completed" : completed,
+                 "failed" : failed,
+                 "running" : [ { "run" : get_run_label( **run_config ),
+                                 "running_s" : now - started,
+                                 "estimate_s" : self._estimate( run_config ) }
+                               for (run_config, started) in running ],
+                 "queued" : len(pending),
+                 "wall_time_last_s" : (wall_times[-1] if wall_times else None),
+                 "wall_time_mean_s" : (mean( wall_times ) if wall_times else None),
+                 "wall_time_max_s" : (max( wall_times ) if wall_times else None),
+                 "eta_s" : eta,
+                 "eta" : (time.strftime( "%Y-%m-%d %H:%M", time.localtime( now + eta ) )
+                          if eta != None else None) }
+
+    def report( self ):
+        status = self.get_status()
+        print "PROGRESS: %d/%d done (%d failed), %d running, %d queued, elapsed %s, mean run %s, ETA %s (%s)" % \
+            (status["completed"], status["total"], status["failed"], len(status["running"]), status["queued"],
+             format_duration( status["elapsed_s"] ), format_duration( status["wall_time_mean_s"] ),
+             format_duration( status["eta_s"] ), status["eta"])
+        if self.status_path != None:
+            with open( self.status_path + ".tmp", "w" ) as fp:
+                json.dump( status, fp, indent = 1 )
+            os.rename( self.status_path + ".tmp", self.status_path )
+        if self.history != None:
+            self.history.save()
+
+def sort_longest_first( run_list = None,
+                        history = None ):
+    """Orders run_list so the runs expected to take longest come first, which
+    shortens the sweep when runs go in parallel. Runs without an estimate go
+    last. The sort is stable, so equal runs keep their order."""
+    estimates = dict( [ (id(x), history.estimate( x )) for x in run_list ] )
+    return sorted( run_list,
+                   key = lambda x: -estimates[id(x)] if estimates[id(x)] != None else 0.0 )
+
+#
+# Sweep definition
+#
+sampling_methods = [ "full", "fraction", "lhs" ]
+# The [sweep] options of the axes.
+sweep_axis_options = collections.OrderedDict( [ ("gc_algo", "gc_algos"),
+                                                ("heap", "heap_sizes"),
+                                                ("par_gcthreads", "pargcthreads"),
+                                                ("conc_gcthreads", "concgcthreads"),
+                                                ("appnum", "appthreads"),
+                                                ("extra_flags", "extra_flags"),
+                                                ("heuristic", "heuristics") ] )
+
+def get_sweep_axes( config = None,
+                    gc_algo = None,
+                    heuristic = None,
+                    min_heap = None,
+                    max_heap = None,
+                    pargcthreads = 2,
+                    concgcthreads = 2,
+                    number_appthreads = 1 ):
+    """Axes of the sweep as an ordered dictionary of name -> list of levels.
+    Axes given in the [sweep] section of the config file win over the ones
+    built from the command line options."""
+    if heuristic == "ALL":
+        heuristics = list( heuristic_list )
+    else:
+        heuristics = [ heuristic ]
+    axes = collections.OrderedDict( [
+        ("gc_algo", [ gc_algo ]),
+        ("heap", [ (min_heap, max_heap) ]),
+        ("par_gcthreads", [ pargcthreads ]),
+        ("conc_gcthreads", range( 2, concgcthreads + 1 )),
+        ("appnum", range( 1, number_appthreads + 1 )),
+        ("extra_flags", [ () ]),
+        ("heuristic", heuristics) ] )
+    sweep = config.get( "sweep", {} )
+    for name in axes:
+        if name in sweep.get( "axes", {} ):
+            axes[name] = sweep["axes"][name]
+    return axes
+
+def sample_indices( sizes = None,
+                    sampling = "full",
+                    samples = None,
+                    fraction = 2,
+                    seed = None ):
+    """Index tuples into axes with the given numbers of levels.
+    'full' is the cartesian product. 'fraction' keeps the points whose level
+    indices sum to 0 modulo 'fraction'. That is a regular fractional factorial
+    design only for two level axes and fraction 2 (the half fraction with
+    I = ABC...); on wider axes it drops whole levels, so main_process refuses
+    them. 'lhs' draws
+    'samples' points by Latin hypercube sampling: every axis is cut into
+    'samples' strata and each stratum is used exactly once."""
+    assert( sampling in sampling_methods )
+    if sampling == "full":
+        return list( itertools.product( *[ range(x) for x in sizes ] ) )
+    if sampling == "fraction":
+        return [ x for x in itertools.product( *[ range(x) for x in sizes ] )
+                 if sum(x) % fraction == 0 ]
+    rng = random.Random( seed )
+    columns = []
+    for size in sizes:
+        strata = range( samples )
+        rng.shuffle( strata )
+        columns.append( [ int( (x + rng.random()) * size / samples ) for x in strata ] )
+    # Several strata map onto the same level when samples > size.
+    return list( collections.OrderedDict.fromkeys( zip( *columns ) ) )
+
+def expand_sweep( axes = None,
+                  sampling = "full",
+                  samples = None,
+                  fraction = 2,
+                  seed = None ):
+    """Returns the list of sweep points as dictionaries. Heuristics are not
+    sampled: every sampled point is crossed with all of them, so that the
+    heuristics are always compared on the same configurations. Heuristics
+    only apply to Shenandoah; other collectors get the heuristic 'None'."""
+    names = [ x for x in axes if x != "heuristic" ]
+    indices = sample_indices( sizes = [ len(axes[x]) for x in names ],
+                              sampling = sampling,
+                              samples = samples,
+                              fraction = fraction,
+                              seed = seed )
+    points = []
+    for index in indices:
+        point = dict( [ (name, axes[name][i]) for (name, i) in zip( names, index ) ] )
+        hlist = axes["heuristic"] if point["gc_algo"] == "shenandoah" else [ "None" ]
+        for hname in hlist:
+            points.append( dict( point, heuristic = hname ) )
+    return points
+
+#
+# Racing heuristics
+#
+def get_cell_key( run_config ):
+    """Everything that identifies a comparison between heuristics."""
+    return tuple( [ run_config.get( x ) for x in [ "benchmark", "gc_algo", "min_heap", "max_heap",
+                                                   "par_gcthreads", "conc_gcthreads", "appnum",
+                                                   "number", "java_actual_path", "extra_flags" ] ] )
+
+def worse_p_value( a = None,
+                   b = None ):
+    """p-value of Welch's t-test that the costs in a are higher than those
+    in b, or 1.0 if they are not higher."""
+    (t, p) = welch_t_test( a, b )
+    return p if t > 0 else 1.0
+
+def holm_reject( p_values = None,
+                 alpha = 0.05 ):
+    """Holm's step-down procedure: which of the hypotheses to reject while
+    keeping the family-wise error rate at alpha."""
+    reject = [ False ] * len(p_values)
+    order = sorted( xrange( len(p_values) ), key = lambda i: p_values[i] )
+    for (rank, i) in enumerate( order ):
+        if p_values[i] >= alpha / (len(p_values) - rank):
+            break
+        reject[i] = True
+    return reject
+
+def race_heuristics( run_list = None,
+                     execute = None,
+                     get_metrics = None,
+                     initial_reps = 3,
+                     budget = 10,
+                     alpha = 0.05,
+                     on_eliminate = None,
+                     logger = None ):
+    """Races the heuristics in run_list against each other within every cell
+    (see get_cell_key). Every heuristic first gets initial_reps repetitions.
+    After each round a heuristic is dropped from its cell if, compared to the
+    cell's best heuristic by runtime, it is significantly worse (Welch's t-test)
+    in runtime or p99 pause time and not significantly better in the other.
+    The tests of a round are Holm corrected over all the cell's challengers
+    and both metrics, and every round gets an equal share of alpha, so that
+    the chance of dropping a heuristic that is not worse stays below alpha
+    over the whole race. The survivors get initial_reps more repetitions per
+    round until they have 'budget' repetitions or only one is left.
+    execute( runs ) runs a list of run configurations. get_metrics( run ) returns
+    (runtime cost, p99 pause or None) for a finished run, or None if it failed.
+    on_eliminate( cell, heuristic, best, info ) is called for every drop."""
+    cells = collections.OrderedDict()
+    for run_config in run_list:
+        cells.setdefault( get_cell_key( run_config ), [] ).append( run_config )
+    alive = dict( [ (cell, [ x["heuristic"] for x in runs ]) for (cell, runs) in cells.items() ] )
+    # Every round looks at the data again (Bonferroni over the rounds).
+    rounds = int( math.ceil( float(budget) / initial_reps ) )
+    round_alpha = alpha / max( rounds, 1 )
+    done_reps = 0
+    while done_reps < budget:
+        reps = min( initial_reps, budget - done_reps )
+        batch = []
+        for (cell, runs) in cells.items():
+            if len(alive[cell]) < 2 and done_reps > 0:
+                continue
+            for run_config in runs:
+                if run_config["heuristic"] not in alive[cell]:
+                    continue
+                for rep in xrange( done_reps, done_reps + reps ):
+                    rep_config = dict( run_config )
+                    rep_config["repetition"] = rep
+                    batch.append( rep_config )
+        if not batch:
+            break
+        execute( batch )
+        done_reps += reps
+        for (cell, runs) in cells.items():
+            if len(alive[cell]) < 2:
+                continue
+            costs = {}
+            pauses = {}
+            for run_config in runs:
+                hname = run_config["heuristic"]
+                if hname not in alive[cell]:
+                    continue
+                costs[hname] = []
+                pauses[hname] = []
+                for rep in xrange( done_reps ):
+                    rep_config = dict( run_config )
+                    rep_config["repetition"] = rep
+                    metrics = get_metrics( rep_config )
+                    if metrics == None:
+                        continue
+                    costs[hname].append( metrics[0] )
+                    if metrics[1] != None:
+                        pauses[hname].append( metrics[1] )
+            ranked = sorted( [ x for x in costs if costs[x] ], key = lambda x: mean( costs[x] ) )
+            if not ranked:
+                continue
+            best = ranked[0]
+            challengers = ranked[1:]
+            p_values = [ worse_p_value( costs[x], costs[best] ) for x in challengers ] + \
+                       [ worse_p_value( pauses[x], pauses[best] ) for x in challengers ]
+            reject = holm_reject( p_values, round_alpha )
+            for (index, hname) in enumerate( challengers ):
+                slower = reject[index]
+                longer_pauses = reject[len(challengers) + index]
+                # What saves a heuristic is not corrected, which only keeps
+                # more of them in the race.
+                faster = worse_p_value( costs[best], costs[hname] ) < round_alpha
+                shorter_pauses = worse_p_value( pauses[best], pauses[hname] ) < round_alpha
+                if (slower and not shorter_pauses) or (longer_pauses and not faster):
+                    alive[cell].remove( hname )
+                    info = { "repetitions" : done_reps,
+                             "mean_cost" : mean( costs[hname] ),
+                             "best_mean_cost" : mean( costs[best] ),
+                             "slower" : slower,
+                             "longer_pauses" : longer_pauses }
+                    logger.debug( "Eliminated %s in %s after %d repetitions: %s" %
+                                  (hname, str(cell), done_reps, str(info)) )
+                    if on_eliminate != None:
+                        on_eliminate( cell, hname, best, info )
+    return alive
 
 def set_benchmark_flags( config ):
     dacapo_flag = len(config["dacapo_benchmarks"]) > 0
@@ -195,6 +3047,7 @@ def main_process( config = None,
                   max_heap = "2g",
                   output = None,
                   java_actual_path = None,
+                  jvms = None,
                   number = 5,
                   number_appthreads = None,
                   pargcthreads = 2,
@@ -203,20 +3056,93 @@ def main_process( config = None,
                   debugflag = False,
                   logger = None,
                   heuristic = None,
+                  jobs = 1,
+                  resume = False,
+                  adaptive = None,
+                  race = None,
+                  sample_interval = None,
+                  seed = None,
+                  store = None,
+                  timeout = None,
+                  hang_timeout = None,
+                  retries = 0,
+                  coordinator = None,
+                  secret_file = None,
+                  batch_size = 1,
+                  quiesce = None,
+                  history = None,
+                  progress_interval = 60.0,
+                  profile = None,
+                  profile_fraction = 0.1,
                   fake = False,
                   pp = None ):
+    """jvms is a list of (label, java path) pairs to compare. Without it,
+    java_actual_path is used under the default label. With a coordinator
+    (HOST, PORT) address the runs go to remote workers instead; secret_file
+    holds the secret they share (see load_secret).
+    batch_size > 1 runs up to that many DaCapo benchmarks with identical
+    JVM flags in one JVM (see make_batches); not with a coordinator.
+    quiesce holds options for check_environment, see default_quiesce.
+    history is the path of the run duration history used for the ETA and
+    to start the longest runs first when they run in parallel.
+    profile is a tuple of profile_modes. After the timing runs, that fraction
+    of the configurations gets one extra, profiled run."""
     global heuristic_list
-    java_actual_path = os.path.abspath( java_actual_path )
-    if concgcthreads < 2:
+    axes = get_sweep_axes( config = config,
+                           gc_algo = gc_algo,
+                           heuristic = heuristic,
+                           min_heap = min_heap,
+                           max_heap = max_heap,
+                           pargcthreads = pargcthreads,
+                           concgcthreads = concgcthreads,
+                           number_appthreads = number_appthreads )
+    if jvms == None:
+        jvms = [ (default_jvm_label, java_actual_path) ]
+    jvms = [ (label, os.path.abspath( path )) for (label, path) in jvms ]
+    if min( axes["conc_gcthreads"] ) < 2:
         print "ConcGCThreads must be >= 2."
         exit(2)
+    for hname in axes["heuristic"]:
+        if hname not in heuristic_list:
+            print "Unknown heuristic: %s" % hname
+            exit(2)
+    sweep = config.get( "sweep", {} )
+    if sweep.get( "sampling" ) == "fraction":
+        wide = [ "%s has %d" % (sweep_axis_options[x], len(axes[x]))
+                 for x in axes if x != "heuristic" and len(axes[x]) > 2 ]
+        if wide:
+            print "Sampling 'fraction' needs axes with at most 2 levels, but %s." % ", ".join( wide )
+            exit(2)
+        if sweep.get( "fraction", 2 ) != 2:
+            print "WARNING: Only fraction 2 gives a regular fractional factorial design."
+    # The number of application threads (-bt) only exists for SPECjvm.
+    dacapo_axes = collections.OrderedDict( axes )
+    dacapo_axes["appnum"] = [ 1 ]
+    (points, dacapo_points) = [ expand_sweep( axes = x,
+                                              sampling = sweep.get( "sampling", "full" ),
+                                              samples = sweep.get( "samples" ),
+                                              fraction = sweep.get( "fraction", 2 ),
+                                              seed = sweep.get( "seed" ) )
+                                for x in (axes, dacapo_axes) ]
+    print "Sweep: %d configurations per DaCapo and %d per SPECjvm benchmark and JVM." % \
+        (len(dacapo_points), len(points))
     # Loop through required benchmarks
     dacapo_benchmark_list = config["dacapo_benchmarks"]
     specjvm_benchmark_list = config["specjvm_benchmarks"]
     blist = dacapo_benchmark_list + specjvm_benchmark_list
     pp.pprint(blist)
     (dacapo_flag, specjvm_flag) = set_benchmark_flags( config )
-    create_directories( blist )
+    # The output path is relative to where we were started, not WORK.
+    output = os.path.abspath( output )
+    if store != None:
+        require_numpy()
+        store = os.path.abspath( store )
+        if not os.path.isdir( store ):
+            os.makedirs( store )
+    history = DurationHistory( os.path.abspath( history ) if history != None else None )
+    secret = load_secret( secret_file ) if coordinator != None else None
+    java_hashes = dict( [ (path, hash_jvm( path )) for (label, path) in jvms ] )
+    create_directories( blist, resume = resume )
     # Set benchmark paths
     dacapo_path = config["dacapo_path"]
     if not os.path.isfile(dacapo_path):
@@ -228,8 +3154,8 @@ def main_process( config = None,
         specjvm_flag = False
     if not specjvm_flag and not dacapo_flag:
         print "No benchmarks to run! Exiting"
-        print "base path   : %s" % prefix
-        print "java path   : %s" % java_actual_path
+        for (label, path) in jvms:
+            print "java path   : %s (%s)" % (path, label)
         print "dacapo path : %s" % dacapo_path
         print "specjvm path: %s" % specjvm_path
         print "benchmark list: %s" % pp.pformat(blist)
@@ -237,59 +3163,1239 @@ def main_process( config = None,
         # Either, no valid benchmarks specified or the paths don't exist.
         exit(44)
     print "==========================================================================="
-    if gc_algo == "defaultgc":
-        print "-------------> USING DEFAULT GC!!! <---------------------------------------"
-    elif gc_algo == "g1":
-        print "-------------> USING G1 GC!!! <--------------------------------------------"
-    else:
-        print "-------------> USING SHENANDOAH GC!!! <------------------------------------"
+    for algo in axes["gc_algo"]:
+        if algo == "defaultgc":
+            print "-------------> USING DEFAULT GC!!! <---------------------------------------"
+        elif algo == "g1":
+            print "-------------> USING G1 GC!!! <--------------------------------------------"
+        else:
+            print "-------------> USING SHENANDOAH GC!!! <------------------------------------"
     print "==========================================================================="
-    rows = []
+    run_list = []
     for bmark in blist:
-        if heuristic == "ALL":
-            actual_hlist = heuristic_list if gc_algo == "shenandoah" else [ "None" ]
+        for point in (dacapo_points if bmark in dacapo_benchmark_list else points):
+            for (jvm_label, jvm_path) in jvms:
+                run_list.append( { "benchmark" : bmark,
+                                   "java_actual_path" : jvm_path,
+                                   "jvm_label" : jvm_label,
+                                   "specjvm_flag" : (bmark in specjvm_benchmark_list),
+                                   "dacapo_flag" : (bmark in dacapo_benchmark_list),
+                                   "dacapo_path" : dacapo_path,
+                                   "specjvm_path" : specjvm_path,
+                                   "number" : number,
+                                   "gc_algo" : point["gc_algo"],
+                                   "heuristic" : point["heuristic"],
+                                   "min_heap" : point["heap"][0],
+                                   "max_heap" : point["heap"][1],
+                                   "par_gcthreads" : point["par_gcthreads"],
+                                   "conc_gcthreads" : point["conc_gcthreads"],
+                                   "appnum" : point["appnum"],
+                                   "extra_flags" : point["extra_flags"],
+                                   "printgcdetails" : printgcdetails,
+                                   "adaptive" : adaptive,
+                                   "sample_interval" : sample_interval,
+                                   "timeout" : timeout,
+                                   "hang_timeout" : hang_timeout,
+                                   "retries" : retries,
+                                   "fake" : fake,
+                                   "logger" : logger,
+                                   "pp" : pp } )
+
+    ledger = None if fake else RunLedger()
+    quiesce = dict( quiesce if quiesce != None else {} )
+    if jobs > 1 or coordinator != None:
+        # Our own runs keep the load average up.
+        quiesce["check_load"] = False
+        if quiesce.get( "drop_caches" ) and jobs > 1:
+            print "WARNING: Not dropping the page cache under the feet of parallel runs."
+            quiesce["drop_caches"] = False
+    if ledger != None:
+        # The environment at the start of the sweep is the baseline for
+        # every run, also after a --resume.
+        baselines = [ x for x in ledger.events if x.get( "event" ) == "environment" ]
+        if resume and baselines:
+            quiesce["baseline"] = baselines[0]["environment"]
         else:
-            assert( heuristic in heuristic_list )
-            actual_hlist = [ heuristic ]
-        # Loop through all heuristics
-        for heuristic in actual_hlist:
-            # TODO TODO TODO TODO
-            # for parnum in xrange(1, pargcthreads + 1):
-            # TODO: Do we want parnum hardcoded or not?
-            for concnum in xrange(2, concgcthreads + 1):
-                parnum = 2
-                for appnum in xrange(1, number_appthreads):
-                    # Run benchmark
-                    benchmark = run_benchmark( benchmark = bmark,
-                                               java_actual_path = java_actual_path,
-                                               specjvm_flag = (bmark in specjvm_benchmark_list),
-                                               dacapo_flag = (bmark in dacapo_benchmark_list),
-                                               dacapo_path = dacapo_path,
-                                               specjvm_path = specjvm_path,
-                                               number = number,
-                                               gc_algo = gc_algo,
-                                               heuristic = heuristic,
-                                               min_heap = min_heap,
-                                               max_heap = max_heap,
-                                               par_gcthreads = parnum,
-                                               conc_gcthreads = concnum,
-                                               appnum = appnum,
-                                               printgcdetails = printgcdetails,
-                                               fake = fake,
-                                               logger = logger,
-                                               pp = pp )
-                    print "---------------------------------------------------------------------------"
-                    if True: # TODO TODO Check for failed here.
-                        # Right now we're not really checking if it passed or failed.
-                        # It would obviously have to be different for Dacapo vs SpecJVM.
-                        pass
-                    else:
-                        logger.debug( "Benchmark %s with %s - %s - FAILED." %
-                                      (bmark, gc_algo, str(heuristic)) )
+            quiesce["baseline"] = get_environment()
+            ledger.record_event( event = "environment",
+                                 environment = quiesce["baseline"] )
+        print "Environment: %s" % ", ".join( [ "%s=%s" % (x, quiesce["baseline"].get( x ))
+                                               for x in environment_fields ] )
+    if len(jvms) > 1:
+        # Runs of the different JVMs are interleaved in random order, so that
+        # drift in the machine's state affects all of them alike.
+        seed = seed if seed != None else int( time.time() )
+        rng = random.Random( seed )
+        print "Interleaving %d JVMs with random seed %d" % (len(jvms), seed)
+        if ledger != None:
+            ledger.record_event( event = "interleave",
+                                 seed = seed,
+                                 jvms = jvms )
+    csv_writer = None if fake else \
+                 CsvResultWriter( tgtpath = output,
+                                  header = csv_header + result_columns,
+                                  append = resume )
+
+    parallel = jobs > 1 or coordinator != None
+    progress = ProgressTracker( slots = (jobs if not fake else 1),
+                                history = (history if not fake else None),
+                                status_path = (None if fake else "status.json"),
+                                interval = progress_interval )
+
+    def run_done( run_config, result ):
+        print "---------------------------------------------------------------------------"
+        progress.on_finish( run_config, result )
+        if result == None or fake:
+            return
+        passed = (result["status"] == "ok")
+        if not passed:
+            logger.debug( "Benchmark %s with %s - %s - FAILED: %s after %d attempts." %
+                          (run_config["benchmark"], run_config["gc_algo"], str(run_config["heuristic"]),
+                           result["status"], result["attempts"]) )
+        runtime_list = result["runtimes"]
+        csvrow = construct_row( benchmark = run_config["benchmark"],
+                                runtime_list = runtime_list,
+                                gc_algo = run_config["gc_algo"],
+                                heuristic = run_config["heuristic"],
+                                min_heap = run_config["min_heap"],
+                                max_heap = run_config["max_heap"],
+                                par_gcthreads = run_config["par_gcthreads"],
+                                conc_gcthreads = run_config["conc_gcthreads"],
+                                number_iterations = len(runtime_list),
+                                warmup_iterations = result["warmup_iterations"] )
+        extra = { "status" : result["status"],
+                  "attempts" : result["attempts"],
+                  "jvm" : run_config["jvm_label"],
+                  "unit" : ("msec" if run_config["dacapo_flag"] else "ops/m"),
+                  "extra_flags" : " ".join( run_config["extra_flags"] ),
+                  "appnum" : run_config["appnum"],
+                  "repetition" : run_config.get( "repetition", 0 ),
+                  "warmup_iterations" : result["warmup_iterations"],
+                  "converged" : int(result["converged"]),
+                  "host" : result.get( "host", "" ),
+                  "hardware" : result.get( "hardware", "" ),
+                  "profile" : ",".join( run_config.get( "profile", () ) ) }
+        gc_stats = gc_log_stats( gc_logfile = result["gc_logfile"],
+                                 wall_time = result["wall_time"],
+                                 window = result.get( "gc_window" ) )
+        if gc_stats != None:
+            extra.update( gc_stats )
+        if result["resources"] != None:
+            extra.update( result["resources"] )
+        if result.get( "environment" ) != None:
+            extra.update( result["environment"] )
+        extra.update( profile_stats( result ) )
+        csv_writer.add_row( csvrow + [ extra.get( x, "" ) for x in result_columns ] )
+        # Only after the row is safely in the CSV.
+        steady = csvrow[runtimes_index]
+        ledger.record( key = get_run_key( run_config, java_hashes[run_config["java_actual_path"]] ),
+                       status = ("completed" if passed else "failed"),
+                       output_file = result["output_file"],
+                       run_status = result["status"],
+                       hs_err = result["hs_err"],
+                       runtime_mean = (mean( steady ) if steady else None),
+                       gc_pause_p99_ms = extra.get( "gc_pause_p99_ms" ) )
+
+    def on_retry( run_config, result ):
+        ledger.record_event( event = "retry",
+                             run_key = list( get_run_key( run_config, java_hashes[run_config["java_actual_path"]] ) ),
+                             run_status = result["status"],
+                             output_file = result["output_file"],
+                             hs_err = result["hs_err"] )
+
+    for run_config in run_list:
+        run_config["quiesce"] = quiesce
+        if ledger != None:
+            run_config["on_retry"] = on_retry
+
+    def on_pin( pin_key, hardware ):
+        ledger.record_event( event = "pin",
+                             pin_key = pin_key,
+                             hardware = hardware )
+
+    if coordinator != None and not fake:
+        pins = dict( [ (x["pin_key"], x["hardware"]) for x in ledger.events
+                       if x.get( "event" ) == "pin" ] )
+        coordinator = Coordinator( address = coordinator,
+                                   secret = secret,
+                                   pins = pins,
+                                   on_pin = on_pin,
+                                   logger = logger )
+    else:
+        coordinator = None
+
+    def execute( runs ):
+        if resume and ledger != None:
+            total = len(runs)
+            runs = [ x for x in runs
+                     if not ledger.is_completed( get_run_key( x, java_hashes[x["java_actual_path"]] ) ) ]
+            print "Resuming: %d of %d runs already completed." % (total - len(runs), total)
+        if len(jvms) > 1:
+            runs = list( runs )
+            rng.shuffle( runs )
+        progress.add_runs( runs )
+        if batch_size > 1 and coordinator == None:
+            runs = make_batches( run_list = runs,
+                                 batch_size = batch_size )
+        if parallel:
+            runs = sort_longest_first( run_list = runs,
+                                       history = history )
+        run_sweep( run_list = runs,
+                   jobs = (1 if fake else jobs),
+                   callback = run_done,
+                   on_start = progress.on_start,
+                   coordinator = coordinator,
+                   logger = logger )
+
+    def get_metrics( run_config ):
+        record = ledger.get_record( get_run_key( run_config, java_hashes[run_config["java_actual_path"]] ) )
+        if record == None or record["status"] != "completed" or record["runtime_mean"] == None:
+            return None
+        # SPECjvm2008 reports throughput, so higher is better there.
+        cost = record["runtime_mean"] if run_config["dacapo_flag"] else -record["runtime_mean"]
+        return (cost, record.get( "gc_pause_p99_ms" ))
+
+    def on_eliminate( cell, hname, best, info ):
+        print "RACE: dropping %s for %s (best so far: %s)" % (hname, cell[0], best)
+        ledger.record_event( event = "eliminated",
+                             cell = list( cell ),
+                             heuristic = hname,
+                             best = best,
+                             **info )
+
+    progress.start()
+    if race != None and len(axes["heuristic"]) > 1 and not fake:
+        race_heuristics( run_list = run_list,
+                         execute = execute,
+                         get_metrics = get_metrics,
+                         initial_reps = race["initial_reps"],
+                         budget = race["budget"],
+                         alpha = race["alpha"],
+                         on_eliminate = on_eliminate,
+                         logger = logger )
+    else:
+        execute( run_list )
+    if profile:
+        profile_runs = make_profile_runs( run_list = run_list,
+                                          modes = profile,
+                                          fraction = profile_fraction )
+        print "Profiling %d of %d configurations with %s." % \
+            (len(profile_runs), len(run_list), ", ".join( profile ))
+        execute( profile_runs )
+    progress.stop()
+    if coordinator != None:
+        coordinator.close()
+    if csv_writer != None:
+        csv_writer.close()
+        ledger.close()
+        if store != None:
+            print "Results stored as sweep %s" % ingest_csvfile( csvpath = output, store = store )
     logger.error( "=====[ DONE ]==============================================================" )
     print "=====[ DONE ]=============================================================="
     exit(0)
 
+#
+# Columnar results store
+#
+# A store is a directory with one subdirectory per sweep. Every result column
+# of a sweep is a .npy file that can be memory mapped: the columns in
+# store_numeric_columns are float64 (NaN where empty), all others fixed width
+# byte strings ("" where empty). The type goes by the column's name, not by
+# its values, so that the sweeps of a store can always be concatenated. The
+# iteration times of all runs are kept in iterations.npy as one float64
+# array, with run i's times at iterations[offsets[i]:offsets[i + 1]].
+store_meta_filename = "meta.json"
+store_numeric_columns = set( [ "par_gcthreads", "conc_gcthreads", "number_iterations", "attempts", "appnum",
+                               "repetition", "warmup_iterations", "converged", "gc_pause_count",
+                               "gc_pause_total_ms", "gc_pause_p50_ms", "gc_pause_p99_ms", "gc_pause_p999_ms",
+                               "gc_pause_max_ms", "gc_throughput", "rss_peak_kb", "rss_mean_kb", "cpu_user_s",
+                               "cpu_system_s", "ctxt_voluntary", "ctxt_involuntary", "major_faults",
+                               "run_delay_s", "sampler_overhead", "env_matches", "quiet", "quiesce_wait_s",
+                               "load_before", "cpu_busy_before", "mem_pressure_before", "perf_cycles",
+                               "perf_instructions", "perf_ipc", "perf_cache_misses", "perf_cache_miss_rate",
+                               "perf_branch_misses", "perf_context_switches", "perf_cpu_migrations",
+                               "perf_page_faults", "perf_gc_thread_pct", "perf_vm_thread_pct",
+                               "perf_compiler_thread_pct", "safepoint_count", "safepoint_total_ms",
+                               "safepoint_max_ms", "safepoint_ttsp_max_ms", "jfr_kb", "runtime_mean" ] )
+
+def require_numpy():
+    if np == None:
+        print "The results store needs NumPy, which is not installed."
+        exit(5)
+
+def get_sweep_id( csvpath ):
+    """Stable name for the sweep behind csvpath, so that ingesting the same
+    CSV again (e.g. after --resume) replaces the earlier copy."""
+    csvpath = os.path.abspath( csvpath )
+    return "%s-%s" % ( os.path.splitext( os.path.basename( csvpath ) )[0],
+                       hashlib.sha1( csvpath ).hexdigest()[:8] )
+
+def parse_float( text ):
+    try:
+        return float( text )
+    except ValueError:
+        return None
+
+def ingest_csvfile( csvpath = None,
+                    store = None,
+                    sweep_id = None ):
+    """Converts a results CSV into a sweep of the columnar store."""
+    require_numpy()
+    sweep_id = sweep_id if sweep_id != None else get_sweep_id( csvpath )
+    with open( csvpath, "rb" ) as fp:
+        reader = csv.reader( fp )
+        header = reader.next()
+        columns = [ [] for x in header ]
+        iterations = array( "d" )
+        offsets = array( "l", [ 0 ] )
+        runtimes_column = header.index( "runtimes" )
+        for row in reader:
+            if len(row) != len(header):
+                # Partially written last row.
+                continue
+            for (column, value) in zip( columns, row ):
+                column.append( value )
+            iterations.extend( [ float(x) for x in row[runtimes_column].split(";") if x != "" ] )
+            offsets.append( len(iterations) )
+    tmpdir = os.path.join( store, ".%s.tmp" % sweep_id )
+    targetdir = os.path.join( store, sweep_id )
+    if not os.path.isdir( tmpdir ):
+        os.makedirs( tmpdir )
+    names = []
+    for (name, values) in zip( header, columns ):
+        if name == "runtimes":
+            continue
+        if name in store_numeric_columns:
+            numbers = [ parse_float( x ) for x in values ]
+            data = np.array( [ (x if x != None else np.nan) for x in numbers ], dtype = np.float64 )
+        else:
+            data = np.array( values, dtype = "S" )
+        np.save( os.path.join( tmpdir, name + ".npy" ), data )
+        names.append( name )
+    np.save( os.path.join( tmpdir, "iterations.npy" ), np.frombuffer( iterations, dtype = np.float64 ) )
+    np.save( os.path.join( tmpdir, "offsets.npy" ), np.array( offsets, dtype = np.int64 ) )
+    with open( os.path.join( tmpdir, store_meta_filename ), "w" ) as fp:
+        json.dump( { "sweep" : sweep_id,
+                     "source" : os.path.abspath( csvpath ),
+                     "ingested" : time.time(),
+                     "rows" : len(offsets) - 1,
+                     "columns" : names }, fp )
+    if os.path.isdir( targetdir ):
+        olddir = targetdir + ".old"
+        os.rename( targetdir, olddir )
+        os.rename( tmpdir, targetdir )
+        for name in os.listdir( olddir ):
+            os.remove( os.path.join( olddir, name ) )
+        os.rmdir( olddir )
+    else:
+        os.rename( tmpdir, targetdir )
+    return sweep_id
+
+def load_store( store = None,
+                sweeps = None,
+                with_iterations = False ):
+    """Loads all sweeps (or the ones named in sweeps) of a store into one
+    dictionary of column name -> array. Adds a 'sweep' column and the mean
+    iteration time of every run as 'runtime_mean'. Columns missing from
+    older sweeps are filled with NaN or empty strings. Text columns that
+    older versions stored as numbers are turned back into text.
+    with_iterations returns (data, iterations) instead: iterations is one
+    array with the iteration times of all runs, and the 'iteration_start'
+    and 'iteration_count' columns locate the ones of each run in it."""
+    require_numpy()
+    parts = []
+    iteration_parts = []
+    iteration_base = 0
+    for sweep_id in sorted( os.listdir( store ) ):
+        sweepdir = os.path.join( store, sweep_id )
+        if sweep_id.startswith( "." ) or not os.path.isfile( os.path.join( sweepdir, store_meta_filename ) ):
+            continue
+        if sweeps != None and sweep_id not in sweeps:
+            continue
+        with open( os.path.join( sweepdir, store_meta_filename ) ) as fp:
+            meta = json.load( fp )
+        part = dict( [ (name, np.load( os.path.join( sweepdir, name + ".npy" ), mmap_mode = "r" ))
+                       for name in meta["columns"] ] )
+        iterations = np.load( os.path.join( sweepdir, "iterations.npy" ), mmap_mode = "r" )
+        offsets = np.load( os.path.join( sweepdir, "offsets.npy" ) )
+        counts = np.diff( offsets )
+        sums = np.add.reduceat( np.append( iterations, 0.0 ), offsets[:-1] ) if len(counts) else np.zeros( 0 )
+        sums[counts == 0] = np.nan
+        part["runtime_mean"] = sums / np.maximum( counts, 1 )
+        part["sweep"] = np.array( [ sweep_id ] * meta["rows"], dtype = "S" )
+        if with_iterations:
+            part["iteration_start"] = offsets[:-1] + iteration_base
+            part["iteration_count"] = counts
+            iteration_parts.append( iterations )
+            iteration_base += len(iterations)
+        parts.append( part )
+    if not parts:
+        return ({}, np.zeros( 0 )) if with_iterations else {}
+    names = []
+    for part in parts:
+        names.extend( [ x for x in part if x not in names ] )
+    result = {}
+    for name in names:
+        pieces = []
+        for part in parts:
+            rows = len(part["sweep"])
+            if name in store_numeric_columns:
+                pieces.append( np.asarray( part[name], dtype = np.float64 ) if name in part
+                               else np.full( rows, np.nan ) )
+            elif name not in part:
+                pieces.append( np.array( [ "" ] * rows, dtype = "S" ) )
+            elif part[name].dtype.kind == "f":
+                pieces.append( np.array( [ ("" if math.isnan( x ) else "%.12g" % x) for x in part[name] ],
+                                         dtype = "S" ) )
+            else:
+                pieces.append( np.asarray( part[name] ) )
+        result[name] = np.concatenate( pieces )
+    if with_iterations:
+        return (result, np.concatenate( iteration_parts ))
+    return result
+
+def group_rows( data = None,
+                columns = None ):
+    """Returns (group index of every row, dictionary of the key columns per
+    group) for the distinct combinations of the columns."""
+    codes = []
+    uniques = []
+    for name in columns:
+        column = data[name]
+        if column.dtype.kind == "f":
+            # np.unique does not merge NaNs, e.g. of an all empty column.
+            column = np.where( np.isnan( column ), np.inf, column )
+        (unique, inverse) = np.unique( column, return_inverse = True )
+        if unique.dtype.kind == "f":
+            unique[ np.isinf( unique ) ] = np.nan
+        uniques.append( unique )
+        codes.append( inverse )
+    combined = np.ravel_multi_index( codes, [ len(x) for x in uniques ] )
+    (groups, group_index) = np.unique( combined, return_inverse = True )
+    key_codes = np.unravel_index( groups, [ len(x) for x in uniques ] )
+    keys = dict( [ (name, unique[code]) for (name, unique, code) in zip( columns, uniques, key_codes ) ] )
+    return (group_index, keys)
+
+def get_timing_rows( data ):
+    """Mask of the rows of runs that passed and were not profiled. Timed
+    out, hung or failed runs may have some iterations, but they are not
+    comparable to full runs, and profiled runs are slowed down by their
+    profilers."""
+    keep = np.ones( len(data["sweep"]), dtype = bool )
+    if "status" in data:
+        keep &= (data["status"] == "ok")
+    if "profile" in data:
+        keep &= (data["profile"] == "")
+    return keep
+
+def aggregate_groups( data = None,
+                      groupby = None,
+                      metric = "runtime_mean" ):
+    """Vectorized group-by over the store columns. Returns a dictionary with
+    the group key columns plus n, median, mean and ci95 (half width) of
+    metric per group, and whether most of the group's rows are throughput
+    results (higher_is_better). Rows where metric is NaN are left out."""
+    values = np.asarray( data[metric], dtype = np.float64 )
+    keep = ~np.isnan( values )
+    values = values[keep]
+    if "unit" in data:
+        throughput = (data["unit"][keep] == "ops/m")
+    else:
+        throughput = np.zeros( len(values), dtype = bool )
+    if len(values) == 0:
+        return None
+    (group_index, keys) = group_rows( data = dict( [ (x, data[x][keep]) for x in groupby ] ),
+                                      columns = groupby )
+    order = np.lexsort( (values, group_index) )
+    ordered = values[order]
+    counts = np.bincount( group_index )
+    starts = np.concatenate( ( [ 0 ], np.cumsum( counts )[:-1] ) )
+    median = ( ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2] ) / 2.0
+    sums = np.bincount( group_index, weights = values )
+    avg = sums / counts
+    squares = np.bincount( group_index, weights = (values - avg[group_index]) ** 2 )
+    std = np.sqrt( squares / np.maximum( counts - 1, 1 ) )
+    tcrit = np.array( [ (t_critical_95( x - 1 ) if x > 1 else np.nan) for x in counts ] )
+    result = { "n" : counts,
+               "median" : median,
+               "mean" : avg,
+               "ci95" : tcrit * std / np.sqrt( counts ),
+               "higher_is_better" : np.bincount( group_index, weights = throughput ) * 2 > counts }
+    result.update( keys )
+    return result
+
+def add_speedup( groups = None,
+                 groupby = None,
+                 baseline = None,
+                 higher_is_better = None ):
+    """Adds 'speedup' = baseline median / group median (inverted where
+    higher_is_better) for groups that differ from a baseline heuristic group
+    only in the heuristic."""
+    others = [ x for x in groupby if x != "heuristic" ]
+    keys = [ tuple( [ groups[x][i] for x in others ] ) for i in xrange( len(groups["n"]) ) ]
+    base = {}
+    for (i, key) in enumerate( keys ):
+        if groups["heuristic"][i] == baseline:
+            base[key] = groups["median"][i]
+    reference = np.array( [ base.get( key, np.nan ) for key in keys ] )
+    speedup = reference / groups["median"]
+    if higher_is_better is not None:
+        speedup = np.where( higher_is_better, 1.0 / speedup, speedup )
+    groups["speedup"] = speedup
+
+def print_table( columns = None,
+                 data = None ):
+    cells = [ columns ]
+    for i in xrange( len(data[columns[0]]) ):
+        row = []
+        for name in columns:
+            value = data[name][i]
+            if isinstance( value, (float, np.floating) ):
+                row.append( "%.4g" % value )
+            else:
+                row.append( str(value) )
+        cells.append( row )
+    widths = [ max( [ len(x[i]) for x in cells ] ) for i in xrange( len(columns) ) ]
+    for row in cells:
+        print "  ".join( [ x.ljust(w) for (x, w) in zip( row, widths ) ] )
+
+def query_main( argv ):
+    require_numpy()
+    parser = argparse.ArgumentParser( prog = "run_heuristics.py query",
+                                      description = "Aggregate results across all sweeps in a results store." )
+    parser.add_argument( "--store",
+                         help = "Results store directory.",
+                         action = "store",
+                         default = "results-store" )
+    parser.add_argument( "--groupby",
+                         help = "Comma separated columns to group by. Default is benchmark,heuristic",
+                         action = "store",
+                         default = "benchmark,heuristic" )
+    parser.add_argument( "--metric",
+                         help = "Column to aggregate. Default is runtime_mean, the mean iteration time (or ops/m) of each run.",
+                         action = "store",
+                         default = "runtime_mean" )
+    parser.add_argument( "--where",
+                         help = "Only use rows where column=value. May be repeated.",
+                         action = "append",
+                         default = [] )
+    parser.add_argument( "--baseline",
+                         help = "Heuristic to compute speedups against. Default is statusquo",
+                         action = "store",
+                         default = "statusquo" )
+    parser.add_argument( "--sweep",
+                         help = "Only use this sweep. May be repeated.",
+                         action = "append",
+                         default = None )
+    parser.add_argument( "--all-runs",
+                         help = "Also aggregate the runs that did not pass and the profiled runs.",
+                         action = "store_true",
+                         default = False )
+    args = parser.parse_args( argv )
+    data = load_store( store = args.store, sweeps = args.sweep )
+    if not data:
+        print "No sweeps found in %s" % args.store
+        exit(1)
+    groupby = [ x for x in args.groupby.split(",") if x != "" ]
+    for name in groupby + [ args.metric ]:
+        if name not in data:
+            parser.error( "Unknown column: %s" % name )
+    keep = np.ones( len(data["sweep"]), dtype = bool ) if args.all_runs else get_timing_rows( data )
+    for condition in args.where:
+        (name, _, value) = condition.partition( "=" )
+        if name not in data:
+            parser.error( "Unknown column: %s" % name )
+        column = data[name]
+        keep &= (column == (float(value) if column.dtype.kind == "f" else value))
+    data = dict( [ (name, column[keep]) for (name, column) in data.items() ] )
+    groups = aggregate_groups( data = data, groupby = groupby, metric = args.metric )
+    if groups == None:
+        print "No matching results."
+        exit(1)
+    columns = groupby + [ "n", "median", "mean", "ci95" ]
+    if "heuristic" in groupby and args.metric == "runtime_mean":
+        add_speedup( groups = groups,
+                     groupby = groupby,
+                     baseline = args.baseline,
+                     higher_is_better = groups["higher_is_better"] )
+        columns.append( "speedup" )
+    print_table( columns = columns, data = groups )
+    return 0
+
+def ingest_main( argv ):
+    require_numpy()
+    parser = argparse.ArgumentParser( prog = "run_heuristics.py ingest",
+                                      description = "Add results CSV files to a results store." )
+    parser.add_argument( "csvfiles",
+                         help = "Results CSV files.",
+                         nargs = "+" )
+    parser.add_argument( "--store",
+                         help = "Results store directory.",
+                         action = "store",
+                         default = "results-store" )
+    args = parser.parse_args( argv )
+    if not os.path.isdir( args.store ):
+        os.makedirs( args.store )
+    for csvpath in args.csvfiles:
+        print "%s -> %s" % (csvpath, ingest_csvfile( csvpath = csvpath, store = args.store ))
+    return 0
+
+#
+# Differential report
+#
+# Compares every heuristic (and every other collector) with a baseline
+# heuristic in each cell, a benchmark under one heap and thread
+# configuration. Confidence intervals come from a bootstrap that resamples
+# all groups of all cells at once with NumPy fancy indexing, in chunks of
+# bootstrap_chunk_size draws.
+report_cell_columns = [ "benchmark", "min_heap", "max_heap", "par_gcthreads", "conc_gcthreads",
+                        "appnum", "jvm", "extra_flags" ]
+report_pause_metrics = [ "gc_pause_p99_ms", "gc_pause_max_ms" ]
+bootstrap_chunk_size = 4000000
+
+def load_results( csvfiles = None,
+                  store = None,
+                  sweeps = None ):
+    """(data, iterations) like load_store( with_iterations = True ), from a
+    results store or from result CSV files."""
+    require_numpy()
+    if not csvfiles:
+        return load_store( store = store, sweeps = sweeps, with_iterations = True )
+    tmpstore = tempfile.mkdtemp( prefix = "report-" )
+    try:
+        for csvpath in csvfiles:
+            ingest_csvfile( csvpath = csvpath, store = tmpstore )
+        (data, iterations) = load_store( store = tmpstore, with_iterations = True )
+        # Copy out of the memory maps before the files go away.
+        return ( dict( [ (name, np.array( column )) for (name, column) in data.items() ] ),
+                 np.array( iterations ) )
+    finally:
+        shutil.rmtree( tmpstore )
+
+def gather_samples( group_index = None,
+                    values = None,
+                    lengths = None,
+                    starts = None,
+                    groups = None ):
+    """Lays out the samples of every group one after the other. Row i
+    contributes values[starts[i]:starts[i] + lengths[i]]. Returns (samples,
+    sizes) with sizes[g] the number of samples of group g."""
+    order = np.argsort( group_index, kind = "mergesort" )
+    lengths = lengths[order]
+    total = lengths.sum()
+    row_of = np.repeat( np.arange( len(order) ), lengths )
+    position = np.arange( total ) - np.repeat( np.cumsum( lengths ) - lengths, lengths )
+    samples = values[ starts[order][row_of] + position ]
+    sizes = np.bincount( group_index[order], weights = lengths, minlength = groups ).astype( np.int64 )
+    return (samples, sizes)
+
+def bootstrap_means( samples = None,
+                     sizes = None,
+                     resamples = 2000,
+                     rng = None ):
+    """Bootstrap distribution of the mean of every group. The samples of
+    group g are the next sizes[g] entries of samples. Returns a (resamples,
+    groups) array, NaN for empty groups. All groups are resampled together,
+    so the cost is a handful of NumPy calls per chunk instead of a Python
+    loop over groups and resamples."""
+    offsets = np.concatenate( ( [ 0 ], np.cumsum( sizes )[:-1] ) )
+    group_of = np.repeat( np.arange( len(sizes) ), sizes )
+    nonempty = sizes > 0
+    result = np.full( (resamples, len(sizes)), np.nan )
+    if len(samples) == 0:
+        return result
+    base = offsets[group_of]
+    span = sizes[group_of]
+    step = max( 1, bootstrap_chunk_size // len(samples) )
+    for first in xrange( 0, resamples, step ):
+        count = min( step, resamples - first )
+        draws = base + ( rng.random_sample( (count, len(samples)) ) * span ).astype( np.int64 )
+        sums = np.add.reduceat( samples[draws], offsets[nonempty], axis = 1 )
+        result[first:first + count, nonempty] = sums / sizes[nonempty]
+    return result
+
+def differential_report( data = None,
+                         iterations = None,
+                         cell_columns = None,
+                         baseline = "statusquo",
+                         unit = "runs",
+                         resamples = 2000,
+                         seed = 1 ):
+    """Compares every variant (the heuristic for Shenandoah, else the
+    collector) with the baseline heuristic in each cell. Returns a dictionary
+    of arrays with one entry per comparison: the cell columns, 'variant',
+    'n' and 'n_baseline' (runs), 'speedup' with its 95% bootstrap interval
+    'speedup_low'/'speedup_high', 'verdict', and per pause metric the
+    difference of the means ('<metric>_delta') with its interval. Speedups
+    above 1 are better than the baseline, also for throughput results.
+    unit is what gets resampled for the speedup: the mean times of whole
+    runs, or single iterations. Either way a comparison needs at least two
+    runs on each side for an interval and a verdict; the iterations of one
+    JVM are correlated and do not show the spread between runs. Such
+    comparisons get the verdict "?". Failed and profiled runs are left out."""
+    rng = np.random.RandomState( seed )
+    keep = ~np.isnan( np.asarray( data["runtime_mean"], dtype = np.float64 ) ) & get_timing_rows( data )
+    data = dict( [ (name, column[keep]) for (name, column) in data.items() ] )
+    if len(data["runtime_mean"]) == 0:
+        return None
+    data["variant"] = np.where( data["gc_algo"] == "shenandoah", data["heuristic"], data["gc_algo"] )
+    (group_index, keys) = group_rows( data = data, columns = cell_columns + [ "variant" ] )
+    groups = len(keys["variant"])
+    (cell_of_group, cells) = group_rows( data = keys, columns = cell_columns )
+    throughput = (data["unit"] == "ops/m") if "unit" in data else np.zeros( len(group_index), dtype = bool )
+    higher_is_better = np.bincount( group_index, weights = throughput, minlength = groups ) * 2 > \
+                       np.bincount( group_index, minlength = groups )
+    runs = np.bincount( group_index, minlength = groups )
+    # Baseline group of every cell, or -1.
+    base_of_cell = np.full( len(cells["benchmark"]), -1, dtype = np.int64 )
+    is_base = (keys["variant"] == baseline)
+    base_of_cell[ cell_of_group[is_base] ] = np.nonzero( is_base )[0]
+    candidates = np.nonzero( ~is_base & (base_of_cell[cell_of_group] >= 0) )[0]
+    bases = base_of_cell[ cell_of_group[candidates] ]
+    if unit == "iterations":
+        (samples, sizes) = gather_samples( group_index = group_index,
+                                           values = iterations,
+                                           lengths = data["iteration_count"].astype( np.int64 ),
+                                           starts = data["iteration_start"].astype( np.int64 ),
+                                           groups = groups )
+    else:
+        (samples, sizes) = gather_samples( group_index = group_index,
+                                           values = data["runtime_mean"],
+                                           lengths = np.ones( len(group_index), dtype = np.int64 ),
+                                           starts = np.arange( len(group_index) ),
+                                           groups = groups )
+    means = np.bincount( np.repeat( np.arange( groups ), sizes ), weights = samples, minlength = groups ) / \
+            np.maximum( sizes, 1 )
+    boot = bootstrap_means( samples = samples, sizes = sizes, resamples = resamples, rng = rng )
+    flip = higher_is_better[candidates]
+    speedup = np.where( flip, means[candidates] / means[bases], means[bases] / means[candidates] )
+    ratios = np.where( flip, boot[:, candidates] / boot[:, bases], boot[:, bases] / boot[:, candidates] )
+    with np.errstate( invalid = "ignore" ):
+        # Groups are either empty (all NaN) or never NaN, so the plain
+        # percentile does, and is a lot faster than nanpercentile.
+        (low, high) = np.percentile( ratios, [ 2.5, 97.5 ], axis = 0 ) if len(candidates) else (speedup, speedup)
+    # One run per side has no run to run spread to resample.
+    few = (runs[candidates] < 2) | (runs[bases] < 2)
+    low = np.where( few, np.nan, low )
+    high = np.where( few, np.nan, high )
+    with np.errstate( invalid = "ignore" ):
+        verdict = np.where( low > 1.0, "better", np.where( high < 1.0, "worse", "same" ) )
+    verdict = np.where( np.isnan( low ), "?", verdict )
+    result = dict( [ (name, cells[name][ cell_of_group[candidates] ]) for name in cell_columns ] )
+    result.update( { "variant" : keys["variant"][candidates],
+                     "n" : runs[candidates],
+                     "n_baseline" : runs[bases],
+                     "speedup" : speedup,
+                     "speedup_low" : low,
+                     "speedup_high" : high,
+                     "verdict" : verdict } )
+    for metric in report_pause_metrics:
+        if metric not in data:
+            continue
+        values = np.asarray( data[metric], dtype = np.float64 )
+        present = ~np.isnan( values )
+        (samples, sizes) = gather_samples( group_index = group_index[present],
+                                           values = values[present],
+                                           lengths = np.ones( present.sum(), dtype = np.int64 ),
+                                           starts = np.arange( present.sum() ),
+                                           groups = groups )
+        with np.errstate( invalid = "ignore", divide = "ignore" ):
+            means = np.bincount( np.repeat( np.arange( groups ), sizes ), weights = samples, minlength = groups ) / sizes
+            boot = bootstrap_means( samples = samples, sizes = sizes, resamples = resamples, rng = rng )
+            deltas = boot[:, candidates] - boot[:, bases]
+            (low, high) = np.percentile( deltas, [ 2.5, 97.5 ], axis = 0 ) if len(candidates) else ([], [])
+        few = (sizes[candidates] < 2) | (sizes[bases] < 2)
+        result[metric + "_delta"] = means[candidates] - means[bases]
+        result[metric + "_low"] = np.where( few, np.nan, low )
+        result[metric + "_high"] = np.where( few, np.nan, high )
+    # Best variant first within each cell. The cell numbers follow the
+    # sorted cell columns.
+    cell = cell_of_group[candidates]
+    order = np.lexsort( ( -speedup, cell ) )
+    result = dict( [ (name, np.asarray( column )[order]) for (name, column) in result.items() ] )
+    cell = cell[order]
+    position = np.arange( len(order) )
+    first = np.concatenate( ( [ True ], cell[1:] != cell[:-1] ) )
+    result["rank"] = position - np.maximum.accumulate( np.where( first, position, 0 ) ) + 1
+    return result
+
+def rank_variants( report = None ):
+    """Summary per variant over all cells: geometric mean speedup and the
+    number of cells where it is significantly better or worse. Best first."""
+    (variants, index) = np.unique( report["variant"], return_inverse = True )
+    counts = np.bincount( index )
+    logs = np.bincount( index, weights = np.log( report["speedup"] ) )
+    summary = { "variant" : variants,
+                "cells" : counts,
+                "geomean_speedup" : np.exp( logs / counts ),
+                "better" : np.bincount( index, weights = (report["verdict"] == "better") ).astype( np.int64 ),
+                "worse" : np.bincount( index, weights = (report["verdict"] == "worse") ).astype( np.int64 ) }
+    for metric in report_pause_metrics:
+        if metric + "_delta" in report:
+            deltas = report[metric + "_delta"]
+            present = ~np.isnan( deltas )
+            with np.errstate( invalid = "ignore" ):
+                summary[metric + "_delta"] = np.bincount( index[present], weights = deltas[present],
+                                                          minlength = len(variants) ) / \
+                                             np.bincount( index[present], minlength = len(variants) )
+    order = np.argsort( -summary["geomean_speedup"], kind = "mergesort" )
+    return dict( [ (name, column[order]) for (name, column) in summary.items() ] )
+
+def format_cell( value ):
+    if isinstance( value, (float, np.floating) ):
+        return "%.4g" % value if not np.isnan( value ) else ""
+    return str(value)
+
+def format_interval( low, high ):
+    if np.isnan( low ):
+        return ""
+    return "[%.4g, %.4g]" % (low, high)
+
+def get_report_tables( report = None,
+                       summary = None,
+                       cell_columns = None ):
+    """The ranking and the per cell table as (columns, rows of strings)."""
+    pauses = [ x for x in report_pause_metrics if x + "_delta" in report ]
+    ranking_columns = [ "variant", "cells", "geomean_speedup", "better", "worse" ] + \
+                      [ x + "_delta" for x in pauses ]
+    ranking = [ [ format_cell( summary[x][i] ) for x in ranking_columns ]
+                for i in xrange( len(summary["variant"]) ) ]
+    cell_table_columns = cell_columns + [ "rank", "variant", "n", "speedup", "ci95", "verdict" ]
+    for metric in pauses:
+        cell_table_columns.extend( [ metric + "_delta", "ci95" ] )
+    cell_rows = []
+    for i in xrange( len(report["variant"]) ):
+        row = [ format_cell( report[x][i] ) for x in cell_columns + [ "rank", "variant", "n", "speedup" ] ]
+        row.append( format_interval( report["speedup_low"][i], report["speedup_high"][i] ) )
+        row.append( report["verdict"][i] )
+        for metric in pauses:
+            row.append( format_cell( report[metric + "_delta"][i] ) )
+            row.append( format_interval( report[metric + "_low"][i], report[metric + "_high"][i] ) )
+        cell_rows.append( row )
+    return ( (ranking_columns, ranking), (cell_table_columns, cell_rows) )
+
+def print_text_table( columns = None,
+                      rows = None ):
+    cells = [ columns ] + rows
+    widths = [ max( [ len(x[i]) for x in cells ] ) for i in xrange( len(columns) ) ]
+    for row in cells:
+        print "  ".join( [ x.ljust(w) for (x, w) in zip( row, widths ) ] )
+
+def write_markdown_report( path = None,
+                           title = None,
+                           notes = (),
+                           tables = None ):
+    with open( path, "w" ) as fp:
+        fp.write( "# %s\n" % title )
+        for note in notes:
+            fp.write( "\n**%s**\n" % note )
+        for (heading, (columns, rows)) in zip( [ "Ranking", "Cells" ], tables ):
+            fp.write( "\n## %s\n\n" % heading )
+            fp.write( "| %s |\n" % " | ".join( columns ) )
+            fp.write( "|%s\n" % ("---|" * len(columns)) )
+            for row in rows:
+                fp.write( "| %s |\n" % " | ".join( row ) )
+
+def write_html_report( path = None,
+                       title = None,
+                       notes = (),
+                       tables = None ):
+    import cgi
+    colors = { "better" : "#d4f4d4", "worse" : "#f8d4d4" }
+    with open( path, "w" ) as fp:
+        fp.write( "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>%s</title>\n" % cgi.escape( title ) )
+        fp.write( "<style>body { font-family: sans-serif; } table { border-collapse: collapse; } "
+                  "td, th { border: 1px solid #ccc; padding: 2px 6px; text-align: right; }</style>\n" )
+        fp.write( "</head><body>\n<h1>%s</h1>\n" % cgi.escape( title ) )
+        for note in notes:
+            fp.write( "<p><strong>%s</strong></p>\n" % cgi.escape( note ) )
+        for (heading, (columns, rows)) in zip( [ "Ranking", "Cells" ], tables ):
+            fp.write( "<h2>%s</h2>\n<table>\n<tr>%s</tr>\n" %
+                      (heading, "".join( [ "<th>%s</th>" % cgi.escape( x ) for x in columns ] )) )
+            for row in rows:
+                color = ""
+                for verdict in colors:
+                    if verdict in row:
+                        color = " style=\"background: %s\"" % colors[verdict]
+                fp.write( "<tr%s>%s</tr>\n" % (color, "".join( [ "<td>%s</td>" % cgi.escape( x ) for x in row ] )) )
+            fp.write( "</table>\n" )
+        fp.write( "</body></html>\n" )
+
+def report_main( argv ):
+    require_numpy()
+    parser = argparse.ArgumentParser( prog = "run_heuristics.py report",
+                                      description = "Compare every heuristic with a baseline heuristic, per benchmark and configuration, with bootstrap confidence intervals." )
+    parser.add_argument( "csvfiles",
+                         help = "Result CSV files. Without them, the results store is used.",
+                         nargs = "*" )
+    parser.add_argument( "--store",
+                         help = "Results store directory. Default is results-store",
+                         action = "store",
+                         default = "results-store" )
+    parser.add_argument( "--sweep",
+                         help = "Only use this sweep of the store. May be repeated.",
+                         action = "append",
+                         default = None )
+    parser.add_argument( "--baseline",
+                         help = "Heuristic to compare against. Default is statusquo",
+                         action = "store",
+                         default = "statusquo" )
+    parser.add_argument( "--cell",
+                         help = "Comma separated columns that make up a cell. Default is %s" % ",".join( report_cell_columns ),
+                         action = "store",
+                         default = ",".join( report_cell_columns ) )
+    parser.add_argument( "--unit",
+                         help = "Resample whole runs or single iterations. Comparisons with fewer than 2 runs on a side get no verdict either way. Default is runs",
+                         choices = [ "runs", "iterations" ],
+                         default = "runs" )
+    parser.add_argument( "--resamples",
+                         help = "Number of bootstrap resamples. Default is 2000",
+                         action = "store",
+                         default = 2000 )
+    parser.add_argument( "--seed",
+                         help = "Random seed of the bootstrap. Default is 1",
+                         action = "store",
+                         default = 1 )
+    parser.add_argument( "--markdown",
+                         help = "Also write the report as markdown to this file.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--html",
+                         help = "Also write the report as HTML to this file.",
+                         action = "store",
+                         default = None )
+    args = parser.parse_args( argv )
+    (data, iterations) = load_results( csvfiles = args.csvfiles,
+                                       store = args.store,
+                                       sweeps = args.sweep )
+    if not data:
+        print "No results found."
+        exit(1)
+    cell_columns = [ x for x in args.cell.split(",") if x != "" and x in data ]
+    if "benchmark" not in cell_columns:
+        parser.error( "The cell must include the benchmark." )
+    if args.baseline not in heuristic_list:
+        print "WARNING: %s is not one of %s" % (args.baseline, ", ".join( heuristic_list ))
+    unit = args.unit
+    start = timeit.default_timer()
+    with warnings.catch_warnings():
+        # Percentiles of groups without pause data are NaN, as they should be.
+        warnings.simplefilter( "ignore", RuntimeWarning )
+        report = differential_report( data = data,
+                                      iterations = iterations,
+                                      cell_columns = cell_columns,
+                                      baseline = args.baseline,
+                                      unit = unit,
+                                      resamples = int(args.resamples),
+                                      seed = int(args.seed) )
+    if report == None or len(report["variant"]) == 0:
+        print "Nothing to compare with %s." % args.baseline
+        exit(1)
+    summary = rank_variants( report )
+    elapsed = timeit.default_timer() - start
+    tables = get_report_tables( report = report,
+                                summary = summary,
+                                cell_columns = cell_columns )
+    title = "Heuristics against %s (%d cells, %d resamples of %s)" % \
+        (args.baseline, (report["rank"] == 1).sum(), int(args.resamples), unit)
+    notes = []
+    few = (report["verdict"] == "?").sum()
+    if few > 0:
+        notes.append( "WARNING: %d of %d comparisons have fewer than 2 runs on a side and get no verdict (?)." %
+                      (few, len(report["verdict"])) )
+    print title
+    for note in notes:
+        print note
+    print
+    print_text_table( *tables[0] )
+    print
+    print_text_table( *tables[1] )
+    print
+    print "Computed in %.2f seconds." % elapsed
+    if args.markdown != None:
+        write_markdown_report( path = args.markdown, title = title, notes = notes, tables = tables )
+    if args.html != None:
+        write_html_report( path = args.html, title = title, notes = notes, tables = tables )
+    return 0
+
+#
+# Harness self-benchmark
+#
+# Measures what the harness itself costs, against fake_java.py instead of a
+# real JVM: per run CPU, memory and latency, and the throughput of the
+# parsers that every line of JVM output and GC log goes through.
+fake_java_filename = "fake_java.py"
+# Metrics of the self-benchmark, with True if higher is better.
+selfbench_metrics = [ ("gc_parse_legacy_mb_s", True),
+                      ("gc_parse_g1_mb_s", True),
+                      ("gc_parse_unified_mb_s", True),
+                      ("output_parse_mb_s", True),
+                      ("config_parse_ms", False),
+                      ("csv_rows_s", True),
+                      ("run_latency_ms", False),
+                      ("run_harness_cpu_ms", False),
+                      ("run_wall_s", False),
+                      ("harness_max_rss_kb", False), ]
+
+def load_fake_java():
+    """Imports fake_java.py from next to this script, for its GC log generator."""
+    import imp
+    path = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), fake_java_filename )
+    return (path, imp.load_source( "fake_java", path ))
+
+def time_call( function ):
+    """Runs function and returns (seconds of wall time, its return value)."""
+    start = timeit.default_timer()
+    value = function()
+    return (timeit.default_timer() - start, value)
+
+def bench_gc_parsing( fake_java = None,
+                      tmpdir = None,
+                      size_mb = 20,
+                      collector = "shenandoah",
+                      unified = False ):
+    """MB/s of gc_log_stats on a generated GC log of about size_mb MB."""
+    path = os.path.join( tmpdir, "gc-%s-%d.log" % (collector, unified) )
+    rng = random.Random( 1 )
+    start = 0.0
+    with open( path, "w" ) as fp:
+        while fp.tell() < size_mb * 1024 * 1024:
+            for i in xrange( 1000 ):
+                fp.writelines( fake_java.gc_log_lines( collector, start, unified, rng ) )
+                start += 0.01
+    size = os.path.getsize( path )
+    (seconds, stats) = time_call( lambda: gc_log_stats( gc_logfile = path ) )
+    assert( stats["gc_pause_count"] > 0 )
+    os.remove( path )
+    return size / 1024.0 / 1024.0 / seconds
+
+def bench_output_parsing( size_mb = 20 ):
+    """MB/s of the line callbacks that see every line of DaCapo output."""
+    lines = [ "x" * 79 + "\n" ] * 9 + [ "===== DaCapo 9.12 fop completed warmup 1 in 1234 msec =====\n" ]
+    lines = lines * (size_mb * 1024 * 1024 // sum( [ len(x) for x in lines ] ))
+    parser = IterationParser( benchmark = "fop", dacapo_flag = True )
+    callback = chain_line_callbacks( [ parser, OutputScanner() ] )
+    def parse():
+        for line in lines:
+            callback( "stdout", line )
+    (seconds, _) = time_call( parse )
+    assert( len(parser.runtimes) == len(lines) // 10 )
+    return sum( [ len(x) for x in lines ] ) / 1024.0 / 1024.0 / seconds
+
+def bench_config_parsing( tmpdir = None,
+                          repeat = 200 ):
+    """msec per process_config of a configuration with every section."""
+    path = os.path.join( tmpdir, "selfbench.ini" )
+    with open( path, "w" ) as fp:
+        fp.write( "[global]\n"
+                  "dacapo_benchmarks: avrora,fop,h2,jython,luindex,lusearch,pmd,sunflow,xalan\n"
+                  "dacapo_path: dacapo-9.12-bach.jar\n"
+                  "specjvm_benchmarks: compress,crypto.aes,derby,mpegaudio,scimark.fft.large\n"
+                  "specjvm_path: SPECjvm2008/SPECjvm2008.jar\n"
+                  "[jvms]\n"
+                  "base: /usr/bin/java\n"
+                  "patched: /opt/jdk/bin/java\n"
+                  "[sweep]\n"
+                  "gc_algos: shenandoah, g1\n"
+                  "heuristics: statusquo, aggressive, adaptive\n"
+                  "heap_sizes: 1g:1g, 2g:4g, 4g:8g\n"
+                  "pargcthreads: 2, 4, 8\n"
+                  "concgcthreads: 2, 4\n"
+                  "appthreads: 1, 2, 4\n"
+                  "sampling: lhs\n"
+                  "samples: 20\n" )
+    args = argparse.Namespace( config = path )
+    def parse():
+        for i in xrange( repeat ):
+            process_config( args )
+    saved = sys.stdout
+    sys.stdout = open( os.devnull, "w" )
+    try:
+        (seconds, _) = time_call( parse )
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved
+    return seconds * 1000.0 / repeat
+
+def bench_csv_writing( tmpdir = None,
+                       rows = 2000 ):
+    """Rows per second through CsvResultWriter, which syncs every row."""
+    writer = CsvResultWriter( tgtpath = os.path.join( tmpdir, "selfbench.csv" ),
+                              header = csv_header + result_columns )
+    row = [ "fop", "shenandoah", "statusquo", "2g", "2g", 2, 2, 9, range( 1000, 1009 ) ] + \
+          [ 1.5 ] * len(result_columns)
+    def write():
+        for i in xrange( rows ):
+            # add_row formats the runtimes in place.
+            writer.add_row( list( row ) )
+    (seconds, _) = time_call( write )
+    writer.close()
+    return rows / seconds
+
+fake_elapsed_re = re.compile( r"fake java: elapsed ([0-9.]+) ms" )
+
+def bench_runs( fake_java_path = None,
+                tmpdir = None,
+                runs = 10,
+                jobs = 1,
+                number = 5,
+                extra_flags = (),
+                sample_interval = None,
+                logger = None ):
+    """Runs the fake JVM through run_sweep and returns the harness cost per
+    run: latency (our wall time beyond the JVM's own), harness CPU time and
+    the mean wall time of a run."""
+    jar = os.path.join( tmpdir, "dacapo-9.12-bach.jar" )
+    open( jar, "w" ).close()
+    os.mkdir( os.path.join( tmpdir, "fop" ) )
+    run_list = [ { "benchmark" : "fop",
+                   "java_actual_path" : fake_java_path,
+                   "dacapo_flag" : True,
+                   "dacapo_path" : jar,
+                   "specjvm_path" : None,
+                   "number" : number,
+                   "gc_algo" : "shenandoah",
+                   "heuristic" : "statusquo",
+                   "par_gcthreads" : 1,
+                   "conc_gcthreads" : 1,
+                   "appnum" : 1,
+                   "repetition" : i,
+                   "extra_flags" : tuple( extra_flags ),
+                   "printgcdetails" : True,
+                   "sample_interval" : sample_interval,
+                   "quiesce" : { "gate" : False },
+                   "logger" : logger } for i in xrange( runs ) ]
+    latencies = []
+    wall_times = []
+    def run_done( run_config, result ):
+        assert( result["status"] == "ok" )
+        with open( result["output_file"] ) as fp:
+            match = fake_elapsed_re.search( fp.read() )
+        wall_times.append( result["wall_time"] )
+        latencies.append( result["wall_time"] * 1000.0 - float( match.group(1) ) )
+        # What run_done in main_process does with every result.
+        gc_log_stats( gc_logfile = result["gc_logfile"],
+                      wall_time = result["wall_time"] )
+    cwd = os.getcwd()
+    os.chdir( tmpdir )
+    saved = sys.stdout
+    sys.stdout = open( os.devnull, "w" )
+    before = resource.getrusage( resource.RUSAGE_SELF )
+    try:
+        run_sweep( run_list = run_list,
+                   jobs = jobs,
+                   callback = run_done,
+                   logger = logger )
+    finally:
+        after = resource.getrusage( resource.RUSAGE_SELF )
+        sys.stdout.close()
+        sys.stdout = saved
+        os.chdir( cwd )
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return { "run_latency_ms" : mean( latencies ),
+             "run_harness_cpu_ms" : cpu * 1000.0 / runs,
+             "run_wall_s" : mean( wall_times ) }
+
+def selfbench_main( argv ):
+    parser = argparse.ArgumentParser( prog = "run_heuristics.py selfbench",
+                                      description = "Measure the overhead of the harness itself against %s." % fake_java_filename )
+    parser.add_argument( "--runs",
+                         help = "Number of fake JVM runs. Default is 10",
+                         action = "store",
+                         default = 10 )
+    parser.add_argument( "--jobs",
+                         help = "Runs in parallel. Default is 1",
+                         action = "store",
+                         default = 1 )
+    parser.add_argument( "--gc-rate",
+                         help = "GC pauses per second logged by the fake JVM. Default is 1000",
+                         action = "store",
+                         default = 1000 )
+    parser.add_argument( "--output-lines",
+                         help = "Extra output lines per iteration of the fake JVM. Default is 1000",
+                         action = "store",
+                         default = 1000 )
+    parser.add_argument( "--size",
+                         help = "MB of GC log and output to parse. Default is 20",
+                         action = "store",
+                         default = 20 )
+    parser.add_argument( "--sample-interval",
+                         help = "Also run the resource sampler at this interval.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--save",
+                         help = "Write the results to this JSON file.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--baseline",
+                         help = "Compare with the results of an earlier --save and fail on regressions.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--tolerance",
+                         help = "Relative change against --baseline that counts as a regression. Default is 0.2",
+                         action = "store",
+                         default = 0.2 )
+    args = parser.parse_args( argv )
+    (fake_java_path, fake_java) = load_fake_java()
+    logger = setup_logger( targetdir = tempfile.gettempdir(),
+                           filename = "run_heuristics_selfbench.log",
+                           logger_name = "run_heuristics_selfbench",
+                           debugflag = False )
+    tmpdir = tempfile.mkdtemp( prefix = "selfbench-" )
+    size = int(args.size)
+    results = {}
+    try:
+        results["gc_parse_legacy_mb_s"] = bench_gc_parsing( fake_java, tmpdir, size, "shenandoah" )
+        results["gc_parse_g1_mb_s"] = bench_gc_parsing( fake_java, tmpdir, size, "g1" )
+        results["gc_parse_unified_mb_s"] = bench_gc_parsing( fake_java, tmpdir, size, "shenandoah", True )
+        results["output_parse_mb_s"] = bench_output_parsing( size )
+        results["config_parse_ms"] = bench_config_parsing( tmpdir )
+        results["csv_rows_s"] = bench_csv_writing( tmpdir )
+        results.update( bench_runs( fake_java_path = fake_java_path,
+                                    tmpdir = tmpdir,
+                                    runs = int(args.runs),
+                                    jobs = int(args.jobs),
+                                    extra_flags = [ "-Dfake.iteration_ms=100",
+                                                    "-Dfake.startup_ms=50",
+                                                    "-Dfake.gc_per_second=%s" % args.gc_rate,
+                                                    "-Dfake.output_lines=%s" % args.output_lines ],
+                                    sample_interval = ( float(args.sample_interval)
+                                                        if args.sample_interval != None else None ),
+                                    logger = logger ) )
+        results["harness_max_rss_kb"] = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    finally:
+        shutil.rmtree( tmpdir )
+    baseline = None
+    if args.baseline != None:
+        with open( args.baseline ) as fp:
+            baseline = json.load( fp )
+    tolerance = float(args.tolerance)
+    regressions = []
+    print "%-24s %14s %14s %8s" % ("metric", "value", "baseline", "change")
+    for (name, higher_is_better) in selfbench_metrics:
+        value = results[name]
+        line = "%-24s %14.2f" % (name, value)
+        if baseline != None and baseline.get( name ):
+            change = (value - baseline[name]) / float( baseline[name] )
+            line += " %14.2f %+7.1f%%" % (baseline[name], change * 100.0)
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append( name )
+                line += " REGRESSION"
+        print line
+    if args.save != None:
+        with open( args.save, "w" ) as fp:
+            json.dump( results, fp, indent = 1, sort_keys = True )
+    if regressions:
+        print "Regressions: %s" % ", ".join( regressions )
+        return 1
+    return 0
+
+subcommands = { "query" : query_main,
+                "ingest" : ingest_main,
+                "report" : report_main,
+                "worker" : worker_main,
+                "selfbench" : selfbench_main, }
+
 def config_section_map( section, config_parser ):
     result = { "dacapo_benchmarks" : [],
                "specjvm_benchmarks" : []  }
@@ -319,6 +4425,71 @@ def config_section_map( section, config_parser ):
             result["specjvm_path"] = config_parser.get(section, "specjvm_path")
     return result
 
+def parse_heap_size( text ):
+    return None if text.lower() == "none" else text
+
+def sweep_section_map( section, config_parser ):
+    """Reads the optional declarative sweep definition:
+        [sweep]
+        gc_algos: shenandoah, g1
+        heuristics: ALL
+        heap_sizes: 1g:1g, 2g:4g
+        pargcthreads: 2, 4
+        concgcthreads: 2, 4
+        appthreads: 1, 2, 4
+        extra_flags: none | -XX:+AlwaysPreTouch | -XX:+AlwaysPreTouch -XX:-UseBiasedLocking
+        sampling: full
+        samples: 20
+        fraction: 2
+        seed: 1
+    Every listed axis replaces the one from the command line. Heap sizes are
+    min:max pairs, extra flag sets are separated by '|'. sampling is one of
+    'full', 'fraction' (half of a grid of two level axes, see sample_indices)
+    or 'lhs' (Latin hypercube with 'samples' points)."""
+    def get_list( option ):
+        return [ x for x in re.sub( r'\s+', "", config_parser.get( section, option ) ).split(",")
+                 if x != "" ]
+    axes = {}
+    result = { "axes" : axes }
+    for option in config_parser.options( section ):
+        if option == "gc_algos":
+            axes["gc_algo"] = get_list( option )
+        elif option == "heuristics":
+            hlist = get_list( option )
+            axes["heuristic"] = list( heuristic_list ) if hlist == [ "ALL" ] else hlist
+        elif option == "heap_sizes":
+            axes["heap"] = [ tuple( [ parse_heap_size( y ) for y in x.split(":") ] )
+                             for x in get_list( option ) ]
+        elif option == "pargcthreads":
+            axes["par_gcthreads"] = [ int(x) for x in get_list( option ) ]
+        elif option == "concgcthreads":
+            axes["conc_gcthreads"] = [ int(x) for x in get_list( option ) ]
+        elif option == "appthreads":
+            axes["appnum"] = [ int(x) for x in get_list( option ) ]
+        elif option == "extra_flags":
+            flag_sets = config_parser.get( section, option ).split("|")
+            axes["extra_flags"] = [ (() if x.strip().lower() == "none" else tuple( x.split() ))
+                                    for x in flag_sets ]
+        elif option == "sampling":
+            result["sampling"] = config_parser.get( section, option ).strip()
+        elif option in ("samples", "fraction", "seed"):
+            result[option] = config_parser.getint( section, option )
+    for axis in ("gc_algo", "heap"):
+        for level in axes.get( axis, [] ):
+            if axis == "gc_algo" and level not in ("shenandoah", "g1", "defaultgc"):
+                print "Invalid GC algorithm in [%s]: %s" % (section, level)
+                exit(3)
+            if axis == "heap" and len(level) != 2:
+                print "Heap sizes in [%s] must be min:max pairs: %s" % (section, str(level))
+                exit(3)
+    if result.get( "sampling", "full" ) not in sampling_methods:
+        print "Invalid sampling in [%s]: %s" % (section, result["sampling"])
+        exit(3)
+    if result.get( "sampling" ) == "lhs" and "samples" not in result:
+        print "Sampling 'lhs' in [%s] needs 'samples'." % section
+        exit(3)
+    return result
+
 def process_config( args ):
     global pp
     assert( args.config != None )
@@ -326,11 +4497,52 @@ def process_config( args ):
     config_parser = ConfigParser.ConfigParser()
     config_parser.read( args.config )
     config = config_section_map( "global", config_parser )
+    # Optional list of JVMs to compare:
+    #     [jvms]
+    #     baseline: /path/to/jdk/bin/java
+    #     patched: /path/to/other/jdk/bin/java
+    if config_parser.has_section( "jvms" ):
+        config["jvms"] = [ (label, config_parser.get( "jvms", label ))
+                           for label in config_parser.options( "jvms" ) ]
+    if config_parser.has_section( "sweep" ):
+        config["sweep"] = sweep_section_map( "sweep", config_parser )
     # pp.pprint(config)
     return config
 
+def test_java_binaries( jvms ):
+    """Runs 'java -version' for all (label, path) pairs in parallel and prints
+    the output. Returns True if every one of them worked."""
+    results = {}
+    def test_one( label, path ):
+        try:
+            javaproc = subprocess.Popen( [ path, "-version" ],
+                                         stdout = subprocess.PIPE,
+                                         stdin = subprocess.PIPE,
+                                         stderr = subprocess.PIPE )
+            output = javaproc.communicate()
+            results[label] = (javaproc.returncode, output)
+        except OSError as e:
+            results[label] = (None, ("", str(e)))
+    threads = [ threading.Thread( target = test_one, args = x ) for x in jvms ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ok = True
+    for (label, path) in jvms:
+        (returncode, output) = results[label]
+        print "Testing java %s: %s" % (label, path)
+        for x in output:
+            print x
+        if returncode != 0:
+            print "FAILED: %s returned %s" % (label, str(returncode))
+            ok = False
+    return ok
+
 def __main():
     global benchmark_list
+    if len(sys.argv) > 1 and sys.argv[1] in subcommands:
+        exit( subcommands[sys.argv[1]]( sys.argv[2:] ) )
     pp = pprint.PrettyPrinter( indent = 4 )
     # Loop through required benchmarks
     # set up arg parser
@@ -401,45 +4613,166 @@ def __main():
                          action = "store", default = None )
     parser.add_argument( "--version", help = "Version number. Default is 1",
                          action = "store", default = 1 )
+    parser.add_argument( "--jobs",
+                         help = "Number of benchmark runs to execute concurrently. Each run is pinned to its own set of CPUs. Default is 1",
+                         action = "store",
+                         default = 1 )
+    parser.add_argument( "--resume",
+                         help = "Resume the sweep in an existing WORK directory. Runs completed according to the run ledger are skipped.",
+                         action = "store_true",
+                         default = False )
+    parser.add_argument( "--adaptive",
+                         help = "Stop each run once its steady state iteration times converge. --num then is the maximum number of DaCapo iterations.",
+                         action = "store_true",
+                         default = False )
+    parser.add_argument( "--ci-width",
+                         help = "Target relative half width of the 95%% confidence interval for --adaptive. Default is 0.02",
+                         action = "store",
+                         default = 0.02 )
+    parser.add_argument( "--cov-threshold",
+                         help = "Coefficient of variation below which a window of iterations counts as warmed up for --adaptive. Default is 0.05",
+                         action = "store",
+                         default = 0.05 )
+    parser.add_argument( "--race",
+                         help = "With --heuristic ALL, race the heuristics: repeat every configuration and drop heuristics that are significantly worse than the best one.",
+                         action = "store_true",
+                         default = False )
+    parser.add_argument( "--race-reps",
+                         help = "Repetitions per heuristic in every round of --race. Default is 3",
+                         action = "store",
+                         default = 3 )
+    parser.add_argument( "--race-budget",
+                         help = "Maximum repetitions per heuristic for --race. Default is 10",
+                         action = "store",
+                         default = 10 )
+    parser.add_argument( "--race-alpha",
+                         help = "Family-wise significance level for dropping a heuristic from a cell in --race, over all rounds. Default is 0.05",
+                         action = "store",
+                         default = 0.05 )
+    parser.add_argument( "--sample-interval",
+                         help = "Sample RSS, CPU time, context switches and page faults of every JVM at this interval in seconds. Off by default.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--store",
+                         help = "Also add the results to this columnar results store when the sweep is done. See the query and ingest subcommands.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--timeout",
+                         help = "Kill a JVM that runs longer than this many seconds. Off by default.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--hang-timeout",
+                         help = "Kill a JVM that prints nothing for this many seconds. Off by default.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--retries",
+                         help = "Number of times a failed run is retried. Default is 0",
+                         action = "store",
+                         default = 0 )
+    parser.add_argument( "--coordinator",
+                         help = "Listen on HOST:PORT and hand the runs out to remote workers ('run_heuristics.py worker HOST:PORT') instead of running them here. Only local workers can connect to :PORT; use 0.0.0.0:PORT for remote ones.",
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--secret-file",
+                         help = "File with the secret shared with the workers of --coordinator. Default is $%s" % secret_environment_variable,
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--batch",
+                         help = "Run up to this many DaCapo benchmarks with the same JVM flags in one JVM, to save JVM startup. Not used with --coordinator or --adaptive. Default is 1",
+                         action = "store",
+                         default = 1 )
+    parser.add_argument( "--quiesce",
+                         help = "Before every run, wait until the machine is quiet (see --max-busy, --max-load, --max-pressure).",
+                         action = "store_true",
+                         default = False )
+    parser.add_argument( "--max-busy",
+                         help = "Quiet means the run's CPUs are at most this busy. Default is 0.05",
+                         action = "store",
+                         default = default_quiesce["max_busy"] )
+    parser.add_argument( "--max-load",
+                         help = "Quiet means a load average per CPU of at most this. Not checked with --jobs. Default is 0.1",
+                         action = "store",
+                         default = default_quiesce["max_load"] )
+    parser.add_argument( "--max-pressure",
+                         help = "Quiet means at most this percentage of memory stall time (/proc/pressure/memory). Default is 1.0",
+                         action = "store",
+                         default = default_quiesce["max_pressure"] )
+    parser.add_argument( "--quiesce-timeout",
+                         help = "Seconds to wait for the machine to get quiet. The run then starts anyway, flagged as not quiet. Default is 60",
+                         action = "store",
+                         default = default_quiesce["max_wait"] )
+    parser.add_argument( "--pause",
+                         help = "Seconds to sleep before every run. Default is 0",
+                         action = "store",
+                         default = 0 )
+    parser.add_argument( "--drop-caches",
+                         help = "Drop the page cache before every run (needs root).",
+                         action = "store_true",
+                         default = False )
+    parser.add_argument( "--env-mismatch",
+                         help = "What to do with a run when CPU governor, turbo, THP or the kernel differ from the start of the sweep: flag the result or refuse to run it. Default is flag",
+                         choices = [ "flag", "refuse" ],
+                         default = "flag" )
+    parser.add_argument( "--history",
+                         help = "File with the wall times of past runs, used for the ETA and to start the longest runs first. Default is %s" % history_filename,
+                         action = "store",
+                         default = history_filename )
+    parser.add_argument( "--progress-interval",
+                         help = "Seconds between progress reports (also written to WORK/status.json). 0 turns them off. Default is 60",
+                         action = "store",
+                         default = 60 )
+    parser.add_argument( "--profile",
+                         help = "Profile extra runs of a sample of the configurations, with any of %s (comma separated). Their rows are marked in the profile column." % ", ".join( profile_modes ),
+                         action = "store",
+                         default = None )
+    parser.add_argument( "--profile-fraction",
+                         help = "Fraction of the configurations that get a profiled run with --profile. Default is 0.1",
+                         action = "store",
+                         default = 0.1 )
+    parser.add_argument( "--seed",
+                         help = "Random seed for interleaving the runs of several JVMs. Default is the current time.",
+                         action = "store",
+                         default = None )
     parser.add_argument( "--testjava",
-                         help = "Test the java executable only.",
+                         help = "Test the java executables only.",
                          action = "store_true",
                          default = False )
     args = parser.parse_args()
-    # Get java path
+    # Check config file
+    config = process_config( args ) if args.config != None else None
+
+    # Get java paths
+    jvms = []
     if args.javapath != None:
-        java_actual_path = args.javapath 
-    else:
-        parser.error("Please provide a --javapath.")
-    if not os.path.isfile(java_actual_path):
-        parser.error("Invalid --javapath: %s" % str(java_actual_path))
+        jvms.append( (default_jvm_label, args.javapath) )
+    if config != None:
+        jvms.extend( config.get( "jvms", [] ) )
+    if len(jvms) == 0:
+        parser.error("Please provide a --javapath or a [jvms] section in the configuration file.")
+    for (label, path) in jvms:
+        if not os.path.isfile(path):
+            parser.error("Invalid java path for %s: %s" % (label, str(path)))
+    if len(set( [ label for (label, path) in jvms ] )) != len(jvms):
+        parser.error("JVM labels must be unique.")
 
     if args.testjava:
-        cmd = [ java_actual_path, "-version" ]
-        print "Testing java:", cmd
-        javaproc = subprocess.Popen( cmd,
-                                     stdout = subprocess.PIPE,
-                                     stdin = subprocess.PIPE,
-                                     stderr = subprocess.PIPE )
-        result = javaproc.communicate()
-        for x in result:
-            print x
-        exit(0)
+        exit(0 if test_java_binaries( jvms ) else 1)
+    if args.resume and args.fake:
+        parser.error("--fake keeps no run ledger, so it can not --resume.")
 
-    # Check config file
-    if args.config != None:
-        config = process_config( args )
-    else:
+    if config == None:
         parser.error("Please provide a configuration file using --config.")
 
     # Determine GC algorithm
     shenandoah = args.shenandoah
     g1 = args.g1
     defaultgc =  args.defaultgc
+    # The [sweep] section may list the GC algorithms instead.
+    sweep_gc = "gc_algo" in config.get( "sweep", {} ).get( "axes", {} )
     if ( (shenandoah and g1) or
          (shenandoah and defaultgc) or
          (g1 and defaultgc) or
-         not (shenandoah or g1 or defaultgc) ):
+         not (shenandoah or g1 or defaultgc or sweep_gc) ):
          print "Invalid selection of GC algorithm. Please select just one of --shenandoah, --g1 or --defaultgc."
          exit(2)
     gc_algo = "shenandoah" if shenandoah else ("g1" if g1 else "defaultgc")
@@ -457,9 +4790,9 @@ def __main():
     #
     return main_process( config = config,
                          output = args.output,
-                         java_actual_path = java_actual_path,
+                         jvms = jvms,
                          number = int(args.num),
-                         number_appthreads = args.appthreads,
+                         number_appthreads = int(args.appthreads),
                          pargcthreads = int(args.pargcthreads),
                          concgcthreads = int(args.concgcthreads),
                          gc_algo = gc_algo,
@@ -468,6 +4801,39 @@ def __main():
                          printgcdetails = args.printgcdetails,
                          heuristic = args.heuristic,
                          debugflag = args.debug,
+                         jobs = int(args.jobs),
+                         resume = args.resume,
+                         adaptive = ( { "ci_width" : float(args.ci_width),
+                                        "cov_threshold" : float(args.cov_threshold) }
+                                      if args.adaptive else None ),
+                         race = ( { "initial_reps" : int(args.race_reps),
+                                    "budget" : int(args.race_budget),
+                                    "alpha" : float(args.race_alpha) }
+                                  if args.race else None ),
+                         sample_interval = ( float(args.sample_interval)
+                                             if args.sample_interval != None else None ),
+                         seed = (int(args.seed) if args.seed != None else None),
+                         store = args.store,
+                         timeout = (float(args.timeout) if args.timeout != None else None),
+                         hang_timeout = (float(args.hang_timeout) if args.hang_timeout != None else None),
+                         retries = int(args.retries),
+                         coordinator = (parse_address( args.coordinator )
+                                        if args.coordinator != None else None),
+                         secret_file = args.secret_file,
+                         batch_size = int(args.batch),
+                         quiesce = { "gate" : args.quiesce,
+                                     "max_busy" : float(args.max_busy),
+                                     "max_load" : float(args.max_load),
+                                     "max_pressure" : float(args.max_pressure),
+                                     "max_wait" : float(args.quiesce_timeout),
+                                     "pause" : float(args.pause),
+                                     "drop_caches" : args.drop_caches,
+                                     "on_mismatch" : args.env_mismatch },
+                         history = args.history,
+                         progress_interval = float(args.progress_interval),
+                         profile = (parse_profile_modes( args.profile )
+                                    if args.profile != None else None),
+                         profile_fraction = float(args.profile_fraction),
                          logger = logger,
                          fake = args.fake,
                          pp = pp )
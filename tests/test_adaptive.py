@@ -0,0 +1,48 @@
+"""Tests for stopping runs once their iteration times converge."""
+import os
+import sys
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+def feed( monitor, runtimes ):
+    """Returns the number of iterations after which monitor stopped the run."""
+    stops = []
+    monitor.stop = lambda: stops.append( True )
+    for count in xrange( 1, len(runtimes) + 1 ):
+        monitor( runtimes[:count] )
+        if stops:
+            return count
+    return None
+
+class ConvergenceMonitorTest( unittest.TestCase ):
+    def test_steady_from_the_start( self ):
+        monitor = rh.ConvergenceMonitor( window = 5, min_steady = 5 )
+        # The stable window is warmup; five more iterations are needed.
+        self.assertEqual( feed( monitor, [ 100.0 ] * 20 ), 10 )
+        self.assertEqual( monitor.warmup_iterations, 5 )
+        self.assertTrue( monitor.converged )
+
+    def test_warmup( self ):
+        runtimes = [ 300.0, 200.0, 150.0 ] + [ 100.0 + x % 2 for x in xrange( 30 ) ]
+        monitor = rh.ConvergenceMonitor( window = 5, min_steady = 5 )
+        self.assertEqual( feed( monitor, runtimes ), 13 )
+        self.assertEqual( monitor.warmup_iterations, 8 )
+
+    def test_noisy_run_does_not_converge( self ):
+        runtimes = [ 100.0, 150.0 ] * 20
+        monitor = rh.ConvergenceMonitor( window = 5, min_steady = 5 )
+        self.assertEqual( feed( monitor, runtimes ), None )
+        self.assertEqual( monitor.warmup_iterations, None )
+        self.assertFalse( monitor.converged )
+
+    def test_wide_interval( self ):
+        # Stable enough to end warmup, too noisy for a 0.1% interval.
+        runtimes = [ 100.0, 104.0, 98.0, 102.0, 96.0 ] * 4
+        monitor = rh.ConvergenceMonitor( ci_width = 0.001, window = 5, min_steady = 5 )
+        self.assertEqual( feed( monitor, runtimes ), None )
+        self.assertEqual( monitor.warmup_iterations, 5 )
+
+if __name__ == "__main__":
+    unittest.main()
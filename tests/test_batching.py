@@ -0,0 +1,85 @@
+"""Tests for running DaCapo benchmarks with identical flags in one JVM."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+def make_run( benchmark, min_heap = "1g", dacapo_flag = True, **changes ):
+    run_config = { "benchmark" : benchmark,
+                   "dacapo_flag" : dacapo_flag,
+                   "specjvm_flag" : not dacapo_flag,
+                   "gc_algo" : "shenandoah",
+                   "heuristic" : "statusquo",
+                   "min_heap" : min_heap,
+                   "max_heap" : min_heap,
+                   "number" : 5 }
+    run_config.update( changes )
+    return run_config
+
+class MakeBatchesTest( unittest.TestCase ):
+    def test_same_flags_share_a_jvm( self ):
+        runs = [ make_run( "fop" ),
+                 make_run( "fop", min_heap = "2g" ),
+                 make_run( "luindex" ),
+                 make_run( "compress", dacapo_flag = False ),
+                 make_run( "h2" ),
+                 make_run( "luindex", min_heap = "2g" ) ]
+        entries = rh.make_batches( run_list = runs, batch_size = 4 )
+        self.assertEqual( len(entries), 3 )
+        self.assertEqual( [ x["benchmark"] for x in entries[0]["batch"] ], [ "fop", "luindex", "h2" ] )
+        self.assertEqual( [ x["benchmark"] for x in entries[1]["batch"] ], [ "fop", "luindex" ] )
+        self.assertEqual( entries[1]["min_heap"], "2g" )
+        # SPECjvm2008 runs are never batched.
+        self.assertIs( entries[2], runs[3] )
+
+    def test_batch_size( self ):
+        runs = [ make_run( x ) for x in [ "fop", "luindex", "h2" ] ]
+        entries = rh.make_batches( run_list = runs, batch_size = 2 )
+        self.assertEqual( [ x["benchmark"] for x in entries[0]["batch"] ], [ "fop", "luindex" ] )
+        # A batch of one is the run itself.
+        self.assertIs( entries[1], runs[2] )
+        self.assertEqual( rh.make_batches( run_list = runs, batch_size = 1 ), runs )
+
+    def test_repeated_benchmark_starts_a_new_batch( self ):
+        runs = [ make_run( "fop" ), make_run( "fop" ) ]
+        self.assertEqual( rh.make_batches( run_list = runs, batch_size = 4 ), runs )
+
+class BatchDemuxTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def test_split_output( self ):
+        files = dict( [ (x, os.path.join( self.tmpdir, x + ".txt" )) for x in [ "fop", "luindex" ] ] )
+        demux = rh.BatchDemux( output_files = files )
+        for line in [ "Using scaled threading model.\n",
+                      "===== DaCapo 9.12 fop starting warmup 1 =====\n",
+                      "===== DaCapo 9.12 fop completed warmup 1 in 900 msec =====\n",
+                      "===== DaCapo 9.12 fop starting =====\n",
+                      "===== DaCapo 9.12 fop PASSED in 800 msec =====\n",
+                      "between benchmarks\n",
+                      "===== DaCapo 9.12 luindex starting =====\n",
+                      "[GC pause (G1 Evacuation Pause) 10M->5M, 0.0050000 secs]\n",
+                      "===== DaCapo 9.12 luindex FAILED warmup =====\n" ]:
+            demux( "stdout", line )
+        demux.close()
+        self.assertEqual( demux.parsers["fop"].runtimes, [ 900, 800 ] )
+        self.assertEqual( demux.parsers["luindex"].runtimes, [] )
+        self.assertEqual( demux.passed, { "fop" : True, "luindex" : False } )
+        with open( files["fop"] ) as fp:
+            fop = fp.read()
+        with open( files["luindex"] ) as fp:
+            luindex = fp.read()
+        self.assertEqual( fop.count( "\n" ), 4 )
+        self.assertNotIn( "luindex", fop )
+        self.assertNotIn( "between", fop + luindex )
+        self.assertIn( "G1 Evacuation Pause", luindex )
+
+if __name__ == "__main__":
+    unittest.main()
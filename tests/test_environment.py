@@ -0,0 +1,37 @@
+"""Tests for the run environment checks."""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+class CheckEnvironmentTest( unittest.TestCase ):
+    def test_no_gate_does_not_wait( self ):
+        start = time.time()
+        (ok, info) = rh.check_environment( quiesce = { "gate" : False } )
+        self.assertLess( time.time() - start, 0.05 )
+        self.assertTrue( ok )
+        self.assertEqual( info["cpu_busy_before"], None )
+        self.assertEqual( info["quiet"], "" )
+        self.assertEqual( info["env_matches"], 1 )
+        for name in rh.environment_fields:
+            self.assertIn( name, info )
+
+    def test_gate_measures_busy( self ):
+        (ok, info) = rh.check_environment( quiesce = { "gate" : True, "max_busy" : 1.0, "max_load" : 1e9,
+                                                       "max_pressure" : 100.0 } )
+        self.assertTrue( 0.0 <= info["cpu_busy_before"] <= 1.0 )
+        self.assertEqual( info["quiet"], 1 )
+
+    def test_baseline_mismatch( self ):
+        baseline = dict( rh.get_environment(), kernel = "0.0.0-other" )
+        (ok, info) = rh.check_environment( quiesce = { "baseline" : baseline } )
+        self.assertTrue( ok )
+        self.assertEqual( info["env_matches"], 0 )
+        (ok, info) = rh.check_environment( quiesce = { "baseline" : baseline, "on_mismatch" : "refuse" } )
+        self.assertFalse( ok )
+
+if __name__ == "__main__":
+    unittest.main()
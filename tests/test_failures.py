@@ -0,0 +1,129 @@
+"""Tests for timeouts, failure classification and retries."""
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+# Stand-in for java: fails the first 'fail' times it is run, then passes
+# after sleeping 'sleep' seconds.
+fake_java = """#!/bin/sh
+echo run >> %(count)s
+if [ $(wc -l < %(count)s) -le %(fail)d ]; then
+    echo "===== DaCapo 9.12 fop FAILED warmup ====="
+    exit 1
+fi
+sleep %(sleep)s
+echo "===== DaCapo 9.12 fop PASSED in 300 msec ====="
+"""
+
+def scan( lines ):
+    scanner = rh.OutputScanner()
+    for line in lines:
+        scanner( "stdout", line )
+    return scanner
+
+def make_result( returncode = 0, runtimes = ( 1.0, ), converged = False ):
+    return { "returncode" : returncode, "runtimes" : list( runtimes ), "converged" : converged }
+
+class ClassifyRunTest( unittest.TestCase ):
+    def test_output( self ):
+        self.assertEqual( rh.classify_run( result = make_result(), scanner = scan( [ "all fine" ] ) ), "ok" )
+        self.assertEqual( rh.classify_run( result = make_result( returncode = 1 ),
+                                           scanner = scan( [ 'Exception in thread "main" java.lang.OutOfMemoryError: Java heap space' ] ) ),
+                          "oom" )
+        scanner = scan( [ "# A fatal error has been detected by the Java Runtime Environment:",
+                          "# An error report file with more information is saved as:",
+                          "# /tmp/fop/hs_err_pid1234.log" ] )
+        self.assertEqual( rh.classify_run( result = make_result( returncode = 134 ), scanner = scanner ), "crash" )
+        self.assertEqual( scanner.hs_err, "/tmp/fop/hs_err_pid1234.log" )
+        self.assertEqual( rh.classify_run( result = make_result(),
+                                           scanner = scan( [ "===== DaCapo 9.12 fop FAILED warmup =====" ] ) ),
+                          "dacapo_failed" )
+        self.assertEqual( rh.classify_run( result = make_result(),
+                                           scanner = scan( [ "Run is invalid." ] ) ),
+                          "specjvm_invalid" )
+
+    def test_exit( self ):
+        scanner = scan( [] )
+        self.assertEqual( rh.classify_run( result = make_result( returncode = -9 ), scanner = scanner ), "crash" )
+        self.assertEqual( rh.classify_run( result = make_result( returncode = 1 ), scanner = scanner ), "error" )
+        self.assertEqual( rh.classify_run( result = make_result( runtimes = () ), scanner = scanner ), "error" )
+        self.assertEqual( rh.classify_run( result = make_result( returncode = -9 ), scanner = scanner,
+                                           killed_by = "timeout" ), "timeout" )
+        # Stopped on purpose once converged.
+        self.assertEqual( rh.classify_run( result = make_result( returncode = -15, converged = True ),
+                                           scanner = scanner, killed_by = None ), "ok" )
+
+class RunWithRetriesTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir( self.tmpdir )
+        self.jar = os.path.join( self.tmpdir, "dacapo-9.12-bach.jar" )
+        open( self.jar, "w" ).close()
+        os.mkdir( "fop" )
+        self.logger = rh.setup_logger( logger_name = "test_failures", targetdir = self.tmpdir )
+        self.saved = sys.stdout
+        sys.stdout = open( os.devnull, "w" )
+
+    def tearDown( self ):
+        sys.stdout.close()
+        sys.stdout = self.saved
+        os.chdir( self.cwd )
+        shutil.rmtree( self.tmpdir )
+
+    def make_run( self, fail = 0, sleep = 0, **changes ):
+        java = os.path.join( self.tmpdir, "java" )
+        with open( java, "w" ) as fp:
+            fp.write( fake_java % { "count" : os.path.join( self.tmpdir, "count" ),
+                                    "fail" : fail,
+                                    "sleep" : sleep } )
+        os.chmod( java, stat.S_IRWXU )
+        run_config = { "benchmark" : "fop",
+                       "java_actual_path" : java,
+                       "dacapo_flag" : True,
+                       "dacapo_path" : self.jar,
+                       "number" : 1,
+                       "gc_algo" : "shenandoah",
+                       "heuristic" : "statusquo",
+                       "min_heap" : "1g",
+                       "max_heap" : "1g",
+                       "par_gcthreads" : 1,
+                       "conc_gcthreads" : 1,
+                       "appnum" : 1,
+                       "logger" : self.logger }
+        run_config.update( changes )
+        return run_config
+
+    def test_retry_after_failure( self ):
+        retried = []
+        result = rh.run_with_retries( run_config = self.make_run( fail = 1, retries = 2,
+                                                                  on_retry = lambda run_config, result: retried.append( result["status"] ) ) )
+        self.assertEqual( result["status"], "ok" )
+        self.assertEqual( result["attempts"], 2 )
+        self.assertEqual( retried, [ "dacapo_failed" ] )
+        # The failed attempt keeps its output; the retry gets new files.
+        outputs = [ x for x in os.listdir( "fop" ) if x.endswith( "-gc-output.txt" ) ]
+        self.assertEqual( len(outputs), 2 )
+        self.assertEqual( result["output_file"], os.path.join( "fop", [ x for x in outputs if "-a1" in x ][0] ) )
+
+    def test_out_of_retries( self ):
+        result = rh.run_with_retries( run_config = self.make_run( fail = 5, retries = 1 ) )
+        self.assertEqual( result["status"], "dacapo_failed" )
+        self.assertEqual( result["attempts"], 2 )
+
+    def test_timeout( self ):
+        start = time.time()
+        result = rh.run_with_retries( run_config = self.make_run( sleep = 30, timeout = 1.0 ) )
+        self.assertEqual( result["status"], "timeout" )
+        self.assertEqual( result["attempts"], 1 )
+        self.assertLess( time.time() - start, 15.0 )
+
+if __name__ == "__main__":
+    unittest.main()
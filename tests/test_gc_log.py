@@ -0,0 +1,85 @@
+"""Tests for GC log parsing."""
+import os
+import sys
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+class GcLogParsingTest( unittest.TestCase ):
+    def assertPause( self, line, kind, start, duration, heap_before, heap_after ):
+        (pause, timestamp) = rh.parse_gc_line( line )
+        self.assertNotEqual( pause, None )
+        self.assertEqual( pause.kind, kind )
+        self.assertAlmostEqual( pause.start, start )
+        self.assertAlmostEqual( timestamp, start )
+        self.assertAlmostEqual( pause.duration, duration )
+        if heap_before == None:
+            self.assertEqual( pause.heap_before, None )
+            self.assertEqual( pause.heap_after, None )
+        else:
+            self.assertAlmostEqual( pause.heap_before, heap_before )
+            self.assertAlmostEqual( pause.heap_after, heap_after )
+
+    def test_jdk8_parallel( self ):
+        self.assertPause( "2.345: [GC (Allocation Failure) [PSYoungGen: 33280K->5104K(38400K)] "
+                          "33280K->5112K(125952K), 0.0064423 secs] [Times: user=0.02 sys=0.00, real=0.01 secs]",
+                          "GC", 2.345, 6.4423, 33280.0, 5112.0 )
+        self.assertPause( "4.567: [Full GC (Ergonomics) [PSYoungGen: 5104K->0K(38400K)] "
+                          "[ParOldGen: 8K->4960K(87552K)] 5112K->4960K(125952K), "
+                          "[Metaspace: 3011K->3011K(1056768K)], 0.0254130 secs] "
+                          "[Times: user=0.05 sys=0.00, real=0.03 secs]",
+                          "Full GC", 4.567, 25.413, 5112.0, 4960.0 )
+
+    def test_jdk8_shenandoah( self ):
+        self.assertPause( "1.234: [Pause Init Mark, 0.456 ms]",
+                          "Pause Init Mark", 1.234, 0.456, None, None )
+        self.assertPause( "1.300: [Pause Final Mark 100M->90M(2048M), 1.234 ms]",
+                          "Pause Final Mark", 1.3, 1.234, 100 * 1024.0, 90 * 1024.0 )
+        self.assertEqual( rh.parse_gc_line( "1.240: [Concurrent marking 100M->100M(2048M), 5.123 ms]" ),
+                          (None, 1.24) )
+
+    def test_jdk8_g1( self ):
+        # The remark duration is the outermost one, not those of its phases.
+        self.assertPause( "2016-01-01T10:00:00.000+0100: 5.678: [GC remark 5.679: [Finalize Marking, 0.0001 secs] "
+                          "5.679: [GC ref-proc, 0.0002 secs] 5.680: [Unloading, 0.0010 secs], 0.0031 secs]",
+                          "GC remark", 5.678, 3.1, None, None )
+        self.assertEqual( rh.parse_gc_line( "3.000: [GC concurrent-mark-start]" ), (None, 3.0) )
+        lines = [ "2.345: [GC pause (G1 Evacuation Pause) (young), 0.0123456 secs]",
+                  "   [Parallel Time: 10.1 ms, GC Workers: 4]",
+                  "   [Eden: 24.0M(24.0M)->0.0B(21.0M) Survivors: 0.0B->3072.0K Heap: 24.0M(256.0M)->4.5M(256.0M)]",
+                  " [Times: user=0.03 sys=0.01, real=0.01 secs]",
+                  "3.000: [GC pause (G1 Evacuation Pause) (young), 0.0010000 secs]" ]
+        pauses = list( rh.iter_gc_pauses( lines ) )
+        self.assertEqual( len(pauses), 2 )
+        self.assertEqual( pauses[0].kind, "GC pause" )
+        self.assertAlmostEqual( pauses[0].duration, 12.3456 )
+        self.assertAlmostEqual( pauses[0].heap_before, 24 * 1024.0 )
+        self.assertAlmostEqual( pauses[0].heap_after, 4.5 * 1024.0 )
+        # The log ends before the heap line of the last pause.
+        self.assertEqual( pauses[1].heap_before, None )
+
+    def test_unified( self ):
+        self.assertPause( "[1.234s][info][gc] GC(3) Pause Young (Normal) (G1 Evacuation Pause) 24M->4M(256M) 3.456ms",
+                          "Pause Young", 1.234, 3.456, 24 * 1024.0, 4 * 1024.0 )
+        self.assertPause( "[0.512s][info][gc] GC(0) Pause Init Mark 0.123ms",
+                          "Pause Init Mark", 0.512, 0.123, None, None )
+        self.assertEqual( rh.parse_gc_line( "[0.600s][info][gc] GC(0) Concurrent marking 100M->90M(256M) 5.000ms" ),
+                          (None, 0.6) )
+        # -Xlog:gc* logs the start of a pause as well; only the end counts.
+        self.assertEqual( rh.parse_gc_line( "[0.700s][info][gc,start] GC(4) Pause Young (Normal) (G1 Evacuation Pause)" ),
+                          (None, 0.7) )
+        self.assertEqual( rh.parse_gc_line( "===== DaCapo 9.12 fop PASSED in 1234 msec =====" ), (None, None) )
+
+    def test_pause_stats( self ):
+        pauses = [ rh.GcPause( "Pause Young", 0.1 * i, float(i), None, None ) for i in xrange( 1, 11 ) ]
+        stats = rh.compute_pause_stats( pauses = pauses, wall_time = 11.0 )
+        self.assertEqual( stats["gc_pause_count"], 10 )
+        self.assertAlmostEqual( stats["gc_pause_total_ms"], 55.0 )
+        self.assertEqual( stats["gc_pause_p50_ms"], 5.0 )
+        self.assertEqual( stats["gc_pause_p99_ms"], 10.0 )
+        self.assertEqual( stats["gc_pause_max_ms"], 10.0 )
+        self.assertAlmostEqual( stats["gc_throughput"], 1.0 - 0.055 / 11.0 )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Tests for the run ledger behind --resume."""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+def make_run( **changes ):
+    run_config = { "benchmark" : "fop",
+                   "dacapo_flag" : True,
+                   "number" : 5,
+                   "gc_algo" : "shenandoah",
+                   "heuristic" : "statusquo",
+                   "min_heap" : "1g",
+                   "max_heap" : "1g",
+                   "par_gcthreads" : 2,
+                   "conc_gcthreads" : 2,
+                   "appnum" : 1 }
+    run_config.update( changes )
+    return run_config
+
+class RunLedgerTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join( self.tmpdir, rh.ledger_filename )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def test_resume_from_file( self ):
+        (done, failed) = [ rh.get_run_key( make_run( repetition = i ), "abc" ) for i in (0, 1) ]
+        ledger = rh.RunLedger( self.path )
+        ledger.record( key = done, status = "failed" )
+        ledger.record( key = done, status = "completed", runtimes = [ 1.0 ] )
+        ledger.record( key = failed, status = "failed" )
+        ledger.record_event( event = "eliminated", heuristic = "aggressive" )
+        ledger.fp.close()
+        # The harness was killed halfway through a line.
+        with open( self.path, "a" ) as fp:
+            fp.write( '{"key": ["fop"' )
+        ledger = rh.RunLedger( self.path )
+        self.assertTrue( ledger.is_completed( done ) )
+        self.assertEqual( ledger.get_record( done )["runtimes"], [ 1.0 ] )
+        self.assertFalse( ledger.is_completed( failed ) )
+        self.assertEqual( ledger.get_status( failed ), "failed" )
+        self.assertEqual( ledger.get_status( rh.get_run_key( make_run( repetition = 2 ), "abc" ) ), None )
+        self.assertEqual( [ x["event"] for x in ledger.events ], [ "eliminated" ] )
+        ledger.fp.close()
+
+    def test_run_key( self ):
+        key = rh.get_run_key( make_run(), "abc" )
+        self.assertEqual( key, rh.get_run_key( make_run(), "abc" ) )
+        self.assertNotEqual( key, rh.get_run_key( make_run(), "abd" ) )
+        self.assertNotEqual( key, rh.get_run_key( make_run( repetition = 1 ), "abc" ) )
+        self.assertNotEqual( key, rh.get_run_key( make_run( heuristic = "aggressive" ), "abc" ) )
+        self.assertNotEqual( key, rh.get_run_key( make_run( number = 10 ), "abc" ) )
+        # SPECjvm runs a fixed number of iterations, whatever --num says.
+        self.assertEqual( rh.get_run_key( make_run( dacapo_flag = False, number = 5 ), "abc" ),
+                          rh.get_run_key( make_run( dacapo_flag = False, number = 10 ), "abc" ) )
+
+class HashJvmTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def make_file( self, path, text ):
+        path = os.path.join( self.tmpdir, path )
+        if not os.path.isdir( os.path.dirname( path ) ):
+            os.makedirs( os.path.dirname( path ) )
+        with open( path, "w" ) as fp:
+            fp.write( text )
+        return path
+
+    def test_rebuilt_libjvm( self ):
+        java = self.make_file( "jdk/bin/java", "launcher" )
+        self.make_file( "jdk/lib/server/libjvm.so", "vm 1" )
+        before = rh.hash_jvm( java )
+        self.assertNotEqual( before, rh.hash_file( java ) )
+        self.make_file( "jdk/lib/server/libjvm.so", "vm 2" )
+        self.assertNotEqual( before, rh.hash_jvm( java ) )
+
+    def test_jdk8_layout( self ):
+        java = self.make_file( "jdk8/bin/java", "launcher" )
+        libjvm = self.make_file( "jdk8/jre/lib/amd64/server/libjvm.so", "vm" )
+        self.assertEqual( rh.find_libjvm( java ), libjvm )
+        # Through a symlink such as /usr/bin/java.
+        link = os.path.join( self.tmpdir, "java" )
+        os.symlink( java, link )
+        self.assertEqual( rh.find_libjvm( link ), libjvm )
+        self.assertEqual( rh.hash_jvm( link ), rh.hash_jvm( java ) )
+
+    def test_without_libjvm( self ):
+        java = self.make_file( "bin/java", "launcher" )
+        self.assertEqual( rh.find_libjvm( java ), None )
+        self.assertEqual( rh.hash_jvm( java ), rh.hash_file( java ) )
+
+class ResumeOptionTest( unittest.TestCase ):
+    def test_fake_resume_is_refused( self ):
+        script = os.path.join( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ),
+                               "run_heuristics.py" )
+        proc = subprocess.Popen( [ sys.executable, script, "--javapath", sys.executable, "--fake", "--resume" ],
+                                 stdout = subprocess.PIPE, stderr = subprocess.PIPE )
+        (out, err) = proc.communicate()
+        self.assertEqual( proc.returncode, 2 )
+        self.assertIn( "--resume", err )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Tests for racing heuristics."""
+import logging
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+class RaceStatisticsTest( unittest.TestCase ):
+    def test_incomplete_beta( self ):
+        # For integer a and b, I_x(a, b) is a binomial tail: I_0.5(2, 3) = 11/16.
+        self.assertAlmostEqual( rh.incomplete_beta( 2, 3, 0.5 ), 0.6875, places = 10 )
+        self.assertAlmostEqual( rh.incomplete_beta( 1, 1, 0.3 ), 0.3, places = 10 )
+        # Reference values from numerical integration of the beta density.
+        self.assertAlmostEqual( rh.incomplete_beta( 2.5, 4.0, 0.3 ), 0.3521975859, places = 8 )
+        self.assertAlmostEqual( rh.incomplete_beta( 30, 2, 0.9 ), 0.1695646331, places = 8 )
+        self.assertAlmostEqual( rh.incomplete_beta( 2.5, 4.0, 0.3 ),
+                                1.0 - rh.incomplete_beta( 4.0, 2.5, 0.7 ), places = 10 )
+        self.assertEqual( rh.incomplete_beta( 2, 3, 0.0 ), 0.0 )
+        self.assertEqual( rh.incomplete_beta( 2, 3, 1.0 ), 1.0 )
+
+    def test_welch_t_test( self ):
+        # t = -3 / sqrt(2.5), df = 5.88; p from integrating the t density.
+        (t, p) = rh.welch_t_test( [ 1, 2, 3, 4, 5 ], [ 2, 4, 6, 8, 10 ] )
+        self.assertAlmostEqual( t, -1.8973665961, places = 8 )
+        self.assertAlmostEqual( p, 0.1075311949, places = 8 )
+        # Two samples of 2 with equal variances: df = 2, p = 1 - t / sqrt(2 + t^2).
+        (t, p) = rh.welch_t_test( [ 1, 3 ], [ 0, 2 ] )
+        self.assertAlmostEqual( t, 0.5 ** 0.5 )
+        self.assertAlmostEqual( p, 1.0 - t / (2.0 + t * t) ** 0.5, places = 10 )
+        self.assertEqual( rh.welch_t_test( [ 1 ], [ 2, 3 ] ), (0.0, 1.0) )
+        self.assertEqual( rh.welch_t_test( [ 2, 2 ], [ 1, 1 ] ), (float("inf"), 0.0) )
+
+    def test_holm_reject( self ):
+        self.assertEqual( rh.holm_reject( [ 0.01, 0.04, 0.03 ], alpha = 0.05 ), [ True, False, False ] )
+        self.assertEqual( rh.holm_reject( [ 0.01, 0.02, 0.04 ], alpha = 0.05 ), [ True, True, True ] )
+
+class RaceHeuristicsTest( unittest.TestCase ):
+    def test_clear_loser_is_dropped( self ):
+        means = { "statusquo" : 100.0, "adaptive" : 100.0, "aggressive" : 200.0 }
+        run_list = [ { "benchmark" : "fop", "min_heap" : "1g", "heuristic" : x } for x in sorted( means ) ]
+        executed = []
+        eliminated = []
+        def get_metrics( run_config ):
+            rng = random.Random( "%s %d" % (run_config["heuristic"], run_config["repetition"]) )
+            return (means[run_config["heuristic"]] + rng.gauss( 0.0, 2.0 ), None)
+        alive = rh.race_heuristics( run_list = run_list,
+                                    execute = executed.extend,
+                                    get_metrics = get_metrics,
+                                    initial_reps = 3,
+                                    budget = 9,
+                                    on_eliminate = lambda cell, hname, best, info: eliminated.append( hname ),
+                                    logger = logging.getLogger( "test_race" ) )
+        self.assertEqual( eliminated, [ "aggressive" ] )
+        self.assertEqual( sorted( alive.values()[0] ), [ "adaptive", "statusquo" ] )
+        counts = dict( [ (x, len( [ y for y in executed if y["heuristic"] == x ] )) for x in means ] )
+        self.assertEqual( counts, { "statusquo" : 9, "adaptive" : 9, "aggressive" : 3 } )
+        self.assertEqual( sorted( set( [ x["repetition"] for x in executed ] ) ), range( 9 ) )
+
+    def test_failed_runs_are_left_out( self ):
+        run_list = [ { "benchmark" : "fop", "heuristic" : x } for x in ("statusquo", "aggressive") ]
+        alive = rh.race_heuristics( run_list = run_list,
+                                    execute = lambda runs: None,
+                                    get_metrics = lambda run_config: None,
+                                    budget = 6,
+                                    logger = logging.getLogger( "test_race" ) )
+        self.assertEqual( sorted( alive.values()[0] ), [ "aggressive", "statusquo" ] )
+
+if __name__ == "__main__":
+    unittest.main()
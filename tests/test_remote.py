@@ -0,0 +1,119 @@
+"""Tests for the coordinator and worker protocol."""
+import logging
+import os
+import socket
+import StringIO
+import sys
+import threading
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+class MessageAuthTest( unittest.TestCase ):
+    def make_pair( self ):
+        nonces = [ "aa", "bb" ]
+        return (rh.MessageAuth( secret = "secret", nonces = nonces ),
+                rh.MessageAuth( secret = "secret", nonces = nonces ))
+
+    def test_round_trip( self ):
+        (sender, receiver) = self.make_pair()
+        fp = StringIO.StringIO()
+        rh.send_message( fp, { "type" : "file", "name" : "fop/x" }, "data", auth = sender )
+        rh.send_message( fp, { "type" : "request" }, auth = sender )
+        fp.seek( 0 )
+        (message, payload) = rh.recv_message( fp, receiver )
+        self.assertEqual( (message["name"], payload), ("fop/x", "data") )
+        self.assertEqual( rh.recv_message( fp, receiver )[0]["type"], "request" )
+        self.assertEqual( rh.recv_message( fp, receiver ), (None, None) )
+
+    def test_tampered_payload( self ):
+        (sender, receiver) = self.make_pair()
+        fp = StringIO.StringIO()
+        rh.send_message( fp, { "type" : "file" }, "data", auth = sender )
+        fp = StringIO.StringIO( fp.getvalue().replace( "data", "dato" ) )
+        self.assertRaises( ValueError, rh.recv_message, fp, receiver )
+
+    def test_replayed_message( self ):
+        (sender, receiver) = self.make_pair()
+        fp = StringIO.StringIO()
+        rh.send_message( fp, { "type" : "request" }, auth = sender )
+        fp = StringIO.StringIO( fp.getvalue() * 2 )
+        rh.recv_message( fp, receiver )
+        self.assertRaises( ValueError, rh.recv_message, fp, receiver )
+
+    def test_wrong_secret( self ):
+        nonces = [ "aa", "bb" ]
+        fp = StringIO.StringIO()
+        rh.send_message( fp, { "type" : "request" }, auth = rh.MessageAuth( secret = "other", nonces = nonces ) )
+        fp.seek( 0 )
+        self.assertRaises( ValueError, rh.recv_message, fp, rh.MessageAuth( secret = "secret", nonces = nonces ) )
+
+class HandshakeTest( unittest.TestCase ):
+    def setUp( self ):
+        self.logger = logging.getLogger( "test_remote" )
+        self.logger.addHandler( logging.NullHandler() )
+        self.saved = sys.stdout
+        sys.stdout = open( os.devnull, "w" )
+        self.coordinator = rh.Coordinator( address = ("127.0.0.1", 0),
+                                           secret = "secret",
+                                           logger = self.logger )
+        self.address = self.coordinator.server.getsockname()
+
+    def tearDown( self ):
+        self.coordinator.server.close()
+        sys.stdout.close()
+        sys.stdout = self.saved
+
+    def session( self, secret, overrides = None ):
+        conn = socket.create_connection( self.address )
+        conn.settimeout( 30.0 )
+        try:
+            rh.worker_session( fp = conn.makefile( "rwb" ),
+                               secret = secret,
+                               host = "worker1",
+                               hardware = "test",
+                               overrides = overrides,
+                               logger = self.logger )
+        finally:
+            conn.close()
+
+    def test_wrong_secret_is_refused( self ):
+        self.coordinator.close()
+        self.assertRaises( ValueError, self.session, "not the secret" )
+        self.assertEqual( self.coordinator.in_flight, {} )
+
+    def test_worker_runs_only_its_own_jvms( self ):
+        run_config = { "benchmark" : "fop",
+                       "jvm_label" : "patched",
+                       "dacapo_flag" : True,
+                       "java_actual_path" : "/usr/bin/java",
+                       "logger" : self.logger }
+        overrides = { "jvms" : { "default" : "/opt/jdk/bin/java" },
+                      "paths" : { "dacapo_path" : "/opt/dacapo.jar" },
+                      "baseline" : None }
+        worker = threading.Thread( target = self.session, args = ("secret", overrides) )
+        worker.daemon = True
+        worker.start()
+        results = []
+        self.coordinator.run_all( [ run_config ], callback = lambda run_config, result: results.append( result ) )
+        self.coordinator.close()
+        worker.join( 30.0 )
+        self.assertFalse( worker.is_alive() )
+        self.assertEqual( len(results), 1 )
+        self.assertEqual( results[0]["status"], "error" )
+        self.assertEqual( results[0]["host"], "worker1" )
+        self.assertEqual( results[0]["runtimes"], [] )
+
+    def test_check_remote_run( self ):
+        overrides = { "jvms" : { "default" : "/opt/jdk/bin/java" }, "paths" : {} }
+        self.assertEqual( rh.check_remote_run( run_config = { "jvm_label" : "default", "benchmark" : "fop" },
+                                               overrides = overrides ), None )
+        self.assertNotEqual( rh.check_remote_run( run_config = { "jvm_label" : "default", "benchmark" : "../fop" },
+                                                  overrides = overrides ), None )
+        self.assertNotEqual( rh.check_remote_run( run_config = { "jvm_label" : "default", "benchmark" : "fop",
+                                                                 "dacapo_flag" : True },
+                                                  overrides = overrides ), None )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Tests for the differential report."""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+class BootstrapTest( unittest.TestCase ):
+    @unittest.skipIf( rh.np == None, "needs NumPy" )
+    def test_bootstrap_means( self ):
+        np = rh.np
+        samples = np.array( [ 5.0, 5.0, 5.0, 1.0, 2.0, 7.0 ] )
+        sizes = np.array( [ 3, 2, 0, 1 ] )
+        boot = rh.bootstrap_means( samples = samples,
+                                   sizes = sizes,
+                                   resamples = 20000,
+                                   rng = np.random.RandomState( 1 ) )
+        self.assertEqual( boot.shape, (20000, 4) )
+        # A constant or single sample always resamples to itself.
+        self.assertTrue( (boot[:, 0] == 5.0).all() )
+        self.assertTrue( (boot[:, 3] == 7.0).all() )
+        self.assertTrue( np.isnan( boot[:, 2] ).all() )
+        # Means of two draws from {1, 2}: 1, 1.5 and 2 with p = 1/4, 1/2, 1/4.
+        self.assertTrue( set( np.unique( boot[:, 1] ) ) <= set( [ 1.0, 1.5, 2.0 ] ) )
+        self.assertAlmostEqual( boot[:, 1].mean(), 1.5, places = 2 )
+        self.assertAlmostEqual( boot[:, 1].var(), 0.125, places = 2 )
+
+@unittest.skipIf( rh.np == None, "needs NumPy" )
+class DifferentialReportTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def test_verdicts( self ):
+        path = os.path.join( self.tmpdir, "a.csv" )
+        with open( path, "wb" ) as fp:
+            writer = csv.writer( fp )
+            writer.writerow( rh.csv_header )
+            for (heuristic, runtimes) in [ ("statusquo", [ "100;101", "102;99", "98;100" ]),
+                                           ("aggressive", [ "80;81", "79;80", "82;78" ]),
+                                           ("compact", [ "101;99", "100;100", "99;102" ]),
+                                           ("adaptive", [ "50;50" ]) ]:
+                for value in runtimes:
+                    writer.writerow( [ "fop", "shenandoah", heuristic, "1g", "1g", 2, 2, 2, value ] )
+        store = os.path.join( self.tmpdir, "store" )
+        rh.ingest_csvfile( csvpath = path, store = store, sweep_id = "a" )
+        (data, iterations) = rh.load_store( store = store, with_iterations = True )
+        report = rh.differential_report( data = data,
+                                         iterations = iterations,
+                                         cell_columns = [ "benchmark", "min_heap", "max_heap" ],
+                                         resamples = 500 )
+        verdicts = dict( zip( report["variant"], report["verdict"] ) )
+        self.assertEqual( verdicts, { "aggressive" : "better", "compact" : "same", "adaptive" : "?" } )
+        speedups = dict( zip( report["variant"], report["speedup"] ) )
+        self.assertAlmostEqual( speedups["aggressive"], 100.0 / 80.0 )
+        # A single run gets no interval, however fast it looks.
+        self.assertEqual( list( report["rank"] ), [ 1, 2, 3 ] )
+        self.assertEqual( list( report["variant"] )[0], "adaptive" )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Tests for the resource sampler."""
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+# Eight threads that block (and so switch) often and then exit, leaving the
+# main thread alone for the last samples.
+threaded_child = """
+import threading, time
+def work():
+    for i in range( 300 ):
+        time.sleep( 0.001 )
+threads = [ threading.Thread( target = work ) for i in range( 8 ) ]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+time.sleep( 0.5 )
+"""
+
+@unittest.skipUnless( os.path.isdir( "/proc/self/task" ), "needs Linux /proc" )
+class ResourceSamplerTest( unittest.TestCase ):
+    def test_exited_threads_count( self ):
+        proc = subprocess.Popen( [ sys.executable, "-c", threaded_child ], stdout = subprocess.PIPE )
+        sampler = rh.ResourceSampler( pid = proc.pid, interval = 0.05 )
+        sampler.start()
+        # Like stream_process_output, which returns once the JVM exits.
+        proc.stdout.read()
+        sampler.stop()
+        (returncode, rusage) = rh.wait_with_rusage( proc )
+        self.assertEqual( returncode, 0 )
+        self.assertEqual( proc.returncode, 0 )
+        width = len(rh.resource_sample_fields)
+        voluntary = sampler.samples[4::width]
+        # The worker threads are gone by the last sample.
+        self.assertGreater( max( voluntary ), 8 * 100 )
+        self.assertLess( voluntary[-1], max( voluntary ) / 2 )
+        summary = sampler.summary()
+        self.assertEqual( summary["ctxt_voluntary"], int( max( voluntary ) ) )
+        self.assertEqual( summary["run_delay_s"], max( sampler.samples[7::width] ) )
+        summary = sampler.summary( rusage = rusage )
+        self.assertEqual( summary["ctxt_voluntary"], rusage.ru_nvcsw )
+        self.assertGreaterEqual( summary["ctxt_voluntary"], max( voluntary ) )
+        self.assertEqual( summary["cpu_user_s"], rusage.ru_utime )
+
+    def test_returncode_of_signal( self ):
+        proc = subprocess.Popen( [ "sleep", "10" ] )
+        proc.terminate()
+        (returncode, rusage) = rh.wait_with_rusage( proc )
+        self.assertEqual( returncode, -15 )
+        self.assertEqual( proc.wait(), -15 )
+
+if __name__ == "__main__":
+    unittest.main()
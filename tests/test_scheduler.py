@@ -0,0 +1,102 @@
+"""Tests for running benchmarks concurrently on disjoint CPU sets."""
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+# Stand-in for java: logs when it starts and ends, and passes.
+fake_java = """#!/bin/sh
+echo "start $(date +%%s.%%N)" >> %(log)s
+sleep 0.3
+echo "===== DaCapo 9.12 fop PASSED in 300 msec ====="
+echo "end $(date +%%s.%%N)" >> %(log)s
+"""
+
+class CpuPoolTest( unittest.TestCase ):
+    def test_disjoint_and_contiguous( self ):
+        pool = rh.CpuPool( [ 0, 1, 2, 3, 4, 5, 6, 7 ] )
+        first = pool.allocate( 3 )
+        second = pool.allocate( 3 )
+        self.assertEqual( first, [ 0, 1, 2 ] )
+        self.assertEqual( second, [ 3, 4, 5 ] )
+        self.assertEqual( pool.allocate( 3 ), None )
+        pool.release( first )
+        # Both the freed block and 6-7 are free; the block is contiguous.
+        self.assertEqual( pool.allocate( 3 ), [ 0, 1, 2 ] )
+        self.assertEqual( pool.allocate( 2 ), [ 6, 7 ] )
+
+    def test_gaps_and_wide_runs( self ):
+        pool = rh.CpuPool( [ 0, 2, 4, 5 ] )
+        self.assertEqual( pool.allocate( 2 ), [ 4, 5 ] )
+        # No contiguous pair is left, so take what is free.
+        self.assertEqual( pool.allocate( 2 ), [ 0, 2 ] )
+        pool = rh.CpuPool( [ 0, 1 ] )
+        # A run wider than the machine gets all of it.
+        self.assertEqual( pool.allocate( 6 ), [ 0, 1 ] )
+
+class RunSchedulerTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir( self.tmpdir )
+        self.log = os.path.join( self.tmpdir, "runs.log" )
+        self.java = os.path.join( self.tmpdir, "java" )
+        with open( self.java, "w" ) as fp:
+            fp.write( fake_java % { "log" : self.log } )
+        os.chmod( self.java, stat.S_IRWXU )
+        self.jar = os.path.join( self.tmpdir, "dacapo-9.12-bach.jar" )
+        open( self.jar, "w" ).close()
+        os.mkdir( "fop" )
+        self.logger = rh.setup_logger( logger_name = "test_scheduler", targetdir = self.tmpdir )
+        self.saved = sys.stdout
+        sys.stdout = open( os.devnull, "w" )
+
+    def tearDown( self ):
+        sys.stdout.close()
+        sys.stdout = self.saved
+        os.chdir( self.cwd )
+        shutil.rmtree( self.tmpdir )
+
+    def make_run( self, par_gcthreads, min_heap ):
+        return { "benchmark" : "fop",
+                 "java_actual_path" : self.java,
+                 "dacapo_flag" : True,
+                 "dacapo_path" : self.jar,
+                 "number" : 1,
+                 "gc_algo" : "shenandoah",
+                 "heuristic" : "statusquo",
+                 "min_heap" : min_heap,
+                 "max_heap" : min_heap,
+                 "par_gcthreads" : par_gcthreads,
+                 "conc_gcthreads" : 1,
+                 "appnum" : 1,
+                 "logger" : self.logger }
+
+    def test_runs_fit_the_cpus( self ):
+        # Widths 3, 3 and 4 on 6 CPUs: the first two together, then the third.
+        runs = [ self.make_run( 1, "1g" ), self.make_run( 1, "2g" ), self.make_run( 2, "3g" ) ]
+        done = []
+        scheduler = rh.RunScheduler( jobs = 3, cpus = range( 6 ), affinity = False,
+                                     logger = self.logger )
+        scheduler.run_all( runs, callback = lambda run_config, result: done.append( run_config["min_heap"] ) )
+        self.assertEqual( sorted( done ), [ "1g", "2g", "3g" ] )
+        events = []
+        with open( self.log ) as fp:
+            for line in fp:
+                (kind, when) = line.split()
+                events.append( (float(when), 1 if kind == "start" else -1) )
+        (running, most) = (0, 0)
+        for (when, change) in sorted( events ):
+            running += change
+            most = max( most, running )
+        self.assertEqual( len(events), 6 )
+        self.assertEqual( most, 2 )
+        self.assertEqual( scheduler.pool.free, set( range( 6 ) ) )
+
+if __name__ == "__main__":
+    unittest.main()
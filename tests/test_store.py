@@ -0,0 +1,73 @@
+"""Tests for the columnar results store."""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+def write_csv( path, header, rows ):
+    with open( path, "wb" ) as fp:
+        writer = csv.writer( fp )
+        writer.writerow( header )
+        for row in rows:
+            writer.writerow( row )
+
+@unittest.skipIf( rh.np == None, "needs NumPy" )
+class StoreTest( unittest.TestCase ):
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = os.path.join( self.tmpdir, "store" )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def ingest( self, name, header, rows ):
+        path = os.path.join( self.tmpdir, name + ".csv" )
+        write_csv( path, header, rows )
+        return rh.ingest_csvfile( csvpath = path, store = self.store, sweep_id = name )
+
+    def test_round_trip( self ):
+        header = rh.csv_header + [ "appnum", "extra_flags" ]
+        self.ingest( "a", header,
+                     [ [ "fop", "shenandoah", "statusquo", "1g", "1g", 2, 2, 3, "10;20;30", "1", "" ],
+                       [ "fop", "shenandoah", "statusquo", "1g", "1g", 2, 2, 2, "40;60", "1", "" ],
+                       [ "fop", "shenandoah", "aggressive", "1g", "1g", 2, 2, 1, "5", "", "-XX:+AlwaysPreTouch" ] ] )
+        # An older sweep without the last two columns.
+        self.ingest( "b", rh.csv_header,
+                     [ [ "luindex", "g1", "None", "2g", "2g", 4, 2, 2, "7;9", ] ] )
+        (data, iterations) = rh.load_store( store = self.store, with_iterations = True )
+        self.assertEqual( sorted( set( data["sweep"] ) ), [ "a", "b" ] )
+        self.assertEqual( len(data["benchmark"]), 4 )
+        order = list( data["sweep"] ).index( "b" )
+        self.assertEqual( data["runtime_mean"][order], 8.0 )
+        self.assertEqual( sorted( data["runtime_mean"] ), [ 5.0, 8.0, 20.0, 50.0 ] )
+        self.assertEqual( data["par_gcthreads"][order], 4.0 )
+        # Empty text stays empty text, also where the column is missing.
+        self.assertEqual( data["extra_flags"][order], "" )
+        self.assertTrue( rh.np.isnan( data["appnum"][order] ) )
+        start = int( data["iteration_start"][order] )
+        self.assertEqual( list( iterations[start:start + int( data["iteration_count"][order] )] ), [ 7.0, 9.0 ] )
+        result = rh.aggregate_groups( data = data, groupby = [ "benchmark", "heuristic" ] )
+        rows = dict( [ ((result["benchmark"][i], result["heuristic"][i]), i )
+                       for i in xrange( len(result["n"]) ) ] )
+        statusquo = rows[("fop", "statusquo")]
+        self.assertEqual( result["n"][statusquo], 2 )
+        self.assertEqual( result["mean"][statusquo], 35.0 )
+        # All NaN keys form one group.
+        result = rh.aggregate_groups( data = data, groupby = [ "appnum" ] )
+        self.assertEqual( sorted( result["n"] ), [ 2, 2 ] )
+
+    def test_reingest_replaces( self ):
+        header = rh.csv_header
+        row = [ "fop", "shenandoah", "statusquo", "1g", "1g", 2, 2, 1, "10" ]
+        self.ingest( "a", header, [ row ] )
+        self.ingest( "a", header, [ row, row[:-1] + [ "30" ] ] )
+        data = rh.load_store( store = self.store )
+        self.assertEqual( sorted( data["runtime_mean"] ), [ 10.0, 30.0 ] )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Tests for the sweep designs."""
+import itertools
+import os
+import sys
+import unittest
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+import run_heuristics as rh
+
+class SamplingTest( unittest.TestCase ):
+    def test_full( self ):
+        self.assertEqual( rh.sample_indices( sizes = [ 2, 3 ], sampling = "full" ),
+                          list( itertools.product( range(2), range(3) ) ) )
+
+    def test_fraction( self ):
+        points = rh.sample_indices( sizes = [ 2, 2, 2 ], sampling = "fraction", fraction = 2 )
+        self.assertEqual( points, [ (0, 0, 0), (0, 1, 1), (1, 0, 1), (1, 1, 0) ] )
+        # A half fraction is balanced: every level of every axis appears equally often.
+        for axis in xrange( 3 ):
+            self.assertEqual( sorted( [ x[axis] for x in points ] ), [ 0, 0, 1, 1 ] )
+
+    def test_lhs( self ):
+        points = rh.sample_indices( sizes = [ 5, 5, 5 ], sampling = "lhs", samples = 5, seed = 3 )
+        self.assertEqual( len(points), 5 )
+        # One stratum per level: every axis uses every level exactly once.
+        for axis in xrange( 3 ):
+            self.assertEqual( sorted( [ x[axis] for x in points ] ), range( 5 ) )
+        points = rh.sample_indices( sizes = [ 2, 10 ], sampling = "lhs", samples = 10, seed = 3 )
+        self.assertEqual( sorted( [ x[1] for x in points ] ), range( 10 ) )
+        self.assertEqual( sorted( [ x[0] for x in points ] ), [ 0 ] * 5 + [ 1 ] * 5 )
+        self.assertEqual( points, rh.sample_indices( sizes = [ 2, 10 ], sampling = "lhs", samples = 10, seed = 3 ) )
+
+class ExpandSweepTest( unittest.TestCase ):
+    def test_heuristics_are_crossed( self ):
+        axes = rh.get_sweep_axes( config = {},
+                                  gc_algo = "shenandoah",
+                                  heuristic = "statusquo",
+                                  min_heap = "1g",
+                                  max_heap = "1g",
+                                  concgcthreads = 3,
+                                  number_appthreads = 2 )
+        axes["gc_algo"] = [ "shenandoah", "g1" ]
+        axes["heuristic"] = [ "statusquo", "aggressive" ]
+        points = rh.expand_sweep( axes = axes )
+        # 2 ConcGCThreads x 2 app threads per collector; G1 has no heuristics.
+        self.assertEqual( len(points), 4 * 2 + 4 )
+        self.assertEqual( set( [ x["heuristic"] for x in points if x["gc_algo"] == "g1" ] ), set( [ "None" ] ) )
+        shenandoah = [ x for x in points if x["gc_algo"] == "shenandoah" ]
+        for hname in axes["heuristic"]:
+            self.assertEqual( len( [ x for x in shenandoah if x["heuristic"] == hname ] ), 4 )
+
+    def test_config_axes_win( self ):
+        config = { "sweep" : { "axes" : { "heap" : [ ("1g", "1g"), ("2g", "4g") ] } } }
+        axes = rh.get_sweep_axes( config = config, gc_algo = "g1", heuristic = "statusquo",
+                                  min_heap = "8g", max_heap = "8g" )
+        self.assertEqual( axes["heap"], [ ("1g", "1g"), ("2g", "4g") ] )
+        points = rh.expand_sweep( axes = axes, sampling = "fraction" )
+        self.assertEqual( [ x["heap"] for x in points ], [ ("1g", "1g") ] )
+
+if __name__ == "__main__":
+    unittest.main()